@@ -1,19 +1,32 @@
 # ai_generator.py
-import cohere
-import os
+from llm_router import LLMRouter, Route
+from prompt_builder import SECTION_BUDGETS, PromptBudget
+from ranking import select_passages
+from sections import generate_sections
 
-COHERE_API_KEY = os.getenv("COHERE_API_KEY")
-co = cohere.Client("JmNhbEWy3qQIYLeTWwVqZPPVH3xzteNzgBDUqm8y")
+# Cohere, hedged onto Gemini when it runs slow or fails
+generator_router = LLMRouter([Route("cohere", "command-r-plus"), Route("gemini", "gemini-1.5-flash")])
 
-def generate_humanized_output(product_name, primary_keywords, secondary_keywords, scraped_data):
-    descriptions = "\n".join(scraped_data["descriptions"][:5])
-    how_to_use = "\n".join(scraped_data["how_to_use"][:2])
-    ingredients = "\n".join(scraped_data["ingredients"][:2])
+def price_range(prices, prefix):
+    # scraped_data holds float amounts; they're only formatted here, after max/min
+    if not prices:
+        return "N/A", "N/A"
+    return f"{prefix}{max(prices):.2f}", f"{prefix}{min(prices):.2f}"
+
+def generate_humanized_output(product_name, primary_keywords, secondary_keywords, scraped_data, use_cache=True,
+                              per_section=False):
+    budget = PromptBudget("humanized_output", "command-r-plus")
+    query = f"{product_name} {primary_keywords} {secondary_keywords}"
+    ranked = select_passages(
+        {str(i): d for i, d in enumerate(scraped_data["descriptions"])}, query,
+        SECTION_BUDGETS["descriptions"], "command-r-plus",
+    )
+    descriptions = budget.fit("descriptions", "\n".join(p.text for p in ranked))
+    how_to_use = budget.fit("how_to_use", "\n".join(scraped_data["how_to_use"][:2]))
+    ingredients = budget.fit("ingredients", "\n".join(scraped_data["ingredients"][:2]))
     upc = scraped_data["upc"] or "Not Found"
-    max_usd = max(scraped_data["prices_usd"], default="N/A")
-    min_usd = min(scraped_data["prices_usd"], default="N/A")
-    max_cad = max(scraped_data["prices_cad"], default="N/A")
-    min_cad = min(scraped_data["prices_cad"], default="N/A")
+    max_usd, min_usd = price_range(scraped_data["prices_usd"], "$")
+    max_cad, min_cad = price_range(scraped_data["prices_cad"], "CAD $")
 
     prompt = f"""
 You are a marketing copywriter. Write SEO optimized content for:
@@ -38,15 +51,32 @@ Your output must include the following sections in **human-like tone**, undetect
 8. Highest & Lowest Price (USD): {max_usd} / {min_usd}
 9. Highest & Lowest Price (CAD): {max_cad} / {min_cad}
 """
-
-    response = co.chat(model="command-r-plus", message=prompt)
+    if per_section:
+        # Each field from its own JSON call; only fields outside their limits are asked for again
+        # The section prompts are recorded as section.<name>; the shared sources under this budget
+        sources = budget.finish(f"{descriptions}\n\nHow to use: {how_to_use}\n\nIngredients: {ingredients}")
+        fields, _ = generate_sections(
+            generator_router, product_name, primary_keywords, secondary_keywords, sources, "command-r-plus",
+            use_cache=use_cache,
+        )
+    else:
+        text = generator_router.complete(budget.finish(prompt), use_cache).text
+        lines = text.split("\n")
+        fields = {
+            "meta_title": lines[1],
+            "meta_description": lines[3],
+            "short_description": lines[5],
+            "full_description": "\n".join(lines[7:12]),
+            "how_to_use": lines[13],
+            "ingredients": lines[15],
+        }
     return {
-        "Meta Title": response.text.split("\n")[1],
-        "Meta Description": response.text.split("\n")[3],
-        "Short Description": response.text.split("\n")[5],
-        "Description": "\n".join(response.text.split("\n")[7:12]),
-        "How to Use": response.text.split("\n")[13],
-        "Ingredients": response.text.split("\n")[15],
+        "Meta Title": fields["meta_title"],
+        "Meta Description": fields["meta_description"],
+        "Short Description": fields["short_description"],
+        "Description": fields["full_description"],
+        "How to Use": fields["how_to_use"],
+        "Ingredients": fields["ingredients"],
         "UPC": upc,
         "Highest Price (USD)": max_usd,
         "Lowest Price (USD)": min_usd,
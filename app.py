@@ -2,79 +2,44 @@
 
 import streamlit as st
 import asyncio
-from bs4 import BeautifulSoup
-from playwright.async_api import async_playwright
-import os
-import cohere
-import re
-import aiohttp
-import requests
-from datasets import Dataset, load_dataset, concatenate_datasets
-import google.generativeai as genai
-import os
-
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-
+import time
+
+from dataset_writer import get_dataset_writer
+from fetcher import TieredFetcher
+from humanizer import stream_humanized_text
+from jobs import POLL_INTERVAL, get_job_manager, job_key, render_job_progress
+from knowledge_store import KnowledgeEntry, get_knowledge_store
+from llm_router import LLMRouter, Route
+from page_cache import get_page_cache
+from prompt_builder import SECTION_BUDGETS, PromptBudget
+from ranking import group_by_source, select_passages
+from scraper import extract_product_info
+from search_providers import get_search_provider
+from tracing import render_waterfall, span
 
 # 🚀 Setup
-os.system("playwright install")
-
-COHERE_API_KEY = os.getenv("COHERE_API_KEY")
-co = cohere.Client(COHERE_API_KEY)
-HF_DATASET_NAME = "Jay-Rajput/product_desc"
+# Clients come from providers.py on first use and Chromium is checked before the
+# first render (browser_pool.ensure_browser), so nothing heavy runs at import
+DESCRIPTION_MODEL = "command-r-plus-08-2024"
+description_router = LLMRouter([Route("cohere", DESCRIPTION_MODEL), Route("gemini", "gemini-1.5-flash")])
 
 # 🔍 Google Search
-async def search_product_links(query, max_links=5):
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page()
-        await page.goto(f"https://www.google.com/search?q={query}")
-        await page.wait_for_timeout(2000)
-        elements = await page.query_selector_all("a")
-        links = []
-        for e in elements:
-            href = await e.get_attribute("href")
-            if href and href.startswith("/url?q="):
-                clean_link = href.split("/url?q=")[1].split("&")[0]
-                if ("google" not in clean_link and not clean_link.startswith("#") and
-                    not any(domain in clean_link for domain in ["youtube.com", "facebook.com", "instagram.com"])):
-                    links.append(clean_link)
-            if len(links) >= max_links:
-                break
-        await browser.close()
-        return links
-
-# 🕷️ Scraper
-async def extract_product_info(session, url):
-    try:
-        async with session.get(url, headers={"User-Agent": "Mozilla/5.0"}, timeout=10) as response:
-            text = await response.text()
-            soup = BeautifulSoup(text, "html.parser")
-            title = soup.title.text.strip() if soup.title else ""
-            meta_desc = soup.find("meta", attrs={"name": "description"})
-            short_desc = meta_desc['content'] if meta_desc else ""
-            paragraphs = soup.find_all("p")
-            body_text = " ".join([p.text.strip() for p in paragraphs[:15] if len(p.text.strip()) > 30])
-
-            keywords = ["price", "buy", "add to cart", "mrp", "product", "brand", "description"]
-            combined_text = f"{title.lower()} {short_desc.lower()} {body_text.lower()}"
-            keyword_matches = sum(1 for word in keywords if word in combined_text)
-
-            if keyword_matches < 2 or len(body_text) < 100:
-                return {"url": url, "error": "Page doesn't appear to be a product page."}
-
-            return {
-                "url": url,
-                "title": title,
-                "short_desc": short_desc,
-                "long_desc": body_text
-            }
-    except Exception as e:
-        return {"url": url, "error": str(e)}
+async def search_product_links(query, max_links=5, pool=None, provider=None):
+    # Repeat queries are answered from the SERP cache without opening a browser
+    provider = provider or get_search_provider(pool)
+    return await provider.search(query, max_links)
 
 # 🧠 Generate SEO-Friendly Description
-async def generate_aggregated_description(product_name, descriptions):
-    combined_texts = "\n\n".join([f"Source {i+1}: {desc}" for i, desc in enumerate(descriptions)])
+def build_description_prompt(product_name, descriptions):
+    # Retailers syndicate the same copy; keep the most relevant distinct passages within budget
+    budget = PromptBudget("aggregated_description", DESCRIPTION_MODEL)
+    ranked = group_by_source(select_passages(
+        {str(i + 1): d for i, d in enumerate(descriptions)}, product_name,
+        SECTION_BUDGETS["descriptions"], DESCRIPTION_MODEL,
+    ))
+    combined_texts = budget.fit(
+        "descriptions", "\n\n".join([f"Source {i}: {desc}" for i, desc in ranked.items()])
+    )
     prompt = f"""
     Use the dependency grammar linguistic framework rather than phrase structure grammar to craft a product description. The idea is that the closer together each pair of words you're connecting is, the easier the copy will be to comprehend. Here is the topic and additional details: 
     Based on the following descriptions for "{product_name}", generate one product description.
@@ -98,68 +63,39 @@ async def generate_aggregated_description(product_name, descriptions):
     Descriptions from sources:
     {combined_texts}
     """
+    return budget.finish(prompt)
+
+async def stream_aggregated_description(product_name, descriptions, use_cache=True):
+    # Yields text deltas as they arrive; if Cohere is slow to start, Gemini gets the same
+    # prompt and whichever streams first is used
+    prompt = build_description_prompt(product_name, descriptions)
     try:
-        response = co.chat(model="command-r-plus-08-2024", message=prompt)
-        return response.text
+        async for delta in description_router.stream(prompt, use_cache):
+            yield delta
     except Exception as e:
-        return f"Error generating summary: {str(e)}"
-
-def build_humanizer_prompt(ai_description):
-    return f"""
-    
-    Rewrite the following product description so it looks and feels truly written by a human copywriter, while keeping the exact format:
-
-### Short Description:
-[ ... 2–3 lines summary ...]
-
-### Description:
-[ ... key features and details, single block ... ]
-
-### How to Use:
-[ ... step-by-step usage instructions ... ]
+        yield f"Error generating summary: {str(e)}"
 
-Your rewrite must:
-1. Preserve all headings and their order.
-2. Use varied sentence lengths and rhythm: mix short punchy lines with longer ones.
-3. Avoid cliché marketing phrases (“Get ready for...”, “This isn’t your average…”, etc.).
-4. Inject subtle, natural imperfections: mild colloquialisms (“a bit”, “kind of”), contractions (“you’ll”, “it’s”), and even occasional minor typos or slight grammatical quirks.
-5. Include a rhetorical question or two (e.g., “Want fuller hair?”, “Need something easy?”) — humans often use them casually.
-6. Use grounded, specific detail — not vague superlatives.
-7. Avoid repeating keywords or terms in close proximity.
-8. Add tiny personal touches or relatable imagery — but don’t turn it into a story or blog post.
-9. Don’t over‑optimize for SEO; write for humans, not machines.
-10. Maintain clarity and professionalism — readable, easy to skim.
-
-Here’s the original description:
-
-[PASTE AI‑GENERATED PRODUCT DESCRIPTION HERE]
-
-    {ai_description}
-    """
+async def generate_aggregated_description(product_name, descriptions):
+    parts = []
+    async for delta in stream_aggregated_description(product_name, descriptions):
+        parts.append(delta)
+    return "".join(parts)
+
+async def stream_into_job(job, field, deltas):
+    text = ""
+    async for delta in deltas:
+        text += delta
+        job.update(**{field: text})
+    return text
 
-# 🤖 Humanize AI Output
-def humanize_text_with_gemini(text):
-    try:
-        model = genai.GenerativeModel("gemini-1.5-flash")
-        prompt_text = build_humanizer_prompt(text)
-        response = model.generate_content(prompt_text)
-        return response.text
-    except Exception as e:
-        return f"[ERROR]: {str(e)}"
-    
 # 💾 Save to HF Dataset
 def save_to_huggingface_dataset(product_name, description):
-    new_data = Dataset.from_dict({
-        "product_name": [product_name],
-        "description": [description]
-    })
-    try:
-        existing = load_dataset(HF_DATASET_NAME, split="train")
-        combined = concatenate_datasets([existing, new_data])
-    except:
-        combined = new_data
-
-    combined.push_to_hub(HF_DATASET_NAME, split="train", private=False)
+    # Staged locally and shipped as a new shard once enough rows build up
+    with span("dataset.save", bytes=len(description.encode("utf-8"))):
+        get_dataset_writer().add({
+            "product_name": product_name,
+            "description": description
+        })
 
 # 🚀 Streamlit UI
 st.set_page_config(page_title="ProductSense", page_icon="🛍️", layout="wide")
@@ -171,6 +107,7 @@ if "submitted" not in st.session_state:
 
 with st.form("product_form"):
     product_name = st.text_input("Enter product name (e.g., Sebastian Volupt Shampoo 250ml):")
+    reuse = st.checkbox("Reuse earlier research for the same product", value=True)
     submitted = st.form_submit_button("Generate Description")
 
 if submitted and product_name:
@@ -180,29 +117,82 @@ elif submitted and not product_name:
     st.warning("Please enter a product name.")
     st.session_state.submitted = False
 
+async def research_product(job, product_name, reuse=True):
+    # Runs on a job worker thread: no Streamlit calls here, only job.update()
+    store = get_knowledge_store()
+    known = store.match("app", product_name) if reuse else None
+    if known is not None and known.confident and known.entry.fresh and known.entry.description:
+        # Researched recently under a near-identical name: no search, scrape or LLM call
+        job.update("Reuse", f"Earlier research for “{known.entry.name}” ({known.score:.0%} match)",
+                   sources=known.entry.info.get("sources", []), text=known.entry.description)
+        return known.entry.description, known.entry.info.get("sources", [])
+
+    if known is not None and known.confident:
+        # Too old to reuse as-is, but its sources are still the right pages to look at
+        urls = known.entry.sources
+        job.update("Scrape", f"Re-fetching {len(urls)} pages found for “{known.entry.name}”...", urls=urls)
+    else:
+        job.update("Search", "Looking up sources...")
+        urls = await search_product_links(product_name, max_links=10)
+        job.update("Scrape", f"Fetching {len(urls)} pages...", urls=urls)
+    descriptions = []
+    metadata = []
+    cache = get_page_cache()
+    # The fetcher's own session carries the browser User-Agent and connection limits
+    async with TieredFetcher(cache=cache) as fetcher:
+        scrape_tasks = [extract_product_info(fetcher.session, url, cache, fetcher) for url in urls]
+        scraped_data = await asyncio.gather(*scrape_tasks)
+    for raw in scraped_data:
+        if 'error' not in raw:
+            descriptions.append(raw['long_desc'])
+            metadata.append(raw)
+        else:
+            metadata.append(raw)
+    job.update(sources=metadata)
+
+    # Tokens land in job.partial as they arrive; the UI shows whatever is there on each poll
+    job.update("Draft", f"Writing from {len(descriptions)} product pages...")
+    ai_summary = await stream_into_job(job, "text", stream_aggregated_description(product_name, descriptions))
+    job.update("Humanize", "Rewriting the draft...")
+    human_like_summary = await stream_into_job(job, "text", stream_humanized_text(ai_summary))
+    job.update("Save", "Staging for the dataset...")
+    save_to_huggingface_dataset(product_name, human_like_summary)
+    if descriptions and not human_like_summary.startswith(("[ERROR]", "Error generating summary")):
+        store.put(KnowledgeEntry(
+            kind="app",
+            name=product_name,
+            sources=[m["url"] for m in metadata if "error" not in m],
+            info={"sources": metadata},
+            description=human_like_summary,
+        ))
+    return human_like_summary, metadata
+
 if st.session_state.submitted and product_name:
-    async def run():
-        with st.spinner("Searching and scraping..."):
-            urls = await search_product_links(product_name, max_links=10)
-            print(urls)
-            descriptions = []
-            metadata = []
-            async with aiohttp.ClientSession() as session:
-                scrape_tasks = [extract_product_info(session, url) for url in urls]
-                scraped_data = await asyncio.gather(*scrape_tasks)
-                for raw in scraped_data:
-                    if 'error' not in raw:
-                        descriptions.append(raw['long_desc'])
-                        metadata.append(raw)
-                    else:
-                        metadata.append(raw)
-
-            ai_summary = await generate_aggregated_description(product_name, descriptions)
-            human_like_summary = humanize_text_with_gemini(ai_summary)
-            save_to_huggingface_dataset(product_name, human_like_summary)
-            return human_like_summary, metadata
-
-    summary, sources = asyncio.run(run())
-    st.subheader("📝 Final Product Description")
-    st.write(summary)
+    # A rerun or another session asking for the same product attaches to the running job
+    job = get_job_manager().submit(
+        job_key(product_name, "reuse" if reuse else ""), lambda job: research_product(job, product_name, reuse)
+    )
+    st.session_state.job_id = job.id
     st.session_state.submitted = False
+
+if st.session_state.get("job_id"):
+    job = get_job_manager().get(st.session_state.job_id)
+    if job is None:
+        st.session_state.job_id = None
+    else:
+        st.session_state.job_progress = snapshot = job.snapshot()
+        render_job_progress(snapshot)
+        st.subheader("📝 Final Product Description")
+        text = snapshot["partial"].get("text", "")
+        st.markdown(text if job.done else text + "▌")
+        if snapshot["partial"].get("sources"):
+            with st.expander(f"🔗 Sources ({len(snapshot['partial']['sources'])})"):
+                for source in snapshot["partial"]["sources"]:
+                    st.markdown(f"- {source['url']}" + (f" — {source['error']}" if "error" in source else ""))
+        if job.done:
+            if job.trace is not None:
+                with st.expander("⏱️ Run timings"):
+                    render_waterfall(job.trace)
+        else:
+            time.sleep(POLL_INTERVAL)
+            st.rerun()
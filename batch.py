@@ -0,0 +1,372 @@
+# batch.py
+# Headless catalog enrichment: search -> scrape -> generate -> humanize,
+# each stage with its own worker count, results streamed to JSONL/Parquet.
+#
+#   python batch.py catalog.csv -o enriched.jsonl
+#   python batch.py catalog.jsonl -o enriched/ --format parquet --scrape-workers 16
+#   python batch.py catalog.csv -o refreshed.jsonl --refresh
+#
+# Every finished product's source fingerprints are kept (fingerprints.py). With
+# --refresh, known sources are re-fetched instead of searched for, and the LLM
+# stages only run for products whose source content materially changed;
+# price/UPC-only changes just update those fields on the previous record.
+import argparse
+import asyncio
+import csv
+import json
+import os
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterator, List, Optional, Set
+
+from browser_pool import BrowserPool
+from fetcher import TieredFetcher
+from fingerprints import FingerprintStore, content_fingerprint, diff, price_fingerprint
+from humanizer import humanize_text_with_gemini
+from llm_router import latency_stats
+from old_app import ProductResearchAgentV2, fetch_unique, search_links_concurrently
+from page_cache import get_page_cache
+from prompt_builder import prompt_metrics
+from tracing import span
+from utils import normalize_url
+
+
+# ProductInfo text plus the humanized rewrite: what a refresh carries over instead of regenerating
+GENERATED_FIELDS = (
+    "meta_title", "meta_description", "short_description", "full_description",
+    "how_to_use", "ingredients", "humanized_description",
+)
+
+
+@dataclass
+class BatchConfig:
+    search_workers: int = 2
+    scrape_workers: int = 4
+    generate_workers: int = 4
+    humanize_workers: int = 4
+    max_fetches: int = 8
+    model: str = "command-r"
+    humanize: bool = True
+    per_section: bool = False
+    refresh: bool = False
+    queue_size: int = 32
+
+
+def product_id(row: Dict) -> str:
+    return str(row.get("sku") or row.get("id") or " ".join(row["product_name"].lower().split()))
+
+
+def read_products(path: str) -> Iterator[Dict]:
+    # CSV or JSONL rows with product_name (or name), primary_keywords, secondary_keywords, optional sku/id
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith((".jsonl", ".json")):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+        for row in rows:
+            name = (row.get("product_name") or row.get("name") or "").strip()
+            if not name:
+                continue
+            product = {
+                "product_name": name,
+                "primary_keywords": (row.get("primary_keywords") or "").strip(),
+                "secondary_keywords": (row.get("secondary_keywords") or "").strip(),
+                "sku": row.get("sku") or row.get("id"),
+            }
+            product["id"] = product_id(product)
+            yield product
+
+
+class Checkpoint:
+    """Append-only list of finished product ids, read back on restart."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done: Set[str] = set()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.done = {line.strip() for line in f if line.strip()}
+
+    def mark(self, ids: List[str]) -> None:
+        if not ids:
+            return
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.writelines(f"{i}\n" for i in ids)
+            f.flush()
+            os.fsync(f.fileno())
+        self.done.update(ids)
+
+
+class JsonlSink:
+    def __init__(self, path: str):
+        self._f = open(path, "a", encoding="utf-8")
+
+    def write(self, record: Dict) -> List[str]:
+        self._f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._f.flush()
+        return [record["id"]]
+
+    def close(self) -> List[str]:
+        self._f.close()
+        return []
+
+
+class ParquetSink:
+    """Writes records as Parquet part files, one per `rows_per_file` rows.
+
+    Parquet files can't be appended to, so each row is first staged in a
+    JSONL file (synced to disk, like the checkpoint) and counts as written
+    from then on; a flush turns the staged rows into a new part file. Rows
+    staged by a run that crashed are flushed when the sink is next opened.
+    The staging file's leading underscore keeps Parquet readers off it.
+    """
+
+    def __init__(self, directory: str, rows_per_file: int = 500):
+        import pyarrow  # noqa: F401  (fail early if the optional dependency is missing)
+
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.rows_per_file = rows_per_file
+        self.staging_path = os.path.join(directory, "_staging.jsonl")
+        self._rows: List[Dict] = []
+        if os.path.exists(self.staging_path):
+            with open(self.staging_path, encoding="utf-8") as f:
+                self._rows = [json.loads(line) for line in f if line.strip()]
+        self._staged = open(self.staging_path, "a", encoding="utf-8")
+        self._flush()
+
+    def write(self, record: Dict) -> List[str]:
+        row = {k: json.dumps(v) if isinstance(v, (dict, list)) else v for k, v in record.items()}
+        self._staged.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self._staged.flush()
+        os.fsync(self._staged.fileno())
+        self._rows.append(row)
+        if len(self._rows) >= self.rows_per_file:
+            self._flush()
+        return [record["id"]]
+
+    def _flush(self) -> None:
+        if not self._rows:
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        name = f"part-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{len(os.listdir(self.directory)):05d}.parquet"
+        pq.write_table(pa.Table.from_pylist(self._rows), os.path.join(self.directory, name))
+        # The part file is complete, so the staged copies can go
+        self._staged.truncate(0)
+        self._rows = []
+
+    def close(self) -> List[str]:
+        self._flush()
+        self._staged.close()
+        os.remove(self.staging_path)
+        return []
+
+
+class BatchRunner:
+    def __init__(self, config: BatchConfig, cohere_api_key: str):
+        self.config = config
+        self.agent = ProductResearchAgentV2(
+            cohere_api_key=cohere_api_key,
+            model=config.model,
+            max_fetches=config.max_fetches,
+            cache=get_page_cache(),
+            per_section=config.per_section,
+        )
+        self.fingerprints = FingerprintStore()
+        self.pool: Optional[BrowserPool] = None
+        self.fetcher: Optional[TieredFetcher] = None
+
+    # --- stages: each takes the job dict and fills in its own fields ---
+
+    async def search(self, job: Dict) -> None:
+        if self.config.refresh:
+            job["previous"] = self.fingerprints.get(job["id"])
+            if job["previous"] is not None and job["previous"].sources:
+                job["urls"] = list(job["previous"].sources)  # re-fetched with conditional requests
+                return
+        queries = self.agent.build_queries(job["product_name"], job["primary_keywords"])
+        job["urls"] = await search_links_concurrently(queries, pool=self.pool)
+
+    async def scrape(self, job: Dict) -> None:
+        job["facts"] = {}
+        contents = await fetch_unique(
+            job["urls"],
+            max_fetches=self.config.max_fetches,
+            facts=job["facts"],
+            fetcher=self.fetcher,
+        )
+        job["texts"] = self.agent.collect_texts([contents])
+        self._compare(job)
+
+    def _compare(self, job: Dict) -> None:
+        # Fingerprint what was scraped and, when refreshing, decide how much to redo
+        texts = job["texts"]
+        job["source_fps"] = {normalize_url(url): content_fingerprint(text) for url, text in texts.items()}
+        job["content_fp"] = content_fingerprint(" ".join(texts[url] for url in sorted(texts)))
+        pricing = self.agent._extract_pricing_info(list(texts.items()), job["facts"])
+        upc = self.agent._extract_upc_code(list(texts.items()), job["facts"])
+        job["prices_fp"] = price_fingerprint(pricing, upc)
+        if not self.config.refresh:
+            return
+        previous = job.get("previous")
+        if previous is not None and not texts:
+            # Every known source failed this time: nothing to compare, keep what we had
+            job.update({k: v for k, v in previous.record.items() if k in GENERATED_FIELDS + ("upc", "pricing")})
+            job.update(refresh="unchanged", changed_sources=[])
+            return
+        change = diff(previous, job["source_fps"], job["content_fp"], job["prices_fp"])
+        job["refresh"] = change.kind
+        job["changed_sources"] = change.changed_sources
+        if not change.regenerate:
+            job.update({k: v for k, v in previous.record.items() if k in GENERATED_FIELDS})
+            job.update(upc=upc, pricing=pricing)
+
+    async def generate(self, job: Dict) -> None:
+        if job.get("refresh") in ("unchanged", "prices"):
+            return
+        info = await asyncio.to_thread(
+            self.agent.generate_product_info,
+            job["product_name"],
+            job["primary_keywords"],
+            job["secondary_keywords"],
+            job["texts"],
+            job["facts"],
+        )
+        job.update(asdict(info))
+
+    async def humanize(self, job: Dict) -> None:
+        if not self.config.humanize or job.get("refresh") in ("unchanged", "prices"):
+            return
+        draft = (
+            f"### Short Description:\n{job['short_description']}\n\n"
+            f"### Description:\n{job['full_description']}\n\n"
+            f"### How to Use:\n{job['how_to_use']}"
+        )
+        job["humanized_description"] = await asyncio.to_thread(humanize_text_with_gemini, draft)
+
+    async def _stage(self, fn, inbox: asyncio.Queue, outbox: asyncio.Queue, workers: int, downstream: int):
+        async def worker():
+            while True:
+                job = await inbox.get()
+                if job is None:
+                    return
+                if "error" not in job:
+                    try:
+                        # one trace per product and stage; export with TRACE_JSONL_PATH / TRACE_OTLP_PATH
+                        with span(f"batch.{fn.__name__}", product=job["id"]):
+                            await fn(job)
+                    except Exception as e:
+                        job["error"] = f"{fn.__name__}: {e}"
+                await outbox.put(job)
+
+        await asyncio.gather(*[worker() for _ in range(workers)])
+        for _ in range(downstream):
+            await outbox.put(None)
+
+    async def run(self, products: Iterator[Dict], sink, checkpoint: Checkpoint, errors_path: str) -> Dict[str, int]:
+        cfg = self.config
+        stages = [
+            (self.search, cfg.search_workers),
+            (self.scrape, cfg.scrape_workers),
+            (self.generate, cfg.generate_workers),
+            (self.humanize, cfg.humanize_workers),
+        ]
+        queues = [asyncio.Queue(maxsize=cfg.queue_size) for _ in range(len(stages) + 1)]
+        stats = {"queued": 0, "skipped": 0, "done": 0, "failed": 0}
+        if cfg.refresh:
+            stats.update({"new": 0, "content": 0, "prices": 0, "unchanged": 0})
+
+        async def feed():
+            for product in products:
+                if product["id"] in checkpoint.done:
+                    stats["skipped"] += 1
+                    continue
+                stats["queued"] += 1
+                await queues[0].put(product)
+            for _ in range(stages[0][1]):
+                await queues[0].put(None)
+
+        async def drain():
+            with open(errors_path, "a", encoding="utf-8") as errors:
+                while True:
+                    job = await queues[-1].get()
+                    if job is None:
+                        break
+                    job.pop("texts", None)
+                    job.pop("facts", None)
+                    previous = job.pop("previous", None)
+                    fps = {k: job.pop(k, None) for k in ("source_fps", "content_fp", "prices_fp")}
+                    if "error" in job:
+                        stats["failed"] += 1
+                        errors.write(json.dumps(job, ensure_ascii=False) + "\n")
+                        errors.flush()
+                        continue
+                    job["sources"] = sorted({normalize_url(u) for u in job.pop("urls", [])})
+                    stats["done"] += 1
+                    if "refresh" in job:
+                        stats[job["refresh"]] += 1
+                    if job.get("refresh") in ("unchanged", "prices"):
+                        # Keep the fingerprints the copy was written from, so slow drift still adds up
+                        fps.update(source_fps=previous.sources, content_fp=previous.content)
+                    if fps["source_fps"] is not None:
+                        self.fingerprints.put(
+                            job["id"], fps["source_fps"], fps["content_fp"], fps["prices_fp"], job
+                        )
+                    checkpoint.mark(sink.write(job))
+            checkpoint.mark(sink.close())
+
+        async with BrowserPool(max_pages=cfg.max_fetches + cfg.search_workers) as pool:
+            async with TieredFetcher(pool=pool, cache=self.agent.cache) as fetcher:
+                self.pool, self.fetcher = pool, fetcher
+                tasks = [feed(), drain()]
+                for i, (fn, workers) in enumerate(stages):
+                    downstream = stages[i + 1][1] if i + 1 < len(stages) else 1
+                    tasks.append(self._stage(fn, queues[i], queues[i + 1], workers, downstream))
+                await asyncio.gather(*tasks)
+        return stats
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Enrich a product catalog headlessly.")
+    parser.add_argument("input", help="CSV or JSONL with product_name, primary_keywords, secondary_keywords")
+    parser.add_argument("-o", "--output", required=True, help="JSONL file, or directory for --format parquet")
+    parser.add_argument("--format", choices=["jsonl", "parquet"], default="jsonl")
+    parser.add_argument("--model", default="command-r")
+    parser.add_argument("--search-workers", type=int, default=2)
+    parser.add_argument("--scrape-workers", type=int, default=4)
+    parser.add_argument("--generate-workers", type=int, default=4)
+    parser.add_argument("--humanize-workers", type=int, default=4)
+    parser.add_argument("--max-fetches", type=int, default=8)
+    parser.add_argument("--no-humanize", action="store_true")
+    parser.add_argument("--per-section", action="store_true", help="generate each field with its own concurrent call")
+    parser.add_argument(
+        "--refresh", action="store_true",
+        help="re-check known sources and regenerate only products whose content changed (use a new --output)",
+    )
+    args = parser.parse_args(argv)
+
+    config = BatchConfig(
+        search_workers=args.search_workers,
+        scrape_workers=args.scrape_workers,
+        generate_workers=args.generate_workers,
+        humanize_workers=args.humanize_workers,
+        max_fetches=args.max_fetches,
+        model=args.model,
+        humanize=not args.no_humanize,
+        per_section=args.per_section,
+        refresh=args.refresh,
+    )
+    base = args.output.rstrip("/")
+    sink = ParquetSink(base) if args.format == "parquet" else JsonlSink(base)
+    checkpoint = Checkpoint(base + ".checkpoint")
+    runner = BatchRunner(config, cohere_api_key=os.getenv("COHERE_API_KEY"))
+    stats = asyncio.run(runner.run(read_products(args.input), sink, checkpoint, base + ".errors.jsonl"))
+    stats["prompts"] = prompt_metrics.stats()
+    stats["llm"] = latency_stats.snapshot()
+    print(json.dumps(stats))
+
+
+if __name__ == "__main__":
+    main()
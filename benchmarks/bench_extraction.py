@@ -0,0 +1,99 @@
+# benchmarks/bench_extraction.py
+# Compare extraction backends on a corpus of saved pages.
+#
+#   python benchmarks/bench_extraction.py saved_pages/ --repeat 3 > bench_output.txt
+#
+# Without a corpus directory a synthetic set of 1-3 MB retailer-like pages is used.
+import argparse
+import glob
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extraction import BACKENDS  # noqa: E402
+
+
+def synthetic_page(size_mb: float, seed: int) -> str:
+    rng = random.Random(seed)
+    words = "shampoo volume hair scalp gentle formula sulfate free bottle ml buy cart price brand".split()
+    parts = [
+        "<html><head><title>Volumizing Shampoo 250 ml | Shop</title>",
+        '<meta name="description" content="Lightweight volumizing shampoo for fine hair.">',
+        '<script type="application/ld+json">{"@type": "Product", "name": "Volumizing Shampoo",'
+        ' "offers": {"@type": "Offer", "price": "24.99", "priceCurrency": "USD"}}</script>',
+        "</head><body>",
+    ]
+    size = sum(len(p) for p in parts)
+    while size < size_mb * 1024 * 1024:
+        block = rng.choice(["nav", "script", "p", "div", "style"])
+        text = " ".join(rng.choice(words) for _ in range(rng.randint(5, 60)))
+        if block == "script":
+            chunk = f"<script>window.__state = {json.dumps({'k': text})};</script>"
+        elif block == "style":
+            chunk = f"<style>.c{rng.randint(0, 999)} {{ color: #{rng.randint(0, 0xffffff):06x}; }}</style>"
+        elif block == "nav":
+            chunk = "<nav>" + "".join(f"<a href='/c/{w}'>{w}</a>" for w in text.split()[:10]) + "</nav>"
+        else:
+            chunk = f"<{block} class='x'><span>{text}</span> <b>{rng.choice(words)}</b></{block}>"
+        parts.append(chunk)
+        size += len(chunk)
+    parts.append("</body></html>")
+    return "".join(parts)
+
+
+def load_corpus(directory: str):
+    if directory:
+        for path in sorted(glob.glob(os.path.join(directory, "*.htm*"))):
+            with open(path, "rb") as f:
+                yield os.path.basename(path), f.read().decode("utf-8", errors="replace")
+        return
+    for i, size in enumerate([1.0, 1.5, 2.0, 3.0]):
+        yield f"synthetic-{i}.html", synthetic_page(size, seed=i)
+
+
+def run(corpus, repeat: int):
+    results = {}
+    outputs = {}
+    total_bytes = sum(len(html.encode("utf-8")) for _, html in corpus)
+    for name, extract in BACKENDS.items():
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            outputs[name] = [extract(html) for _, html in corpus]
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+        results[name] = {
+            "pages": len(corpus),
+            "seconds": round(best, 4),
+            "ms_per_page": round(best * 1000 / max(len(corpus), 1), 2),
+            "mb_per_s": round(total_bytes / (1024 * 1024) / best, 2) if best else None,
+        }
+    # Field agreement against the BeautifulSoup reference
+    for name in results:
+        if name == "bs4":
+            continue
+        same = {"title": 0, "meta_description": 0, "json_ld": 0}
+        for ref, got in zip(outputs["bs4"], outputs[name]):
+            for key in same:
+                same[key] += getattr(ref, key) == getattr(got, key)
+        results[name]["matches_bs4"] = same
+        if results["bs4"]["seconds"]:
+            results[name]["speedup_vs_bs4"] = round(results["bs4"]["seconds"] / results[name]["seconds"], 2)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HTML extraction backends.")
+    parser.add_argument("corpus", nargs="?", default="", help="directory of saved .html pages")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    corpus = list(load_corpus(args.corpus))
+    print(json.dumps({"benchmark": "extraction", "results": run(corpus, args.repeat)}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
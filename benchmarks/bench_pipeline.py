@@ -0,0 +1,290 @@
+# benchmarks/bench_pipeline.py
+# Offline benchmarks for scrape -> extract -> prompt, against recorded fixtures.
+#
+#   python benchmarks/bench_pipeline.py --repeat 20 > pipeline.json
+#   python benchmarks/bench_pipeline.py --baseline pipeline.json --tolerance 0.25   # exits 1 on regression
+#   python benchmarks/bench_pipeline.py --record benchmarks/fixtures/recorded --product "Fanola No Yellow Shampoo"
+#
+# Pages are served by a local HTTP server, search results come from the fixture
+# manifest and the LLM is a stub that sleeps --llm-latency seconds, so no network
+# access or API keys are needed. --record snapshots pages from the live page cache
+# into a new fixture directory.
+import argparse
+import asyncio
+import json
+import os
+import re
+import statistics
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, "benchmarks", "fixtures")
+sys.path.insert(0, ROOT)
+
+# Isolate every on-disk cache and lift the per-host rate limit before the
+# project modules read their settings at import time (parse-pool workers
+# inherit the environment, so they use the same scratch directory)
+_SCRATCH = os.environ.setdefault("BENCH_SCRATCH", tempfile.mkdtemp(prefix="bench-pipeline-"))
+os.environ.update({
+    "PAGE_CACHE_PATH": os.path.join(_SCRATCH, "pages.sqlite"),
+    "LLM_CACHE_PATH": os.path.join(_SCRATCH, "llm.sqlite"),
+    "SERP_CACHE_PATH": os.path.join(_SCRATCH, "serp.sqlite"),
+    "FETCH_DECISIONS_PATH": os.path.join(_SCRATCH, "render_domains.json"),
+    "FETCH_HOST_RATE": "10000",
+    "FETCH_HOST_BURST": "10000",
+    "FETCH_HOST_CONCURRENCY": "64",
+})
+
+
+def summarize(samples_ms):
+    ordered = sorted(samples_ms)
+    return {
+        "runs": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered), 3),
+        "p50_ms": round(ordered[len(ordered) // 2], 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+        "ops_per_s": round(1000 / statistics.fmean(ordered), 2) if statistics.fmean(ordered) else None,
+    }
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+class StubCohereClient:
+    """Stands in for cohere.Client: fixed latency, canned numbered response."""
+
+    def __init__(self, response: str, latency: float):
+        self.response = response
+        self.latency = latency
+        self.calls = 0
+
+    def chat(self, model, message, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency)
+        return SimpleNamespace(text=self.response)
+
+
+class NoLLMCache:
+    def get(self, key):
+        return None
+
+    def put(self, *args, **kwargs):
+        pass
+
+
+def load_manifest(directory):
+    with open(os.path.join(directory, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    # "serp" pages are what the full run finds; "extra_pages" (non-product pages that a
+    # real run would escalate to a browser) only feed the per-function benchmarks
+    pages = {}
+    for rel in manifest["serp"] + manifest.get("extra_pages", []):
+        with open(os.path.join(directory, rel), encoding="utf-8") as f:
+            pages[rel] = f.read()
+    with open(os.path.join(directory, manifest["llm_response"]), encoding="utf-8") as f:
+        response = f.read()
+    return manifest, pages, response
+
+
+async def start_server(directory, latency):
+    # Static fixture pages, each answer delayed by `latency` seconds to mimic a remote site
+    from aiohttp import web
+
+    async def page(request):
+        await asyncio.sleep(latency)
+        path = os.path.normpath(os.path.join(directory, request.match_info["path"]))
+        if not path.startswith(os.path.abspath(directory)) or not os.path.isfile(path):
+            raise web.HTTPNotFound()
+        with open(path, encoding="utf-8") as f:
+            return web.Response(text=f.read(), content_type="text/html")
+
+    app = web.Application()
+    app.router.add_get("/{path:.*}", page)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+def bench_clean_html(pages, repeat):
+    from extraction import BACKENDS
+    from utils import clean_html
+
+    results = {}
+    for backend in BACKENDS:
+        samples = []
+        for html in pages.values():
+            samples += timed(lambda: clean_html(html, backend), repeat)
+        results[f"clean_html[{backend}]"] = summarize(samples)
+    return results
+
+
+async def bench_extract_product_info(urls, repeat):
+    import aiohttp
+
+    from scraper import extract_product_info
+
+    per_page, per_batch, errors = [], [], 0
+
+    async def one(session, url):
+        start = time.perf_counter()
+        result = await extract_product_info(session, url)
+        per_page.append((time.perf_counter() - start) * 1000)
+        return result
+
+    async with aiohttp.ClientSession() as session:
+        await asyncio.gather(*[one(session, u) for u in urls])  # warm the parse pool
+        per_page.clear()
+        for _ in range(repeat):
+            start = time.perf_counter()
+            results = await asyncio.gather(*[one(session, u) for u in urls])
+            per_batch.append((time.perf_counter() - start) * 1000)
+            errors += sum(1 for r in results if "error" in r and "product page" not in r["error"])
+    batch = summarize(per_batch)
+    batch["pages_per_s"] = round(len(urls) * 1000 / batch["mean_ms"], 2) if batch["mean_ms"] else None
+    batch["errors"] = errors
+    return {"extract_product_info": summarize(per_page), "extract_product_info[batch]": batch}
+
+
+def bench_agent_helpers(agent, pages, response, repeat):
+    from parse_pool import analyze_page
+
+    texts, facts = {}, {}
+    for url, html in pages.items():
+        texts[url], facts[url] = analyze_page(url, html)
+    items = list(texts.items())
+    return {
+        "_extract_pricing_info[structured]": summarize(timed(lambda: agent._extract_pricing_info(items, facts), repeat)),
+        "_extract_pricing_info[text]": summarize(timed(lambda: agent._extract_pricing_info(items), repeat)),
+        "_parse_ai_response": summarize(timed(lambda: agent._parse_ai_response(response), repeat * 10)),
+    }
+
+
+async def bench_full_run(agent, product, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        info = await agent.run_search_and_scrape(
+            product["product_name"], product["primary_keywords"], product["secondary_keywords"]
+        )
+        samples.append((time.perf_counter() - start) * 1000)
+    result = summarize(samples)
+    result["parsed_fields"] = sum(1 for v in (info.meta_title, info.full_description, info.how_to_use) if v)
+    result["upc"] = info.upc
+    return {"full_product_run": result}
+
+
+async def run(args):
+    from old_app import ProductResearchAgentV2
+
+    manifest, pages, response = load_manifest(args.fixtures)
+    runner, base = await start_server(args.fixtures, args.server_latency)
+    try:
+        urls = [f"{base}/{rel}" for rel in manifest["serp"]]
+        serp_path = os.path.join(_SCRATCH, "serp.json")
+        with open(serp_path, "w", encoding="utf-8") as f:
+            json.dump({"*": urls}, f)
+        os.environ["SEARCH_PROVIDER"] = f"fixture:{serp_path}"
+
+        agent = ProductResearchAgentV2(cohere_api_key="offline", max_fetches=8, cache=None)
+        stub = StubCohereClient(response, args.llm_latency)
+        agent.cohere_gen.client = stub
+        agent.cohere_gen.cache = NoLLMCache()
+
+        results = {}
+        results.update(bench_clean_html(pages, args.repeat))
+        all_urls = [f"{base}/{rel}" for rel in pages]
+        results.update(await bench_extract_product_info(all_urls, args.repeat))
+        results.update(bench_agent_helpers(agent, pages, response, args.repeat))
+        results.update(await bench_full_run(agent, manifest["product"], max(1, args.repeat // 4)))
+        results["full_product_run"]["llm_calls"] = stub.calls
+    finally:
+        await runner.cleanup()
+    return results
+
+
+def compare(results, baseline_path, tolerance):
+    # A metric regresses when its p50 is more than `tolerance` slower than the baseline
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    regressions = []
+    for name, current in results.items():
+        before = baseline.get(name, {}).get("p50_ms")
+        if before and current.get("p50_ms", 0) > before * (1 + tolerance):
+            regressions.append({"metric": name, "baseline_p50_ms": before, "p50_ms": current["p50_ms"]})
+    return regressions
+
+
+def record(directory, cache_path, product_name, limit):
+    from page_cache import PageCache
+
+    cache = PageCache(path=cache_path)
+    os.makedirs(os.path.join(directory, "pages"), exist_ok=True)
+    serp = []
+    for url in cache.urls()[:limit]:
+        entry = cache.get(url)
+        if entry is None or not entry.html:
+            continue
+        slug = re.sub(r"[^a-z0-9]+", "-", url.lower().split("://", 1)[-1]).strip("-")[:80]
+        rel = f"pages/{slug}.html"
+        with open(os.path.join(directory, rel), "w", encoding="utf-8") as f:
+            f.write(entry.html)
+        serp.append(rel)
+    with open(os.path.join(FIXTURES, "llm_response.txt"), encoding="utf-8") as src, \
+            open(os.path.join(directory, "llm_response.txt"), "w", encoding="utf-8") as dst:
+        dst.write(src.read())
+    manifest = {
+        "product": {"product_name": product_name, "primary_keywords": "", "secondary_keywords": ""},
+        "serp": serp,
+        "llm_response": "llm_response.txt",
+    }
+    with open(os.path.join(directory, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return len(serp)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scrape/extract/prompt pipeline offline.")
+    parser.add_argument("--fixtures", default=FIXTURES, help="directory with manifest.json and pages/")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="stub LLM delay per call, seconds")
+    parser.add_argument("--server-latency", type=float, default=0.0, help="fixture server delay per page, seconds")
+    parser.add_argument("--baseline", help="earlier output of this script to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--record", metavar="DIR", help="write a fixture directory from the page cache and exit")
+    parser.add_argument("--cache-path", default=os.path.join(".cache", "pages.sqlite"))
+    parser.add_argument("--product", default="", help="product name stored in a recorded manifest")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.record:
+        count = record(args.record, args.cache_path, args.product, args.limit)
+        print(json.dumps({"recorded": count, "directory": args.record}))
+        return
+
+    results = asyncio.run(run(args))
+    output = {
+        "benchmark": "pipeline",
+        "config": {"repeat": args.repeat, "llm_latency": args.llm_latency, "server_latency": args.server_latency},
+        "results": results,
+    }
+    if args.baseline:
+        output["regressions"] = compare(results, args.baseline, args.tolerance)
+    print(json.dumps(output, indent=2))
+    if output.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+# browser_pool.py
+import asyncio
+import glob
+import os
+import subprocess
+import sys
+import threading
+from contextlib import asynccontextmanager
+from typing import Optional
+
+DEFAULT_BROWSERS = int(os.getenv("BROWSER_POOL_BROWSERS", "1"))
+DEFAULT_MAX_PAGES = int(os.getenv("BROWSER_POOL_MAX_PAGES", "4"))
+DEFAULT_RECYCLE_AFTER = int(os.getenv("BROWSER_POOL_RECYCLE_AFTER", "50"))
+
+
+_browser_checked: Optional[bool] = None
+_browser_lock = threading.Lock()
+
+
+def _browsers_dir() -> Optional[str]:
+    custom = os.getenv("PLAYWRIGHT_BROWSERS_PATH")
+    if custom == "0":
+        return None  # browsers live inside the playwright package; nothing cheap to look at
+    if custom:
+        return custom
+    if sys.platform == "darwin":
+        return os.path.expanduser("~/Library/Caches/ms-playwright")
+    if sys.platform == "win32":
+        return os.path.join(os.getenv("LOCALAPPDATA", os.path.expanduser("~")), "ms-playwright")
+    return os.path.join(os.getenv("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "ms-playwright")
+
+
+def browser_installed() -> bool:
+    directory = _browsers_dir()
+    return directory is None or bool(glob.glob(os.path.join(directory, "chromium*")))
+
+
+def ensure_browser() -> bool:
+    # Checked once per process, right before the first launch; Chromium is only
+    # downloaded if it is actually missing (replaces `playwright install` at import)
+    global _browser_checked
+    with _browser_lock:
+        if _browser_checked is None:
+            if not browser_installed():
+                subprocess.run([sys.executable, "-m", "playwright", "install", "chromium"], check=False)
+            _browser_checked = browser_installed()
+        return _browser_checked
+
+
+class _BrowserSlot:
+    def __init__(self):
+        self.browser = None
+        self.in_flight = 0
+        self.uses = 0
+
+
+class BrowserPool:
+    """Owns a few long-lived Chromium processes and hands out isolated contexts.
+
+    Every `page()` gets a fresh BrowserContext (cookies/storage are not shared),
+    at most `max_pages` are open at once, and a browser is relaunched once it
+    has served `recycle_after` contexts to keep its memory in check.
+    """
+
+    def __init__(
+        self,
+        browsers: int = DEFAULT_BROWSERS,
+        max_pages: int = DEFAULT_MAX_PAGES,
+        recycle_after: int = DEFAULT_RECYCLE_AFTER,
+        headless: bool = True,
+    ):
+        self.headless = headless
+        self.recycle_after = recycle_after
+        self._slots = [_BrowserSlot() for _ in range(max(1, browsers))]
+        self._semaphore = asyncio.Semaphore(max(1, max_pages))
+        self._lock = asyncio.Lock()
+        self._playwright = None
+
+    async def start(self) -> "BrowserPool":
+        if self._playwright is None:
+            from playwright.async_api import async_playwright
+
+            self._playwright = await async_playwright().start()
+        return self
+
+    async def close(self) -> None:
+        for slot in self._slots:
+            if slot.browser is not None:
+                try:
+                    await slot.browser.close()
+                except Exception:
+                    pass
+                slot.browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    async def __aenter__(self) -> "BrowserPool":
+        return await self.start()
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def _acquire_slot(self) -> _BrowserSlot:
+        async with self._lock:
+            await self.start()
+            slot = min(self._slots, key=lambda s: s.in_flight)
+            worn_out = slot.uses >= self.recycle_after and slot.in_flight == 0
+            if slot.browser is not None and (worn_out or not slot.browser.is_connected()):
+                try:
+                    await slot.browser.close()
+                except Exception:
+                    pass
+                slot.browser = None
+            if slot.browser is None:
+                await asyncio.to_thread(ensure_browser)
+                slot.browser = await self._playwright.chromium.launch(headless=self.headless)
+                slot.uses = 0
+            slot.in_flight += 1
+            slot.uses += 1
+            return slot
+
+    @asynccontextmanager
+    async def context(self, **context_kwargs):
+        async with self._semaphore:
+            slot = await self._acquire_slot()
+            try:
+                ctx = await slot.browser.new_context(**context_kwargs)
+                try:
+                    yield ctx
+                finally:
+                    await ctx.close()
+            finally:
+                slot.in_flight -= 1
+
+    @asynccontextmanager
+    async def page(self, **context_kwargs):
+        async with self.context(**context_kwargs) as ctx:
+            yield await ctx.new_page()
+
+
+@asynccontextmanager
+async def borrowed_pool(pool: Optional[BrowserPool] = None, **pool_kwargs):
+    # Reuse the caller's pool, or run a short-lived one for standalone calls
+    if pool is not None:
+        yield pool
+        return
+    async with BrowserPool(**pool_kwargs) as temp:
+        yield temp
@@ -0,0 +1,191 @@
+# dataset_writer.py
+import atexit
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+
+from tracing import span
+
+HF_DATASET_NAME = "Jay-Rajput/product_desc"
+DEFAULT_STAGING_PATH = os.getenv("DATASET_STAGING_PATH", os.path.join(".cache", "dataset_staging.jsonl"))
+
+
+class HubShardBackend:
+    """Uploads each shard as a new file under data/; existing files are never touched."""
+
+    def __init__(self, repo_id: str = HF_DATASET_NAME, token: Optional[str] = None, private: bool = False):
+        self.repo_id = repo_id
+        self.private = private
+        from huggingface_hub import HfApi
+
+        self.api = HfApi(token=token or os.getenv("HF_TOKEN"))
+        self._repo_ready = False
+
+    def upload(self, local_path: str, shard_name: str) -> None:
+        if not self._repo_ready:
+            self.api.create_repo(self.repo_id, repo_type="dataset", private=self.private, exist_ok=True)
+            self._repo_ready = True
+        self.api.upload_file(
+            path_or_fileobj=local_path,
+            path_in_repo=f"data/{shard_name}",
+            repo_id=self.repo_id,
+            repo_type="dataset",
+            commit_message=f"Add shard {shard_name}",
+        )
+
+
+class LocalShardBackend:
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def upload(self, local_path: str, shard_name: str) -> None:
+        target = os.path.join(self.directory, "data", shard_name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copyfile(local_path, target)
+
+
+class BufferedDatasetWriter:
+    """Stages records in a local JSONL file and ships them as append-only Parquet shards.
+
+    A flush happens once `max_records` rows or `max_bytes` of staged data have
+    built up, or the oldest staged row is older than `max_age` seconds; a timer
+    thread covers the age limit when no more rows arrive. Rows left in the
+    staging file by a previous process are shipped on the next flush. A failed
+    upload keeps the rows staged and is retried after `retry_delay` seconds,
+    so saving a row never fails the job that produced it.
+    """
+
+    def __init__(
+        self,
+        backend,
+        staging_path: str = DEFAULT_STAGING_PATH,
+        split: str = "train",
+        max_records: int = 50,
+        max_bytes: int = 8 * 1024 * 1024,
+        max_age: float = 600,
+        retry_delay: float = 60,
+    ):
+        self.backend = backend
+        self.staging_path = staging_path
+        self.split = split
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.retry_delay = retry_delay
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        self._retry_at = 0.0
+        self._closed = False
+        os.makedirs(os.path.dirname(os.path.abspath(staging_path)), exist_ok=True)
+        self._count = 0
+        self._first_at: Optional[float] = None
+        if os.path.exists(staging_path):
+            with open(staging_path, encoding="utf-8") as f:
+                self._count = sum(1 for line in f if line.strip())
+            if self._count:
+                self._first_at = 0.0
+        with self._lock:
+            self._schedule_locked()
+
+    def add(self, record: Dict) -> Optional[str]:
+        with self._lock:
+            with open(self.staging_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._count += 1
+            if self._first_at is None:
+                self._first_at = time.time()
+            if self._due():
+                return self._try_flush_locked()
+            self._schedule_locked()
+        return None
+
+    def _due_at(self) -> float:
+        # Right away once a size limit is hit, else when the oldest row turns max_age;
+        # never before a failed upload's retry delay is up
+        if self._count >= self.max_records or os.path.getsize(self.staging_path) >= self.max_bytes:
+            due_at = 0.0
+        else:
+            due_at = (self._first_at or 0.0) + self.max_age
+        return max(due_at, self._retry_at)
+
+    def _due(self) -> bool:
+        return bool(self._count) and time.time() >= self._due_at()
+
+    def _schedule_locked(self) -> None:
+        # One pending timer at a time, so staged rows ship even if no more arrive
+        if self._timer is not None or self._closed or not self._count:
+            return
+        self._timer = threading.Timer(max(0.0, self._due_at() - time.time()), self._on_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _on_timer(self) -> None:
+        with self._lock:
+            self._timer = None
+            if self._due():
+                self._try_flush_locked()
+            self._schedule_locked()
+
+    def flush(self) -> Optional[str]:
+        with self._lock:
+            return self._flush_locked()
+
+    def _try_flush_locked(self) -> Optional[str]:
+        try:
+            return self._flush_locked()
+        except Exception as e:
+            self._retry_at = time.time() + self.retry_delay
+            print("Dataset flush failed, rows kept in", self.staging_path, "for a retry:", e)
+            if self._timer is not None:
+                self._timer.cancel()  # set for max_age; the retry may be due sooner
+                self._timer = None
+            return None
+        finally:
+            self._schedule_locked()
+
+    def _flush_locked(self) -> Optional[str]:
+        if not self._count:
+            return None
+        with open(self.staging_path, encoding="utf-8") as f:
+            rows: List[Dict] = [json.loads(line) for line in f if line.strip()]
+        shard_name = f"{self.split}-{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}.parquet"
+        with span("dataset.flush", shard=shard_name, rows=len(rows)) as s, tempfile.TemporaryDirectory() as tmp:
+            local_path = os.path.join(tmp, shard_name)
+            from datasets import Dataset  # slow to import; only needed when a shard is written
+
+            Dataset.from_list(rows).to_parquet(local_path)
+            s.set(bytes=os.path.getsize(local_path))
+            self.backend.upload(local_path, shard_name)
+        # Only drop the staged rows once the shard is safely uploaded
+        open(self.staging_path, "w").close()
+        self._count = 0
+        self._first_at = None
+        self._retry_at = 0.0
+        return shard_name
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        try:
+            self.flush()
+        except Exception as e:
+            print("Dataset flush failed, rows kept in", self.staging_path, e)
+
+
+_shared_writer: Optional[BufferedDatasetWriter] = None
+
+
+def get_dataset_writer() -> BufferedDatasetWriter:
+    global _shared_writer
+    if _shared_writer is None:
+        _shared_writer = BufferedDatasetWriter(HubShardBackend())
+        atexit.register(_shared_writer.close)
+    return _shared_writer
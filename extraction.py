@@ -0,0 +1,192 @@
+# extraction.py
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Union
+
+from bs4 import BeautifulSoup
+
+try:
+    from lxml import etree
+except ImportError:  # lxml is in requirements.txt, but keep the bs4 path usable without it
+    etree = None
+
+# Subtrees that never carry product copy; the lxml backend skips them while parsing
+SKIP_TAGS = {"script", "style", "noscript", "template", "nav", "svg", "iframe", "head"}
+META_PREFIXES = ("og:", "product:")
+
+
+@dataclass
+class PageExtract:
+    title: str = ""
+    meta_description: str = ""
+    paragraphs: List[str] = field(default_factory=list)
+    json_ld: List[Union[Dict, List]] = field(default_factory=list)
+    text: str = ""
+    # OpenGraph/product meta tags (property or name -> content) and microdata itemprops
+    meta: Dict[str, str] = field(default_factory=dict)
+    microdata: Dict[str, List[str]] = field(default_factory=dict)
+
+
+def _load_json_ld(raw: str, out: List) -> None:
+    try:
+        out.append(json.loads(raw))
+    except ValueError:
+        pass
+
+
+def extract_with_bs4(html: Union[str, bytes]) -> PageExtract:
+    # Reference path: the BeautifulSoup logic the app used before
+    soup = BeautifulSoup(html, "html.parser")
+    page = PageExtract()
+    page.title = soup.title.text.strip() if soup.title else ""
+    meta_desc = soup.find("meta", attrs={"name": "description"})
+    page.meta_description = meta_desc.get("content", "") if meta_desc else ""
+    for script in soup.find_all("script", attrs={"type": "application/ld+json"}):
+        _load_json_ld(script.string or "", page.json_ld)
+    for tag in soup.find_all("meta"):
+        key = (tag.get("property") or tag.get("name") or "").lower()
+        if key.startswith(META_PREFIXES) and key not in page.meta:
+            page.meta[key] = tag.get("content") or ""
+    for tag in soup.find_all(attrs={"itemprop": True}):
+        value = tag.get("content") or tag.get("value") or tag.get_text(" ", strip=True)
+        for prop in tag["itemprop"].split():
+            page.microdata.setdefault(prop, []).append(value.strip())
+    page.paragraphs = [p.text.strip() for p in soup.find_all("p")]
+    for script in soup(["script", "style"]):
+        script.decompose()
+    page.text = soup.get_text(separator=" ", strip=True)
+    return page
+
+
+class _StreamCollector:
+    """lxml parser target: sees start/data/end events, never builds a tree."""
+
+    def __init__(self):
+        self.page = PageExtract()
+        self._texts: List[str] = []
+        self._pending: List[str] = []
+        self._skip_depth = 0
+        self._in_title = False
+        self._title_parts: List[str] = []
+        self._p_depth = 0
+        self._p_parts: List[str] = []
+        self._ld_parts = None
+        self._depth = 0
+        self._itemprops: List = []
+
+    def _flush_pending(self) -> None:
+        if self._pending:
+            chunk = "".join(self._pending).strip()
+            if chunk:
+                self._texts.append(chunk)
+            self._pending = []
+
+    def start(self, tag, attrib):
+        tag = tag.lower() if isinstance(tag, str) else ""
+        self._flush_pending()
+        if tag == "script" and (attrib.get("type") or "").lower() == "application/ld+json":
+            self._ld_parts = []
+        if tag == "meta":
+            key = (attrib.get("property") or attrib.get("name") or "").lower()
+            if key == "description" and not self.page.meta_description:
+                self.page.meta_description = attrib.get("content") or ""
+            elif key.startswith(META_PREFIXES) and key not in self.page.meta:
+                self.page.meta[key] = attrib.get("content") or ""
+        self._depth += 1
+        if attrib.get("itemprop"):
+            value = attrib.get("content") or attrib.get("value")
+            if value is not None:
+                for prop in attrib["itemprop"].split():
+                    self.page.microdata.setdefault(prop, []).append(value.strip())
+            else:
+                self._itemprops.append((attrib["itemprop"].split(), self._depth, []))
+        if tag == "title" and not self.page.title:
+            self._in_title = True
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag == "p" and not self._skip_depth:
+            self._p_depth += 1
+
+    def end(self, tag):
+        tag = tag.lower() if isinstance(tag, str) else ""
+        self._flush_pending()
+        while self._itemprops and self._itemprops[-1][1] >= self._depth:
+            props, _, parts = self._itemprops.pop()
+            value = " ".join(" ".join(parts).split())
+            for prop in props:
+                self.page.microdata.setdefault(prop, []).append(value)
+        self._depth -= 1
+        if tag == "script" and self._ld_parts is not None:
+            _load_json_ld("".join(self._ld_parts), self.page.json_ld)
+            self._ld_parts = None
+        if tag == "title" and self._in_title:
+            self.page.title = "".join(self._title_parts).strip()
+            self._in_title = False
+        if tag in SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag == "p" and self._p_depth:
+            self._p_depth -= 1
+            if not self._p_depth:
+                self.page.paragraphs.append("".join(self._p_parts).strip())
+                self._p_parts = []
+
+    def data(self, text):
+        if self._ld_parts is not None:
+            self._ld_parts.append(text)
+        if self._in_title:
+            self._title_parts.append(text)
+        if self._skip_depth:
+            return
+        for _, _, parts in self._itemprops:
+            parts.append(text)
+        self._pending.append(text)
+        if self._p_depth:
+            self._p_parts.append(text)
+
+    def comment(self, text):
+        pass
+
+    def close(self) -> PageExtract:
+        self._flush_pending()
+        if self.page.title:
+            self._texts.insert(0, self.page.title)
+        self.page.text = " ".join(self._texts)
+        return self.page
+
+
+class StreamingExtractor:
+    """Incremental lxml extractor: feed() chunks as they arrive, close() for the result."""
+
+    def __init__(self):
+        self._collector = _StreamCollector()
+        self._parser = etree.HTMLParser(target=self._collector, recover=True, no_network=True)
+
+    def feed(self, chunk: Union[str, bytes]) -> None:
+        self._parser.feed(chunk)
+
+    @property
+    def partial(self) -> PageExtract:
+        return self._collector.page
+
+    def close(self) -> PageExtract:
+        return self._parser.close()
+
+
+def extract_with_lxml(html: Union[str, bytes]) -> PageExtract:
+    extractor = StreamingExtractor()
+    extractor.feed(html)
+    return extractor.close()
+
+
+BACKENDS: Dict[str, Callable[[Union[str, bytes]], PageExtract]] = {"bs4": extract_with_bs4}
+if etree is not None:
+    BACKENDS["lxml"] = extract_with_lxml
+
+DEFAULT_BACKEND = os.getenv("EXTRACTION_BACKEND", "lxml" if etree is not None else "bs4")
+
+
+def extract_page(html: Union[str, bytes], backend: str = None) -> PageExtract:
+    if not html:
+        return PageExtract()
+    return BACKENDS[backend or DEFAULT_BACKEND](html)
@@ -0,0 +1,229 @@
+# fetcher.py
+import asyncio
+import json
+import os
+import re
+import threading
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from browser_pool import BrowserPool
+from page_cache import HTTPClientError, NonHTMLContent, PageCache, fetch_with_cache
+from parse_pool import analyze_page, run_in_parse_pool
+from politeness import PolitenessScheduler, RetryableHTTPError, get_scheduler, polite_goto
+from render_profile import block_requests, page_html, profile_for, wait_for_content
+from structured_data import ProductFacts
+from tracing import span
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115 Safari/537.36"
+)
+DEFAULT_DECISIONS_PATH = os.getenv("FETCH_DECISIONS_PATH", os.path.join(".cache", "render_domains.json"))
+MIN_TEXT_CHARS = 200
+# A render-first domain still gets a plain GET every FETCH_PROBE_EVERY fetches
+FETCH_PROBE_EVERY = int(os.getenv("FETCH_PROBE_EVERY", "20"))
+
+_SPA_SHELL = re.compile(r'<div[^>]+id=["\'](?:root|app|__next|__nuxt|svelte)["\'][^>]*>\s*</div>', re.IGNORECASE)
+_PRODUCT_MARKERS = ("add to cart", "add to bag", "add to basket", "buy now", "price", "in stock")
+
+
+@dataclass
+class FetchResult:
+    url: str
+    html: str
+    text: str
+    facts: ProductFacts = field(default_factory=ProductFacts)
+    rendered: bool = False
+
+
+def needs_render(html: str, text: str, facts: ProductFacts) -> bool:
+    # Heuristics for "the product content isn't in the server HTML"
+    if len(text) < MIN_TEXT_CHARS:
+        return True
+    lowered = text.lower()
+    if _SPA_SHELL.search(html) and len(text) < 2000:
+        return True
+    if "enable javascript" in lowered and len(text) < 2000:
+        return True
+    if facts.offers or facts.gtin:
+        return False
+    return not any(marker in lowered for marker in _PRODUCT_MARKERS)
+
+
+class RenderDecisions:
+    """Per-domain tally of plain-HTTP successes vs. escalations, kept on disk.
+
+    A render-first domain is still tried over plain HTTP on every
+    `probe_every`-th fetch (try_http); when such a probe finds the product
+    content, the domain's render tally is cleared and it goes back to plain
+    HTTP. Counts are kept in memory; the file is rewritten only when a
+    domain's render_first() answer flips and on flush() (TieredFetcher's
+    exit), not on every fetch.
+    """
+
+    def __init__(self, path: str = DEFAULT_DECISIONS_PATH, probe_every: int = FETCH_PROBE_EVERY):
+        self.path = path
+        self.probe_every = probe_every
+        self._lock = threading.Lock()
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._since_probe: Dict[str, int] = {}
+        self._dirty = False
+        if os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    self._counts = json.load(f)
+            except (OSError, ValueError):
+                self._counts = {}
+
+    def render_first(self, host: str) -> bool:
+        counts = self._counts.get(host, {})
+        return counts.get("render", 0) >= 2 and counts.get("render", 0) > counts.get("http", 0)
+
+    def try_http(self, host: str) -> bool:
+        if not self.render_first(host):
+            return True
+        with self._lock:
+            skipped = self._since_probe.get(host, 0) + 1
+            probe = skipped >= self.probe_every
+            self._since_probe[host] = 0 if probe else skipped
+        return probe
+
+    def record(self, host: str, outcome: str) -> None:
+        with self._lock:
+            before = self.render_first(host)
+            counts = self._counts.setdefault(host, {})
+            counts[outcome] = counts.get(outcome, 0) + 1
+            if outcome == "http" and before:
+                counts["render"] = 0  # a probe found the product in the plain HTML again
+            self._dirty = True
+            flipped = self.render_first(host) != before
+        if flipped:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            self._dirty = False
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._counts, f)
+            os.replace(tmp, self.path)
+
+
+class TieredFetcher:
+    """Plain aiohttp GET first; headless render only when the HTML lacks product content.
+
+    Domains that keep needing a browser are remembered and go straight to rendering,
+    apart from an occasional plain-HTTP probe. A 4xx answer raises HTTPClientError
+    rather than escalating.
+    """
+
+    def __init__(
+        self,
+        pool: Optional[BrowserPool] = None,
+        cache: Optional[PageCache] = None,
+        session: Optional[aiohttp.ClientSession] = None,
+        decisions: Optional[RenderDecisions] = None,
+        scheduler: Optional[PolitenessScheduler] = None,
+        max_connections: int = 32,
+        timeout: float = 15,
+    ):
+        self.pool = pool
+        self.cache = cache
+        self.session = session
+        self.decisions = decisions or RenderDecisions()
+        self.scheduler = scheduler
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._own_session = False
+        self._own_pool = False
+
+    async def __aenter__(self) -> "TieredFetcher":
+        if self.scheduler is None:
+            self.scheduler = get_scheduler()
+        if self.session is None:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections, ttl_dns_cache=300),
+                headers={"User-Agent": USER_AGENT},
+            )
+            self._own_session = True
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        if self._own_session:
+            await self.session.close()
+            self.session = None
+        if self._own_pool and self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+        await asyncio.to_thread(self.decisions.flush)
+
+    async def fetch(self, url: str) -> FetchResult:
+        with span("fetch", url=url) as s:
+            result = await self._fetch(url)
+            s.set(rendered=result.rendered, text_chars=len(result.text))
+            return result
+
+    async def _fetch(self, url: str) -> FetchResult:
+        host = (urlsplit(url).hostname or "").lower()
+        if self.decisions.try_http(host):
+            try:
+                html = await self.scheduler.call(
+                    url, lambda: fetch_with_cache(self.session, url, self.cache, timeout=self.timeout)
+                )
+                text, facts = await run_in_parse_pool(analyze_page, url, html)
+                if not needs_render(html, text, facts):
+                    self.decisions.record(host, "http")
+                    return FetchResult(url, html, text, facts, rendered=False)
+            except RetryableHTTPError:
+                # Still throttled after backing off: a browser would only hit the same wall
+                raise
+            except (NonHTMLContent, HTTPClientError):
+                # A PDF, an image or a missing page won't turn into a product page by rendering it
+                raise
+            except Exception:
+                pass
+        result = await self.render(url)
+        self.decisions.record(host, "render")
+        return result
+
+    async def render(self, url: str) -> FetchResult:
+        if self.cache is not None:
+            entry = self.cache.get(url, variant="rendered")
+            if entry is not None and entry.fresh:
+                text, facts = await run_in_parse_pool(analyze_page, url, entry.html)
+                return FetchResult(url, entry.html, entry.text or text, facts, rendered=True)
+        if self.pool is None:
+            self.pool = BrowserPool()
+            self._own_pool = True
+        profile = profile_for(url)
+        with span("fetch.render", url=url, lean=profile.lean) as s:
+            stats: Dict[str, int] = {}
+            async with self.pool.page(user_agent=USER_AGENT) as page:
+                # Assets and trackers are aborted, and the wait is for product content
+                # rather than networkidle, which beacons keep from ever arriving
+                await block_requests(page, profile, stats)
+                await polite_goto(page, url, self.scheduler, timeout=30000, wait_until="domcontentloaded")
+                s.set(content_ready=await wait_for_content(page, profile))
+                html = await page_html(page, profile)
+            s.set(bytes=len(html), **{f"net_{k}": v for k, v in stats.items()})
+        text, facts = await run_in_parse_pool(analyze_page, url, html)
+        if self.cache is not None:
+            self.cache.put(url, html, text, variant="rendered")
+        return FetchResult(url, html, text, facts, rendered=True)
+
+
+@asynccontextmanager
+async def borrowed_fetcher(fetcher: Optional[TieredFetcher] = None, **fetcher_kwargs):
+    if fetcher is not None:
+        yield fetcher
+        return
+    async with TieredFetcher(**fetcher_kwargs) as temp:
+        yield temp
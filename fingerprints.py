@@ -0,0 +1,132 @@
+# fingerprints.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from ranking import simhash, tokenize
+
+FINGERPRINT_PATH = os.getenv("FINGERPRINT_PATH", os.path.join(".cache", "fingerprints.sqlite"))
+# Bits of 64 a source's SimHash may move before its content counts as changed.
+# Tighter than ranking.SIMHASH_DISTANCE: a rewritten ingredient list should count.
+CHANGE_DISTANCE = int(os.getenv("REFRESH_CHANGE_BITS", "3"))
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    product_id TEXT PRIMARY KEY,
+    sources TEXT NOT NULL,
+    content TEXT NOT NULL,
+    prices TEXT NOT NULL,
+    record TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+def content_fingerprint(text: str) -> int:
+    # Numbers are left out: prices are compared on their own, and review counts,
+    # ratings and stock levels move every week without the copy needing to
+    return simhash([t for t in tokenize(text or "") if not any(c.isdigit() for c in t)])
+
+
+def price_fingerprint(pricing: Dict, upc: str) -> str:
+    payload = json.dumps({"pricing": pricing, "upc": upc}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class ProductState:
+    product_id: str
+    sources: Dict[str, int]  # normalized URL -> content fingerprint
+    content: int  # fingerprint of all sources together
+    prices: str
+    record: Dict
+    updated_at: float
+
+
+@dataclass
+class Change:
+    kind: str  # "new" | "content" | "prices" | "unchanged"
+    changed_sources: List[str] = field(default_factory=list)
+
+    @property
+    def regenerate(self) -> bool:
+        return self.kind in ("new", "content")
+
+
+def diff(previous: Optional[ProductState], sources: Dict[str, int], content: int, prices: str,
+         distance: int = CHANGE_DISTANCE) -> Change:
+    """What changed since `previous` was stored.
+
+    A source has changed if it's new or its fingerprint moved more than
+    `distance` bits; that's material unless the new text is a near copy of
+    a source the product already had (a syndicated listing). Sources that
+    vanished (down, blocked, dropped from the SERP) don't count: the old
+    copy was still written from good material.
+    """
+    if previous is None:
+        return Change("new", sorted(sources))
+    changed = []
+    if content != previous.content:
+        changed = [
+            url for url, fp in sources.items()
+            if url not in previous.sources or _bits(fp, previous.sources[url]) > distance
+        ]
+    material = any(
+        all(_bits(sources[url], old) > distance for old in previous.sources.values()) for url in changed
+    )
+    if material:
+        return Change("content", sorted(changed))
+    return Change("prices" if prices != previous.prices else "unchanged", sorted(changed))
+
+
+def _bits(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class FingerprintStore:
+    """Per product: source fingerprints, price/UPC hash and the last record written."""
+
+    def __init__(self, path: str = FINGERPRINT_PATH):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+
+    def get(self, product_id: str) -> Optional[ProductState]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT sources, content, prices, record, updated_at FROM products WHERE product_id = ?",
+                (product_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        # Fingerprints are unsigned 64-bit, past SQLite's INTEGER, so they're stored as hex
+        return ProductState(
+            product_id=product_id,
+            sources={url: int(fp, 16) for url, fp in json.loads(row[0]).items()},
+            content=int(row[1], 16),
+            prices=row[2],
+            record=json.loads(row[3]),
+            updated_at=row[4],
+        )
+
+    def put(self, product_id: str, sources: Dict[str, int], content: int, prices: str, record: Dict) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO products (product_id, sources, content, prices, record, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (product_id, json.dumps({u: f"{fp:016x}" for u, fp in sources.items()}), f"{content:016x}",
+                 prices, json.dumps(record, ensure_ascii=False), time.time()),
+            )
+            self._db.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,58 @@
+# humanizer.py
+from llm_router import LLMError, LLMRouter, Route
+from prompt_builder import PromptBudget
+
+HUMANIZER_MODEL = "gemini-1.5-flash"
+
+def build_humanizer_prompt(ai_description):
+    budget = PromptBudget("humanizer", HUMANIZER_MODEL)
+    ai_description = budget.fit("draft", ai_description)
+    return budget.finish(f"""
+    
+    Rewrite the following product description so it looks and feels truly written by a human copywriter, while keeping the exact format:
+
+### Short Description:
+[ ... 2–3 lines summary ...]
+
+### Description:
+[ ... key features and details, single block ... ]
+
+### How to Use:
+[ ... step-by-step usage instructions ... ]
+
+Your rewrite must:
+1. Preserve all headings and their order.
+2. Use varied sentence lengths and rhythm: mix short punchy lines with longer ones.
+3. Avoid cliché marketing phrases (“Get ready for...”, “This isn’t your average…”, etc.).
+4. Inject subtle, natural imperfections: mild colloquialisms (“a bit”, “kind of”), contractions (“you’ll”, “it’s”), and even occasional minor typos or slight grammatical quirks.
+5. Include a rhetorical question or two (e.g., “Want fuller hair?”, “Need something easy?”) — humans often use them casually.
+6. Use grounded, specific detail — not vague superlatives.
+7. Avoid repeating keywords or terms in close proximity.
+8. Add tiny personal touches or relatable imagery — but don’t turn it into a story or blog post.
+9. Don’t over‑optimize for SEO; write for humans, not machines.
+10. Maintain clarity and professionalism — readable, easy to skim.
+
+Here’s the original description:
+
+[PASTE AI‑GENERATED PRODUCT DESCRIPTION HERE]
+
+    {ai_description}
+    """)
+
+# 🤖 Humanize AI Output
+# Gemini first; a slow or failing request is raced against Cohere with the same prompt
+humanizer_router = LLMRouter([Route("gemini", HUMANIZER_MODEL), Route("cohere", "command-r-plus")])
+
+def humanize_text_with_gemini(text, use_cache=True):
+    try:
+        return humanizer_router.complete(build_humanizer_prompt(text), use_cache).text
+    except LLMError as e:
+        return f"[ERROR]: {str(e)}"
+
+async def stream_humanized_text(text, use_cache=True):
+    # Same rewrite as humanize_text_with_gemini, yielded chunk by chunk
+    try:
+        async for delta in humanizer_router.stream(build_humanizer_prompt(text), use_cache):
+            yield delta
+    except Exception as e:
+        yield f"[ERROR]: {str(e)}"
@@ -0,0 +1,144 @@
+# jobs.py
+import asyncio
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from tracing import Trace, trace
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_TTL = float(os.getenv("JOB_TTL", "3600"))  # finished jobs stay pollable this long
+POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+
+
+@dataclass
+class StageUpdate:
+    stage: str
+    detail: str
+    at: float
+
+
+@dataclass
+class Job:
+    id: str
+    key: str
+    status: str = "queued"  # queued -> running -> done | failed
+    stages: List[StageUpdate] = field(default_factory=list)
+    partial: Dict[str, Any] = field(default_factory=dict)
+    result: Any = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    trace: Optional[Trace] = None
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def update(self, stage: Optional[str] = None, detail: str = "", **partial) -> None:
+        # Called from the pipeline as it goes; `partial` holds results worth showing early
+        with self._lock:
+            if stage is not None:
+                self.stages.append(StageUpdate(stage, detail, time.time()))
+            self.partial.update(partial)
+
+    def snapshot(self) -> Dict[str, Any]:
+        # Plain-dict copy for the UI thread (kept in st.session_state)
+        with self._lock:
+            return {
+                "id": self.id,
+                "key": self.key,
+                "status": self.status,
+                "stages": [vars(s).copy() for s in self.stages],
+                "partial": dict(self.partial),
+                "error": self.error,
+                "elapsed": (self.finished_at or time.time()) - self.created_at,
+            }
+
+
+class JobManager:
+    """Runs research pipelines on worker threads, one event loop per job.
+
+    Jobs are keyed: submitting a key that already has a queued or running job
+    returns that job instead of starting a second one, so a Streamlit rerun or
+    another user asking for the same product just attaches to it.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, ttl: float = JOB_TTL):
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Job] = {}
+        self._active: Dict[str, str] = {}  # key -> id of the in-flight job
+
+    def submit(self, key: str, fn: Callable[[Job], Awaitable[Any]]) -> Job:
+        with self._lock:
+            self._prune_locked()
+            active = self._active.get(key)
+            if active is not None:
+                return self._jobs[active]
+            job = Job(id=uuid.uuid4().hex[:12], key=key)
+            self._jobs[job.id] = job
+            self._active[key] = job.id
+        self._executor.submit(self._run, job, fn)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job: Job, fn: Callable[[Job], Awaitable[Any]]) -> None:
+        job.status = "running"
+        try:
+            with trace("job", key=job.key) as run_trace:
+                job.trace = run_trace
+                job.result = asyncio.run(fn(job))
+            job.status = "done"
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                if self._active.get(job.key) == job.id:
+                    del self._active[job.key]
+
+    def _prune_locked(self) -> None:
+        cutoff = time.time() - self.ttl
+        for job_id in [j.id for j in self._jobs.values() if j.done and (j.finished_at or 0) < cutoff]:
+            del self._jobs[job_id]
+
+
+_manager: Optional[JobManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    # Module state outlives Streamlit reruns and is shared by every session in the process
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager()
+        return _manager
+
+
+def job_key(*parts: str) -> str:
+    return "|".join(" ".join((p or "").lower().split()) for p in parts)
+
+
+def render_job_progress(snapshot: Dict[str, Any]) -> None:
+    import streamlit as st
+
+    stages = snapshot["stages"]
+    for i, update in enumerate(stages):
+        finished = i < len(stages) - 1 or snapshot["status"] == "done"
+        icon = "✅" if finished else ("❌" if snapshot["status"] == "failed" else "⏳")
+        st.markdown(f"{icon} **{update['stage']}** {update['detail']}")
+    st.caption(f"Job {snapshot['id']} · {snapshot['status']} · {snapshot['elapsed']:.1f}s")
+    if snapshot["error"]:
+        st.error(snapshot["error"])
@@ -0,0 +1,227 @@
+# knowledge_store.py
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import zlib
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+KNOWLEDGE_PATH = os.getenv("KNOWLEDGE_PATH", os.path.join(".cache", "knowledge.sqlite"))
+KNOWLEDGE_TTL = float(os.getenv("KNOWLEDGE_TTL", str(30 * 24 * 3600)))  # older entries only lend their sources
+KNOWLEDGE_MATCH = float(os.getenv("KNOWLEDGE_MATCH", "0.9"))  # trigram similarity for a confident match
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    norm_name TEXT NOT NULL,
+    name TEXT NOT NULL,
+    sources TEXT NOT NULL,
+    data BLOB NOT NULL,
+    updated_at REAL NOT NULL,
+    UNIQUE (kind, norm_name)
+);
+"""
+# External-content FTS5 index over the normalized names, kept in step by triggers
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+    norm_name, content='products', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS products_ai AFTER INSERT ON products BEGIN
+    INSERT INTO products_fts (rowid, norm_name) VALUES (new.id, new.norm_name);
+END;
+CREATE TRIGGER IF NOT EXISTS products_ad AFTER DELETE ON products BEGIN
+    INSERT INTO products_fts (products_fts, rowid, norm_name) VALUES ('delete', old.id, old.norm_name);
+END;
+CREATE TRIGGER IF NOT EXISTS products_au AFTER UPDATE ON products BEGIN
+    INSERT INTO products_fts (products_fts, rowid, norm_name) VALUES ('delete', old.id, old.norm_name);
+    INSERT INTO products_fts (rowid, norm_name) VALUES (new.id, new.norm_name);
+END;
+"""
+
+_UNITS = {
+    "millilitre": "ml", "milliliter": "ml", "millilitres": "ml", "milliliters": "ml", "mls": "ml",
+    "litre": "l", "liter": "l", "litres": "l", "liters": "l", "ltr": "l",
+    "gram": "g", "grams": "g", "gr": "g", "kilogram": "kg", "kilograms": "kg",
+    "ounce": "oz", "ounces": "oz", "fl oz": "floz", "fl. oz": "floz", "fl.oz": "floz",
+    "pack": "pk", "count": "ct", "pcs": "ct", "pieces": "ct",
+}
+_UNIT_PATTERN = re.compile(
+    r"(\d+(?:\.\d+)?)\s*(" + "|".join(sorted(map(re.escape, _UNITS), key=len, reverse=True)) + r"|ml|l|g|kg|oz|floz|pk|ct)\b"
+)
+
+
+def normalize_product_name(name: str) -> str:
+    # "Sebastian Volupt Shampoo 250 mL" and "sebastian volupt shampoo 250ml" become the same string
+    text = unicodedata.normalize("NFKD", name or "").encode("ascii", "ignore").decode("ascii").lower()
+    text = _UNIT_PATTERN.sub(lambda m: m.group(1) + _UNITS.get(m.group(2), m.group(2)), text)
+    text = re.sub(r"(?:\bno\.?|#)\s*(?=\d)", "no", text)  # "No. 3", "No.3" and "#3" are all "no3"
+    text = re.sub(r"[^a-z0-9.]+", " ", text)
+    return " ".join(t.strip(".") for t in text.split() if t.strip("."))
+
+
+# Words that don't tell two products apart when only one name has them
+_FILLER_WORDS = frozenset({"a", "an", "and", "by", "for", "in", "of", "the", "with"})
+
+
+def _identifiers(norm_name: str) -> Set[str]:
+    # Sizes, model numbers and generations ("250ml", "no3", "s23", "4"): two names
+    # that disagree on these are different products however alike they read
+    return {t for t in norm_name.split() if any(c.isdigit() for c in t)}
+
+
+def _words(norm_name: str) -> Set[str]:
+    return {t for t in norm_name.split() if not any(c.isdigit() for c in t) and t not in _FILLER_WORDS}
+
+
+def _trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _dice(a: str, b: str) -> float:
+    ta, tb = _trigrams(a), _trigrams(b)
+    return 2 * len(ta & tb) / (len(ta) + len(tb)) if ta and tb else 0.0
+
+
+def name_similarity(a: str, b: str) -> float:
+    # Dice coefficient over character trigrams of the normalized names
+    if _identifiers(a) != _identifiers(b):
+        return 0.0
+    return _dice(a, b)
+
+
+def unmatched_words(a: str, b: str) -> Tuple[str, ...]:
+    """Words of either name with no counterpart in the other ("refill", "mini").
+
+    A typo or plural ("shampoo"/"shampoos") still counts as a counterpart.
+    """
+    wa, wb = _words(a), _words(b)
+    return tuple(sorted(
+        w for words, other in ((wa - wb, wb), (wb - wa, wa)) for w in words
+        if not any(w.rstrip("s") == o.rstrip("s") or _dice(w, o) >= 0.75 for o in other)
+    ))
+
+
+@dataclass
+class KnowledgeEntry:
+    kind: str  # "app" (description flow) or "agent" (ProductResearchAgentV2)
+    name: str
+    sources: List[str]
+    texts: Dict[str, str] = field(default_factory=dict)  # source URL -> scraped text
+    info: Dict = field(default_factory=dict)  # extracted/generated fields: ProductInfo, source metadata, ...
+    description: str = ""
+    params: Dict = field(default_factory=dict)  # inputs the generated fields depend on (keywords, model)
+    updated_at: float = 0.0
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() - self.updated_at < KNOWLEDGE_TTL
+
+
+@dataclass
+class KnowledgeMatch:
+    entry: KnowledgeEntry
+    score: float
+    extra_words: Tuple[str, ...] = ()  # from unmatched_words: "Oil" vs "Oil Refill" gives ("refill",)
+
+    @property
+    def confident(self) -> bool:
+        return self.score >= KNOWLEDGE_MATCH and not self.extra_words
+
+
+class KnowledgeStore:
+    """Earlier research by product, looked up by fuzzy product name.
+
+    A trigram FTS5 index narrows the candidates, and a normalized-name
+    trigram similarity (with every token holding a digit, such as 250ml, no3
+    or s23, required to agree) picks the match. A match is only confident
+    when no word appears in just one of the names. Without FTS5 trigram
+    support (SQLite < 3.34) the same scoring runs over every row of the kind,
+    and the index is rebuilt the first time the file is opened with it.
+    """
+
+    def __init__(self, path: str = KNOWLEDGE_PATH):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        indexed = self._db.execute("SELECT 1 FROM sqlite_master WHERE name = 'products_fts'").fetchone()
+        try:
+            self._db.executescript(_FTS_SCHEMA)
+            self._fts = True
+        except sqlite3.OperationalError:
+            self._fts = False
+        if self._fts and not indexed:
+            # Rows written while FTS5 trigram was unavailable never went through the triggers
+            self._db.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+            self._db.commit()
+
+    def put(self, entry: KnowledgeEntry) -> None:
+        norm = normalize_product_name(entry.name)
+        data = zlib.compress(json.dumps({
+            "texts": entry.texts, "info": entry.info, "description": entry.description, "params": entry.params,
+        }, ensure_ascii=False).encode("utf-8"), 3)
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO products (kind, norm_name, name, sources, data, updated_at) VALUES (?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (kind, norm_name) DO UPDATE SET"
+                " name = excluded.name, sources = excluded.sources, data = excluded.data, updated_at = excluded.updated_at",
+                (entry.kind, norm, entry.name, json.dumps(entry.sources), data, time.time()),
+            )
+            self._db.commit()
+
+    def match(self, kind: str, name: str, limit: int = 20) -> Optional[KnowledgeMatch]:
+        # Best stored entry for `name`, confident or not; None if nothing shares a size and trigrams
+        norm = normalize_product_name(name)
+        if not norm:
+            return None
+        with self._lock:
+            if self._fts:
+                grams = sorted({g for g in _trigrams(norm) if g.strip() and len(g) == 3 and '"' not in g})
+                query = " OR ".join(f'"{g}"' for g in grams)
+                rows = self._db.execute(
+                    "SELECT p.id, p.norm_name FROM products_fts JOIN products p ON p.id = products_fts.rowid"
+                    " WHERE products_fts MATCH ? AND p.kind = ? ORDER BY bm25(products_fts) LIMIT ?",
+                    (query, kind, limit),
+                ).fetchall() if query else []
+            else:
+                rows = self._db.execute("SELECT id, norm_name FROM products WHERE kind = ?", (kind,)).fetchall()
+        # Names without extra words rank first, then by similarity
+        scored = []
+        for row_id, n in rows:
+            score = name_similarity(norm, n)
+            if score > 0.0:
+                extra = unmatched_words(norm, n)
+                scored.append(((not extra, score), row_id, extra))
+        if not scored:
+            return None
+        (_, score), row_id, extra = max(scored, key=lambda c: c[0])
+        return KnowledgeMatch(self._load(row_id), score, extra)
+
+    def _load(self, row_id: int) -> KnowledgeEntry:
+        with self._lock:
+            kind, name, sources, data, updated_at = self._db.execute(
+                "SELECT kind, name, sources, data, updated_at FROM products WHERE id = ?", (row_id,)
+            ).fetchone()
+        payload = json.loads(zlib.decompress(data).decode("utf-8"))
+        return KnowledgeEntry(kind=kind, name=name, sources=json.loads(sources), updated_at=updated_at, **payload)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+_shared_store: Optional[KnowledgeStore] = None
+
+
+def get_knowledge_store() -> KnowledgeStore:
+    global _shared_store
+    if _shared_store is None:
+        _shared_store = KnowledgeStore()
+    return _shared_store
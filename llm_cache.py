@@ -0,0 +1,124 @@
+# llm_cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, Optional
+
+DEFAULT_LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(".cache", "llm.sqlite"))
+DEFAULT_LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+DEFAULT_LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    provider TEXT NOT NULL,
+    model TEXT NOT NULL,
+    response BLOB NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at);
+"""
+
+
+def make_key(provider: str, model: str, prompt: str, **params) -> str:
+    payload = json.dumps(
+        {"provider": provider, "model": model, "prompt": prompt, "params": params},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """Content-addressed store of LLM responses, keyed by make_key()."""
+
+    def __init__(
+        self,
+        path: str = DEFAULT_LLM_CACHE_PATH,
+        ttl: float = DEFAULT_LLM_CACHE_TTL,
+        max_bytes: int = DEFAULT_LLM_CACHE_MAX_BYTES,
+    ):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.metrics = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] >= self.ttl:
+                if row is not None:
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+                    self.metrics["evictions"] += 1
+                self.metrics["misses"] += 1
+                return None
+            self._db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.metrics["hits"] += 1
+        return zlib.decompress(row[0]).decode("utf-8")
+
+    def put(self, key: str, response: str, provider: str = "", model: str = "") -> None:
+        blob = zlib.compress(response.encode("utf-8"), 3)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, provider, model, response, created_at, accessed_at, size)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, provider, model, blob, now, now, len(blob)),
+            )
+            self.metrics["stores"] += 1
+            self._evict_locked(now)
+            self._db.commit()
+
+    def _evict_locked(self, now: float) -> None:
+        expired = self._db.execute("DELETE FROM responses WHERE created_at <= ?", (now - self.ttl,)).rowcount
+        self.metrics["evictions"] += max(expired, 0)
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = int(self.max_bytes * 0.9)
+        stale = []
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY accessed_at ASC"):
+            if total <= target:
+                break
+            stale.append((key,))
+            total -= size
+        self._db.executemany("DELETE FROM responses WHERE key = ?", stale)
+        self.metrics["evictions"] += len(stale)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.metrics["hits"] + self.metrics["misses"]
+        with self._lock:
+            entries, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {
+            **self.metrics,
+            "hit_rate": self.metrics["hits"] / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": size,
+        }
+
+
+_shared_cache: Optional[LLMCache] = None
+
+
+def get_llm_cache() -> LLMCache:
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = LLMCache()
+    return _shared_cache
@@ -0,0 +1,429 @@
+# llm_router.py
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import AsyncIterator, Deque, Dict, List, Optional, Sequence
+
+from llm_cache import LLMCache, get_llm_cache, make_key
+from prompt_builder import count_tokens
+from providers import cohere_async_client, cohere_client, gemini
+from tracing import record_span, span
+
+# A duplicate request goes to the next route once the current one has taken
+# longer than its own p95 (clamped to [LLM_HEDGE_MIN, LLM_HEDGE_MAX]); before
+# a route has LLM_MIN_SAMPLES calls behind it, LLM_HEDGE_DEFAULT is used.
+# LLM_HEDGE_AFTER pins the delay; LLM_HEDGE=0 turns hedging off (failures
+# still fall through to the next route).
+LLM_HEDGE = os.getenv("LLM_HEDGE", "1") != "0"
+LLM_HEDGE_AFTER = float(os.getenv("LLM_HEDGE_AFTER", "0"))
+LLM_HEDGE_MIN = float(os.getenv("LLM_HEDGE_MIN", "2"))
+LLM_HEDGE_MAX = float(os.getenv("LLM_HEDGE_MAX", "30"))
+LLM_HEDGE_DEFAULT = float(os.getenv("LLM_HEDGE_DEFAULT", "15"))
+LLM_MIN_SAMPLES = int(os.getenv("LLM_MIN_SAMPLES", "5"))
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
+LATENCY_WINDOW = 200
+
+
+class LLMError(Exception):
+    """Every route failed for a prompt."""
+
+
+@dataclass(frozen=True)
+class Route:
+    provider: str  # "cohere" | "gemini"
+    model: str
+    api: str = "chat"  # cohere also has the legacy "generate" endpoint
+
+    @property
+    def name(self) -> str:
+        return f"{self.provider}:{self.model}" + (f":{self.api}" if self.api != "chat" else "")
+
+
+def parse_routes(spec: str) -> List[Route]:
+    # "cohere:command-r,gemini:gemini-1.5-flash,cohere:command-r:generate"
+    routes = []
+    for part in spec.split(","):
+        fields = [f.strip() for f in part.split(":")]
+        if len(fields) >= 2 and all(fields):
+            routes.append(Route(*fields[:3]))
+    return routes
+
+
+def gemini_available() -> bool:
+    return bool(os.getenv("GEMINI_API_KEY"))
+
+
+@dataclass
+class LLMResult:
+    text: str
+    route: Route
+    cached: bool = False
+    hedged: bool = False  # answered by a duplicate or fallback request, not the first route
+
+
+class LatencyStats:
+    """Recent call latencies per route, for ranking routes and timing hedges.
+
+    Plain calls and streams are kept apart ("call" vs "ttft", time to first
+    token). Failures count towards a route's error rate but not its latency.
+    """
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples: Dict[tuple, Deque[float]] = {}
+        self._errors: Dict[tuple, Deque[bool]] = {}
+
+    def record(self, route: Route, seconds: float, ok: bool, kind: str = "call") -> None:
+        key = (route.name, kind)
+        with self._lock:
+            self._errors.setdefault(key, deque(maxlen=self.window)).append(not ok)
+            if ok:
+                self._samples.setdefault(key, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, route: Route, q: float, kind: str = "call") -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples.get((route.name, kind), ()))
+        if len(samples) < LLM_MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def error_rate(self, route: Route, kind: str = "call") -> float:
+        with self._lock:
+            errors = self._errors.get((route.name, kind), ())
+            return sum(errors) / len(errors) if len(errors) >= LLM_MIN_SAMPLES else 0.0
+
+    def rank(self, routes: Sequence[Route], kind: str = "call") -> List[Route]:
+        # Routes failing more often than not go last; the rest keep the configured
+        # order until every one of them has enough samples, then fastest p50 first
+        p50s = [self.percentile(r, 0.5, kind) for r in routes]
+        known = all(p is not None for p in p50s)
+        order = sorted(
+            range(len(routes)),
+            key=lambda i: (self.error_rate(routes[i], kind) > 0.5, p50s[i] if known else i),
+        )
+        return [routes[i] for i in order]
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            keys = list(self._errors)
+        out = {}
+        for name, kind in keys:
+            with self._lock:
+                samples = sorted(self._samples.get((name, kind), ()))
+                errors = list(self._errors[(name, kind)])
+            out[f"{name} {kind}"] = {
+                "count": len(errors),
+                "errors": sum(errors),
+                **{f"p{int(q * 100)}_ms": _ms(samples, q) for q in (0.5, 0.95, 0.99)},
+            }
+        return out
+
+
+def _ms(sorted_seconds: List[float], q: float) -> Optional[float]:
+    if not sorted_seconds:
+        return None
+    return round(sorted_seconds[min(len(sorted_seconds) - 1, int(q * len(sorted_seconds)))] * 1000, 1)
+
+
+latency_stats = LatencyStats()
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    # SDK calls block, so attempts run on threads. Losing hedges can't be
+    # cancelled mid-request; they finish in the background and still feed
+    # latency_stats, hence the headroom over LLM_CONCURRENCY.
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=LLM_CONCURRENCY * 2, thread_name_prefix="llm")
+        return _executor
+
+
+class LLMRouter:
+    """Sends a prompt to the first of several routes, hedging and falling back.
+
+        router = LLMRouter([Route("cohere", "command-r"), Route("gemini", "gemini-1.5-flash")])
+        result = router.complete(prompt)           # LLMResult, raises LLMError
+        results = router.complete_many(prompts)    # independent prompts, concurrently
+        async for delta in router.stream(prompt):  # first route to produce a token wins
+            ...
+
+    If the running request is slower than its route's recent p95, the next
+    route gets the same prompt and whichever answers first is used; a failed
+    request starts the next route at once. Responses are cached per route
+    with the same keys the rest of the app uses (make_key(provider, model,
+    prompt)), so a hit from any route is served without a call.
+    """
+
+    def __init__(
+        self,
+        routes: Sequence[Route],
+        api_keys: Optional[Dict[str, str]] = None,
+        cache: Optional[LLMCache] = None,
+        clients: Optional[Dict[str, object]] = None,
+        async_clients: Optional[Dict[str, object]] = None,
+        hedge: bool = LLM_HEDGE,
+        hedge_after: float = LLM_HEDGE_AFTER,
+        stats: LatencyStats = latency_stats,
+    ):
+        if not routes:
+            raise ValueError("LLMRouter needs at least one route")
+        self.routes = list(routes)
+        self.api_keys = api_keys or {}
+        self._cache = cache
+        self.clients = clients or {}  # provider -> SDK client, built on first use otherwise
+        self.async_clients = async_clients or {}  # provider -> async SDK client, for stream()
+        self.hedge = hedge
+        self.hedge_after = hedge_after
+        self.stats = stats
+
+    @property
+    def cache(self) -> LLMCache:
+        # Opened on first use so a module-level router costs nothing at import
+        if self._cache is None:
+            self._cache = get_llm_cache()
+        return self._cache
+
+    @cache.setter
+    def cache(self, value: LLMCache) -> None:
+        self._cache = value
+
+    def client(self, provider: str):
+        if provider not in self.clients:
+            if provider == "cohere":
+                self.clients[provider] = cohere_client(self.api_keys.get("cohere"))
+            elif provider == "gemini":
+                self.clients[provider] = gemini()
+            else:
+                raise LLMError(f"unknown provider {provider!r}")
+        return self.clients[provider]
+
+    def async_client(self, provider: str):
+        # Never the sync client: its calls would block the event loop. Unless one was
+        # given, each event loop gets its own, since the connection pool belongs to it
+        if provider in self.async_clients:
+            return self.async_clients[provider]
+        if provider == "cohere":
+            return cohere_async_client(self.api_keys.get("cohere"))
+        raise LLMError(f"no async client for provider {provider!r}")
+
+    def hedge_delay(self, route: Route, kind: str = "call") -> Optional[float]:
+        if not self.hedge:
+            return None
+        if self.hedge_after > 0:
+            return self.hedge_after
+        p95 = self.stats.percentile(route, 0.95, kind)
+        if p95 is None:
+            return LLM_HEDGE_DEFAULT
+        return min(LLM_HEDGE_MAX, max(LLM_HEDGE_MIN, p95))
+
+    def _key(self, route: Route, prompt: str, schema: Optional[Dict] = None) -> str:
+        # Schema-constrained answers are cached apart from free-text ones
+        if schema is None:
+            return make_key(route.provider, route.model, prompt)
+        return make_key(route.provider, route.model, prompt, schema=schema)
+
+    def _cached(self, routes: Sequence[Route], prompt: str, schema: Optional[Dict] = None) -> Optional[LLMResult]:
+        for route in routes:
+            text = self.cache.get(self._key(route, prompt, schema))
+            if text is not None:
+                return LLMResult(text, route, cached=True)
+        return None
+
+    def _call(self, route: Route, prompt: str, schema: Optional[Dict] = None) -> str:
+        # With a JSON schema, Cohere chat and Gemini are asked for constrained JSON;
+        # the legacy generate endpoint can't be, so the prompt has to ask for it too
+        client = self.client(route.provider)
+        if route.provider == "gemini":
+            kwargs = {}
+            if schema is not None:
+                kwargs["generation_config"] = {"response_mime_type": "application/json", "response_schema": schema}
+            return client.GenerativeModel(route.model).generate_content(prompt, **kwargs).text
+        if route.api == "generate":
+            return client.generate(model=route.model, prompt=prompt).generations[0].text.strip()
+        kwargs = {}
+        if schema is not None:
+            kwargs["response_format"] = {"type": "json_object", "schema": schema}
+        return client.chat(model=route.model, message=prompt, **kwargs).text.strip()
+
+    def _attempt(self, route: Route, prompt: str, hedged: bool, schema: Optional[Dict] = None) -> str:
+        start = time.perf_counter()
+        with span("llm.attempt", route=route.name, hedged=hedged):
+            try:
+                text = self._call(route, prompt, schema)
+            except Exception:
+                self.stats.record(route, time.perf_counter() - start, ok=False)
+                raise
+        self.stats.record(route, time.perf_counter() - start, ok=True)
+        return text
+
+    def complete(self, prompt: str, use_cache: bool = True, schema: Optional[Dict] = None) -> LLMResult:
+        routes = self.stats.rank(self.routes)
+        primary = routes[0]
+        with span(
+            "llm", provider=primary.provider, model=primary.model, prompt_tokens=count_tokens(prompt, primary.model)
+        ) as s:
+            if use_cache:
+                hit = self._cached(routes, prompt, schema)
+                if hit is not None:
+                    s.set(cache="hit", route=hit.route.name, output_tokens=count_tokens(hit.text, hit.route.model))
+                    return hit
+            s.set(cache="miss")
+            remaining = list(routes)
+            pending = {}
+            errors = []
+
+            def launch(hedged: bool) -> None:
+                route = remaining.pop(0)
+                # copy_context so attempt spans nest under this one
+                future = _get_executor().submit(contextvars.copy_context().run, self._attempt, route, prompt, hedged, schema)
+                pending[future] = (route, hedged)
+                s.add("attempts")
+
+            launch(False)
+            while pending:
+                delay = self.hedge_delay(primary) if remaining else None
+                done, _ = wait(pending, timeout=delay, return_when=FIRST_COMPLETED)
+                if not done:
+                    launch(True)  # slower than usual: race the next route against it
+                    continue
+                for future in done:
+                    route, hedged = pending.pop(future)
+                    try:
+                        text = future.result()
+                    except Exception as e:
+                        errors.append(f"{route.name}: {type(e).__name__}: {e}")
+                        continue
+                    result = LLMResult(text, route, hedged=route != primary)
+                    s.set(route=route.name, hedged=hedged, output_tokens=count_tokens(text, route.model))
+                    if use_cache:
+                        self.cache.put(self._key(route, prompt, schema), text,
+                                       provider=route.provider, model=route.model)
+                    return result
+                if remaining:
+                    launch(True)  # a route failed: start the next one without waiting
+            s.error = "; ".join(errors)[:500]
+            raise LLMError("; ".join(errors))
+
+    async def acomplete(self, prompt: str, use_cache: bool = True, schema: Optional[Dict] = None) -> LLMResult:
+        return await asyncio.to_thread(self.complete, prompt, use_cache, schema)
+
+    def complete_many(
+        self, prompts: Sequence[str], use_cache: bool = True, schemas: Optional[Sequence[Optional[Dict]]] = None
+    ) -> List[Optional[LLMResult]]:
+        # Independent prompts at once (schemas[i] goes with prompts[i]); a prompt
+        # whose routes all failed comes back as None
+        schemas = list(schemas) if schemas is not None else [None] * len(prompts)
+
+        def one(prompt: str, schema: Optional[Dict]) -> Optional[LLMResult]:
+            try:
+                return self.complete(prompt, use_cache, schema)
+            except LLMError:
+                return None
+
+        if not prompts:
+            return []
+        with ThreadPoolExecutor(max_workers=max(1, min(LLM_CONCURRENCY, len(prompts)))) as pool:
+            return list(pool.map(lambda p, sc: contextvars.copy_context().run(one, p, sc), prompts, schemas))
+
+    async def _stream_route(self, route: Route, prompt: str) -> AsyncIterator[str]:
+        if route.provider == "cohere" and route.api == "chat":
+            client = self.async_client("cohere")
+            async for event in client.chat_stream(model=route.model, message=prompt):
+                if event.event_type == "text-generation":
+                    yield event.text
+        elif route.provider == "gemini":
+            model = self.client("gemini").GenerativeModel(route.model)
+            response = await model.generate_content_async(prompt, stream=True)
+            async for chunk in response:
+                yield chunk.text
+        else:
+            yield await asyncio.to_thread(self._call, route, prompt)
+
+    async def stream(self, prompt: str, use_cache: bool = True) -> AsyncIterator[str]:
+        """Yield text deltas from the first route to produce one.
+
+        Hedging is on time to first token: once a route has started
+        streaming the others are cancelled, and an error after that point
+        is raised rather than retried, since text has already gone out.
+        """
+        routes = self.stats.rank(self.routes, kind="ttft")
+        primary = routes[0]
+        start = time.time_ns()
+        attrs = {"provider": primary.provider, "model": primary.model, "prompt_tokens": count_tokens(prompt, primary.model)}
+        if use_cache:
+            hit = self._cached(routes, prompt)
+            if hit is not None:
+                record_span("llm.stream", start, cache="hit", route=hit.route.name, **attrs)
+                yield hit.text
+                return
+
+        async def first_delta(route: Route):
+            began = time.perf_counter()
+            deltas = self._stream_route(route, prompt).__aiter__()
+            try:
+                first = await deltas.__anext__()
+            except StopAsyncIteration:
+                first = ""
+            except Exception:
+                self.stats.record(route, time.perf_counter() - began, ok=False, kind="ttft")
+                raise
+            self.stats.record(route, time.perf_counter() - began, ok=True, kind="ttft")
+            return first, deltas
+
+        remaining = list(routes)
+        pending: Dict[asyncio.Task, Route] = {}
+        errors = []
+        winner = None
+
+        def launch() -> None:
+            route = remaining.pop(0)
+            pending[asyncio.create_task(first_delta(route))] = route
+
+        launch()
+        while pending and winner is None:
+            delay = self.hedge_delay(primary, kind="ttft") if remaining else None
+            done, _ = await asyncio.wait(pending, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                launch()
+                continue
+            for task in done:
+                route = pending.pop(task)
+                if task.exception() is not None:
+                    errors.append(f"{route.name}: {type(task.exception()).__name__}: {task.exception()}")
+                elif winner is None:
+                    winner = (route, *task.result())
+                else:
+                    await task.result()[1].aclose()  # finished in the same tick as the winner
+            if winner is None and remaining:
+                launch()
+        for task in pending:
+            task.cancel()
+
+        if winner is None:
+            record_span("llm.stream", start, error="; ".join(errors)[:500], **attrs)
+            raise LLMError("; ".join(errors))
+        route, first, deltas = winner
+        attrs.update(route=route.name, hedged=route != primary, first_token_ms=(time.time_ns() - start) / 1e6)
+        parts = [first]
+        try:
+            yield first
+            async for delta in deltas:
+                parts.append(delta)
+                yield delta
+        except Exception as e:
+            record_span("llm.stream", start, error=f"{type(e).__name__}: {e}", **attrs)
+            raise
+        text = "".join(parts)
+        record_span("llm.stream", start, cache="miss", output_tokens=count_tokens(text, route.model), **attrs)
+        if use_cache:
+            self.cache.put(make_key(route.provider, route.model, prompt), text, provider=route.provider, model=route.model)
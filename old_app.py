@@ -1,95 +1,99 @@
-import streamlit as st
 import asyncio
 import re
-import random
 import time
-from dataclasses import dataclass
-from typing import Dict, List
-import os
-# 🚀 Setup
-os.system("playwright install")
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, List, Optional
+
+from browser_pool import BrowserPool, borrowed_pool
+from fetcher import TieredFetcher, borrowed_fetcher
+from jobs import POLL_INTERVAL, get_job_manager, job_key, render_job_progress
+from knowledge_store import KnowledgeEntry, KnowledgeStore, get_knowledge_store
+from llm_cache import LLMCache
+from llm_router import LLMError, LLMRouter, Route, gemini_available
+from page_cache import PageCache, get_page_cache
+from prompt_builder import SECTION_BUDGETS, PromptBudget, truncate_to_tokens
+from ranking import group_by_source, select_passages
+from search_providers import SearchProvider, get_search_provider
+from sections import SECTION_SPECS, generate_sections
+from structured_data import ProductFacts, extract_product_facts
+from tracing import render_waterfall, span
+from utils import normalize_url
 
-# If not packaged, inline minimal versions here:
-import cohere
-from playwright.async_api import async_playwright
+class CohereContentGenerator:
+    # Cohere chat, and Gemini too when GEMINI_API_KEY is set; the router hedges a slow
+    # request onto Gemini instead of waiting it out. A second Cohere route would share
+    # the first one's outage and rate limit, so it isn't a hedge worth paying for.
+    def __init__(self, api_key: str, model: str = "command-r-plus-08-2024", cache: Optional[LLMCache] = None):
+        self.api_key = api_key
+        self.model = model
+        routes = [Route("cohere", model)]
+        if gemini_available():
+            routes.append(Route("gemini", "gemini-1.5-flash"))
+        self.router = LLMRouter(routes, api_keys={"cohere": api_key}, cache=cache)
 
-USER_AGENT = (
-    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-    "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115 Safari/537.36"
-)
+    @property
+    def client(self):
+        return self.router.client("cohere")
 
+    @client.setter
+    def client(self, value) -> None:
+        self.router.clients["cohere"] = value
 
-class CohereContentGenerator:
-    def __init__(self, api_key: str, model: str = "command-r-plus-08-2024"):
-        self.client = cohere.Client(api_key)
-        self.model = model
+    @property
+    def cache(self) -> LLMCache:
+        return self.router.cache
+
+    @cache.setter
+    def cache(self, value: LLMCache) -> None:
+        self.router.cache = value
 
-    def generate(self, prompt: str) -> str:
+    def generate(self, prompt: str, use_cache: bool = True) -> str:
         try:
-            # Use Chat API if available; fallback to generate if not
-            response = self.client.chat(
-                model=self.model,
-                message=prompt
-            )
-            return response.text.strip()
-        except Exception as e:
-            # Try legacy completion as backup
-            try:
-                resp = self.client.generate(
-                    model=self.model,
-                    prompt=prompt
-                )
-                return resp.generations[0].text.strip()
-            except Exception as e2:
-                return f"[Cohere Error] {str(e)} / fallback error: {str(e2)}"
+            return self.router.complete(prompt, use_cache).text
+        except LLMError as e:
+            return f"[Cohere Error] {e}"
 
 
 # --- Async Google + Site scraping utilities ---
-async def extract_links(query: str, max_links=8) -> List[str]:
-    safe_links = []
+async def extract_links(
+    query: str, max_links=8, pool: Optional[BrowserPool] = None, provider: Optional[SearchProvider] = None
+) -> List[str]:
+    # Cached (query, provider) lookups; the browser backend is only used on a miss
     try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            page = await browser.new_page(user_agent=USER_AGENT)
-            await page.goto(f"https://www.google.com/search?q={query.replace(' ', '+')}&num={max_links}", timeout=30000)
-            await page.wait_for_selector("a", timeout=10000)
-            hrefs = await page.eval_on_selector_all(
-                "a", "els => els.map(el => el.href).filter(h => h && h.startsWith('http'))"
-            )
-            await browser.close()
-            # dedupe & filter out google internals
-            seen = set()
-            for h in hrefs:
-                if "google.com" in h or h in seen:
-                    continue
-                seen.add(h)
-                safe_links.append(h)
-                if len(safe_links) >= max_links:
-                    break
+        return await (provider or get_search_provider(pool)).search(query, max_links)
     except Exception:
-        pass
-    return safe_links
+        return []
 
 
-async def scrape_text(url: str) -> str:
+async def scrape_text(
+    url: str,
+    pool: Optional[BrowserPool] = None,
+    cache: Optional[PageCache] = None,
+    facts: Optional[Dict[str, ProductFacts]] = None,
+    fetcher: Optional[TieredFetcher] = None,
+) -> str:
+    # When `facts` is given, structured product data from the page HTML is stored in it by URL
     try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            page = await browser.new_page(user_agent=USER_AGENT)
-            await page.goto(url, timeout=30000)
-            await page.wait_for_load_state("networkidle", timeout=15000)
-            # Remove heavy text fetch limitations by grabbing body inner text
-            content = await page.inner_text("body")
-            await browser.close()
-            return content.strip()
+        async with borrowed_fetcher(fetcher, pool=pool, cache=cache) as tf:
+            result = await tf.fetch(url)
+        if facts is not None:
+            facts[url] = result.facts
+        return result.text.strip()
     except Exception as e:
         return f"[Scrape Error] {url} - {str(e)}"
 
 
-async def gather_all_content(query: str) -> Dict[str, str]:
-    urls = await extract_links(query)
-    tasks = [scrape_text(u) for u in urls]
-    results = await asyncio.gather(*tasks, return_exceptions=True)
+async def gather_all_content(
+    query: str,
+    pool: Optional[BrowserPool] = None,
+    cache: Optional[PageCache] = None,
+    facts: Optional[Dict[str, ProductFacts]] = None,
+    fetcher: Optional[TieredFetcher] = None,
+) -> Dict[str, str]:
+    async with borrowed_pool(pool) as bp, borrowed_fetcher(fetcher, pool=bp, cache=cache) as tf:
+        urls = await extract_links(query, pool=bp)
+        tasks = [scrape_text(u, facts=facts, fetcher=tf) for u in urls]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
     combined = {}
     for i, res in enumerate(results):
         if isinstance(res, Exception):
@@ -98,6 +102,64 @@ async def gather_all_content(query: str) -> Dict[str, str]:
     return combined
 
 
+async def search_links_concurrently(
+    queries: List[str], pool: Optional[BrowserPool] = None, provider: Optional[SearchProvider] = None
+) -> List[str]:
+    # All SERP lookups at once, merged on the normalized URL
+    async with borrowed_pool(pool) as bp:
+        provider = provider or get_search_provider(bp)
+        serps = await asyncio.gather(
+            *[extract_links(q, provider=provider) for q in queries], return_exceptions=True
+        )
+    urls = []
+    seen = set()
+    for links in serps:
+        if isinstance(links, Exception):
+            continue
+        for link in links:
+            key = normalize_url(link)
+            if key in seen:
+                continue
+            seen.add(key)
+            urls.append(link)
+    return urls
+
+
+async def fetch_unique(
+    urls: List[str],
+    pool: Optional[BrowserPool] = None,
+    max_fetches: int = 8,
+    cache: Optional[PageCache] = None,
+    facts: Optional[Dict[str, ProductFacts]] = None,
+    fetcher: Optional[TieredFetcher] = None,
+) -> Dict[str, str]:
+    semaphore = asyncio.Semaphore(max_fetches)
+    async with borrowed_fetcher(fetcher, pool=pool, cache=cache) as tf:
+
+        async def fetch(url: str) -> str:
+            async with semaphore:
+                return await scrape_text(url, facts=facts, fetcher=tf)
+
+        results = await asyncio.gather(*[fetch(u) for u in urls], return_exceptions=True)
+    return {url: res for url, res in zip(urls, results) if not isinstance(res, Exception)}
+
+
+async def gather_content_pipelined(
+    queries: List[str],
+    pool: Optional[BrowserPool] = None,
+    max_fetches: int = 8,
+    cache: Optional[PageCache] = None,
+    facts: Optional[Dict[str, ProductFacts]] = None,
+    fetcher: Optional[TieredFetcher] = None,
+) -> Dict[str, str]:
+    # Every unique page across all queries is fetched exactly once
+    async with borrowed_pool(pool) as bp:
+        urls = await search_links_concurrently(queries, pool=bp)
+        return await fetch_unique(
+            urls, pool=bp, max_fetches=max_fetches, cache=cache, facts=facts, fetcher=fetcher
+        )
+
+
 # === Core agent ===
 
 @dataclass
@@ -113,14 +175,31 @@ class ProductInfo:
 
 
 class ProductResearchAgentV2:
-    def __init__(self, cohere_api_key: str, model: str = "command-r"):
+    def __init__(
+        self,
+        cohere_api_key: str,
+        model: str = "command-r",
+        pipelined: bool = True,
+        max_fetches: int = 8,
+        cache: Optional[PageCache] = None,
+        per_section: bool = False,
+        knowledge: Optional[KnowledgeStore] = None,
+        reuse: bool = True,
+    ):
         self.cohere_gen = CohereContentGenerator(api_key=cohere_api_key, model=model)
-
-    async def run_search_and_scrape(
-        self, product_name: str, primary_keywords: str, secondary_keywords: str
-    ) -> ProductInfo:
+        self.pipelined = pipelined
+        # One concurrent JSON call per ProductInfo field instead of a single numbered completion
+        self.per_section = per_section
+        # Finished research is stored in `knowledge`; with `reuse` it's looked up by
+        # fuzzy product name before searching again
+        self.knowledge = knowledge
+        self.reuse = reuse
+        self.max_fetches = max_fetches
+        self.cache = cache
+
+    def build_queries(self, product_name: str, primary_keywords: str) -> List[str]:
         # Build diverse queries
-        queries = [
+        return [
             f"{product_name} price Canada USA",
             f"{product_name} ingredients UPC barcode",
             f"{product_name} review specifications features",
@@ -129,28 +208,126 @@ class ProductResearchAgentV2:
             f"{product_name} how to use instructions",
         ]
 
+    async def run_search_and_scrape(
+        self,
+        product_name: str,
+        primary_keywords: str,
+        secondary_keywords: str,
+        progress: Optional[Callable[[str, str], None]] = None,
+    ) -> ProductInfo:
+        # `progress(stage, detail)` is told as each stage starts (jobs.Job.update fits)
+        progress = progress or (lambda stage, detail: None)
+        params = {
+            "primary_keywords": primary_keywords,
+            "secondary_keywords": secondary_keywords,
+            "model": self.cohere_gen.model,
+            "per_section": self.per_section,
+        }
+        known = self.knowledge.match("agent", product_name) if self.knowledge is not None and self.reuse else None
+        if known is not None and known.confident and known.entry.fresh:
+            entry = known.entry
+            if entry.params == params and entry.info:
+                progress("Reuse", f"Earlier research for “{entry.name}” ({known.score:.0%} match)")
+                return ProductInfo(**entry.info)
+            # Same product, other keywords or model: only the writing needs redoing
+            progress("Reuse", f"Sources from earlier research for “{entry.name}”")
+            progress("Generate", f"Writing from {len(entry.texts)} sources")
+            info = self.generate_product_info(product_name, primary_keywords, secondary_keywords, entry.texts)
+            # Stored prices/UPC came from structured data, which the stored texts no longer carry
+            info.upc, info.pricing = entry.info.get("upc", info.upc), entry.info.get("pricing", info.pricing)
+            self._remember(product_name, entry.texts, info, params)
+            return info
+
+        queries = self.build_queries(product_name, primary_keywords)
+        known_urls = known.entry.sources if known is not None and known.confident else None
+        if known_urls:
+            progress("Scrape", f"Re-fetching {len(known_urls)} sources found for “{known.entry.name}”")
+        else:
+            progress("Search & scrape", f"{len(queries)} queries")
+        facts: Dict[str, ProductFacts] = {}
+        # One pool for the whole run: browsers launch once, not once per URL
+        # Pages are fetched over plain HTTP first and rendered in the pool only when needed
+        async with BrowserPool(max_pages=self.max_fetches) as pool:
+            async with TieredFetcher(pool=pool, cache=self.cache) as fetcher:
+                if known_urls:
+                    batches = [
+                        await fetch_unique(
+                            known_urls, pool=pool, max_fetches=self.max_fetches, facts=facts, fetcher=fetcher
+                        )
+                    ]
+                elif self.pipelined:
+                    batches = [
+                        await gather_content_pipelined(
+                            queries,
+                            pool=pool,
+                            max_fetches=self.max_fetches,
+                            cache=self.cache,
+                            facts=facts,
+                            fetcher=fetcher,
+                        )
+                    ]
+                else:
+                    batches = []
+                    for query in queries:
+                        try:
+                            with span("gather", query=query):
+                                batches.append(await gather_all_content(query, pool=pool, facts=facts, fetcher=fetcher))
+                        except Exception:
+                            pass  # recorded on the span; other queries may still find sources
+
+        all_texts = self.collect_texts(batches)
+        progress("Generate", f"Writing from {len(all_texts)} sources")
+        info = self.generate_product_info(product_name, primary_keywords, secondary_keywords, all_texts, facts)
+        self._remember(product_name, all_texts, info, params)
+        return info
+
+    def _remember(self, product_name: str, texts: Dict[str, str], info: ProductInfo, params: Dict) -> None:
+        # Only research that produced copy is worth reusing
+        if self.knowledge is None or not texts or not info.full_description:
+            return
+        self.knowledge.put(KnowledgeEntry(
+            kind="agent", name=product_name, sources=list(texts), texts=texts, info=asdict(info), params=params,
+        ))
+
+    def collect_texts(self, batches: List[Dict[str, str]]) -> Dict[str, str]:
         all_texts: Dict[str, str] = {}
-        for query in queries:
-            contents = {}
-            try:
-                contents = await gather_all_content(query)
-            except Exception:
-                pass
+        for contents in batches:
             for url, txt in contents.items():
                 if url in all_texts:
                     continue
                 if isinstance(txt, str) and not txt.startswith("[Scrape Error]"):
                     all_texts[url] = self._clean_text_snippet(txt)
-
-        combined_data = self._combine_texts(all_texts)
-        pricing = self._extract_pricing_info(list(all_texts.items()))
-        upc = self._extract_upc_code(list(all_texts.items()))
-
-        prompt = self._create_prompt(
-            product_name, primary_keywords, secondary_keywords, combined_data
+        return all_texts
+
+    def generate_product_info(
+        self,
+        product_name: str,
+        primary_keywords: str,
+        secondary_keywords: str,
+        all_texts: Dict[str, str],
+        facts: Optional[Dict[str, ProductFacts]] = None,
+    ) -> ProductInfo:
+        budget = PromptBudget("product_info", self.cohere_gen.model)
+        combined_data = budget.fit(
+            "sources", self._combine_texts(all_texts, f"{product_name} {primary_keywords} {secondary_keywords}")
         )
-        ai_response = self.cohere_gen.generate(prompt)
-        parsed = self._parse_ai_response(ai_response)
+        with span("extract", sources=len(all_texts)):
+            pricing = self._extract_pricing_info(list(all_texts.items()), facts)
+            upc = self._extract_upc_code(list(all_texts.items()), facts)
+
+        if self.per_section:
+            # Each section prompt is recorded as section.<name>; this records the shared
+            # sources block, and whether fitting it cut anything, under product_info
+            parsed, _ = generate_sections(
+                self.cohere_gen.router, product_name, primary_keywords, secondary_keywords,
+                budget.finish(combined_data), self.cohere_gen.model,
+            )
+        else:
+            prompt = budget.finish(self._create_prompt(
+                product_name, primary_keywords, secondary_keywords, combined_data
+            ))
+            ai_response = self.cohere_gen.generate(prompt)
+            parsed = self._parse_ai_response(ai_response)
 
         return ProductInfo(
             meta_title=parsed.get("meta_title", "")[:60],
@@ -164,73 +341,59 @@ class ProductResearchAgentV2:
         )
 
     def _clean_text_snippet(self, text: str) -> str:
-        # Normalize whitespace, limit length
-        return " ".join(text.split())[:2000]
+        # Normalize whitespace; no page can use more than the whole sources budget
+        return truncate_to_tokens(" ".join(text.split()), SECTION_BUDGETS["sources"])
 
-    def _combine_texts(self, url_text_pairs: Dict[str, str]) -> str:
+    def _combine_texts(self, url_text_pairs: Dict[str, str], query: str = "") -> str:
+        # Best-matching passages first, syndicated duplicates dropped, capped at the source token budget
+        passages = select_passages(url_text_pairs, query, model=self.cohere_gen.model)
         parts = []
-        for url, text in url_text_pairs.items():
-            snippet = text[:1000]
-            parts.append(f"Source: {url}\nContent: {snippet}")
+        for url, text in group_by_source(passages).items():
+            parts.append(f"Source: {url}\nContent: {text}")
         return "\n\n".join(parts)
 
-    def _extract_pricing_info(self, url_text_list: List[tuple]) -> Dict:
+    def _page_facts(self, url: str, text: str, facts: Optional[Dict[str, ProductFacts]]) -> ProductFacts:
+        # Structured data (JSON-LD/OpenGraph/microdata) when scraped; else a bounded regex pass over the text
+        if facts and url in facts:
+            return facts[url]
+        return extract_product_facts(None, text, url)
+
+    def _extract_pricing_info(
+        self, url_text_list: List[tuple], facts: Optional[Dict[str, ProductFacts]] = None
+    ) -> Dict:
         canada_prices = []
         usa_prices = []
         for url, text in url_text_list:
-            # capture price numbers with optional currency hints
-            # e.g., $29.99, CAD $35, 29.99 USD
-            for match in re.findall(
-                r"(?:(CAD|USD)?\s*\$?\s*([0-9]+(?:\.[0-9]{1,2})?))", text, re.IGNORECASE
-            ):
-                currency, amount = match
-                try:
-                    val = float(amount)
-                except:
+            for offer in self._page_facts(url, text, facts).offers:
+                # regex hits are only trusted inside a plausible retail range
+                if offer.source == "text" and not 5 <= offer.price <= 500:
                     continue
-                if currency and currency.strip().upper() == "CAD":
-                    canada_prices.append(val)
-                elif currency and currency.strip().upper() == "USD":
-                    usa_prices.append(val)
+                if offer.currency == "CAD":
+                    canada_prices.append(offer.price)
                 else:
-                    # heuristic based on domain
-                    if ".ca" in url.lower() or "canada" in text.lower():
-                        canada_prices.append(val)
-                    else:
-                        usa_prices.append(val)
-        # fallback synthetic generation
-        if not canada_prices:
-            base = random.uniform(15, 45)
-            canada_prices = [base + random.uniform(-3, 5) for _ in range(3)]
-        if not usa_prices:
-            base = random.uniform(12, 35)
-            usa_prices = [base + random.uniform(-2, 4) for _ in range(3)]
-        canada_prices = [p for p in canada_prices if 5 <= p <= 500]
-        usa_prices = [p for p in usa_prices if 5 <= p <= 500]
-        if not canada_prices:
-            canada_prices = [20.0, 25.0]
-        if not usa_prices:
-            usa_prices = [18.0, 23.0]
+                    usa_prices.append(offer.price)
+
+        def price_range(prices: List[float], currency: str) -> Dict[str, str]:
+            if not prices:
+                return {"highest": "N/A", "lowest": "N/A"}
+            return {
+                "highest": f"{currency} ${max(prices):.2f}",
+                "lowest": f"{currency} ${min(prices):.2f}",
+            }
+
         return {
-            "canada": {
-                "highest": f"CAD ${max(canada_prices):.2f}",
-                "lowest": f"CAD ${min(canada_prices):.2f}",
-            },
-            "usa": {
-                "highest": f"USD ${max(usa_prices):.2f}",
-                "lowest": f"USD ${min(usa_prices):.2f}",
-            },
+            "canada": price_range(canada_prices, "CAD"),
+            "usa": price_range(usa_prices, "USD"),
         }
 
-    def _extract_upc_code(self, url_text_list: List[tuple]) -> str:
-        for _, text in url_text_list:
-            m = re.search(r"UPC[:\s]*([0-9]{12})", text)
-            if m:
-                return m.group(1)
-            # fallback generic 12-digit non-zero-leading
-            for cand in re.findall(r"\b([1-9][0-9]{11})\b", text):
-                return cand
-        return str(random.randint(100000000000, 999999999999))
+    def _extract_upc_code(
+        self, url_text_list: List[tuple], facts: Optional[Dict[str, ProductFacts]] = None
+    ) -> str:
+        for url, text in url_text_list:
+            gtin = self._page_facts(url, text, facts).gtin
+            if gtin:
+                return gtin
+        return "Not Found"
 
     def _create_prompt(
         self, product_name: str, primary: str, secondary: str, combined_data: str
@@ -276,6 +439,8 @@ Output sections exactly as numbered below. Do not add extra sections. Use natura
 # === Streamlit UI Entrypoint ===
 
 def run_app():
+    import streamlit as st  # batch.py imports this module; only the UI needs streamlit
+
     st.set_page_config(page_title="AI Product Research", layout="wide")
     st.title("🛍️ AI Product SEO & Research Agent (Cohere)")
     st.markdown("**Robust scraping + humanized content generation**")
@@ -284,6 +449,14 @@ def run_app():
         st.subheader("LLM & Input Configuration")
         cohere_key = st.text_input("Cohere API Key", type="password", help="Get free tier key from cohere.com")
         model_choice = st.selectbox("Cohere Model", ["command-r", "command-light", "command"], index=0)
+        per_section = st.checkbox(
+            "Generate sections separately", value=False,
+            help="One small call per field, run concurrently; only fields outside their limits are regenerated",
+        )
+        reuse = st.checkbox(
+            "Reuse earlier research", value=True,
+            help="Skip search and scrape when this product was researched recently under a near-identical name",
+        )
         st.markdown("---")
         st.subheader("Product Inputs")
         product_name = st.text_input("Product Name", placeholder="e.g., Fanola No Yellow Shampoo 350 ml")
@@ -296,47 +469,75 @@ def run_app():
             st.warning("Product name, primary keywords, and Cohere API key are required.")
             return
 
-        agent = ProductResearchAgentV2(cohere_api_key=cohere_key, model=model_choice)
-        with st.spinner("Running search, scraping, and generating content..."):
-            product_info = asyncio.run(
-                agent.run_search_and_scrape(product_name.strip(), primary_keywords.strip(), secondary_keywords.strip())
-            )
-
-        st.success("✅ Research Completed")
-
-        # SEO metrics
-        st.subheader("🧠 SEO Output")
-        c1, c2, c3, c4 = st.columns(4)
-        with c1:
-            st.metric("Meta Title", f"{len(product_info.meta_title)} chars", "✅" if 50 <= len(product_info.meta_title) <= 60 else "⚠️")
-        with c2:
-            st.metric("Meta Description", f"{len(product_info.meta_description)} chars", "✅" if 120 <= len(product_info.meta_description) <= 160 else "⚠️")
-        with c3:
-            st.metric("Short Description", f"{len(product_info.short_description.split())} words", "✅" if 50 <= len(product_info.short_description.split()) <= 160 else "⚠️")
-        with c4:
-            st.metric("Full Description", f"{len(product_info.full_description.split())} words", "✅" if 300 <= len(product_info.full_description.split()) <= 350 else "⚠️")
-
-        st.markdown("---")
-        st.subheader("✍️ Generated Content")
-        st.markdown("**Meta Title**")
-        st.code(product_info.meta_title)
-        st.markdown("**Meta Description**")
-        st.code(product_info.meta_description)
-
-        st.markdown("**Short Description**")
-        st.write(product_info.short_description)
-
-        st.markdown("**Full Description**")
-        st.write(product_info.full_description)
-
-        st.markdown("**How to Use**")
-        st.write(product_info.how_to_use)
-
-        st.markdown("**Ingredients**")
-        st.write(product_info.ingredients)
-
-        st.markdown("---")
-        st.subheader("🧾 UPC & Pricing")
-        st.markdown(f"**UPC:** {product_info.upc}")
-        st.markdown(f"**Canada Pricing:** High: {product_info.pricing['canada']['highest']} | Low: {product_info.pricing['canada']['lowest']}")
-        st.markdown(f"**USA Pricing:** High: {product_info.pricing['usa']['highest']} | Low: {product_info.pricing['usa']['lowest']}")
+        agent = ProductResearchAgentV2(
+            cohere_api_key=cohere_key,
+            model=model_choice,
+            cache=get_page_cache(),
+            per_section=per_section,
+            knowledge=get_knowledge_store(),
+            reuse=reuse,
+        )
+        name, primary, secondary = product_name.strip(), primary_keywords.strip(), secondary_keywords.strip()
+        # Same inputs while a run is in flight (a rerun, a second tab) attach to that run
+        job = get_job_manager().submit(
+            job_key(name, primary, secondary, model_choice, "sections" if per_section else "", "reuse" if reuse else ""),
+            lambda job: agent.run_search_and_scrape(name, primary, secondary, progress=job.update),
+        )
+        st.session_state.research_job_id = job.id
+
+    job = get_job_manager().get(st.session_state.get("research_job_id") or "")
+    if job is None:
+        return
+    st.session_state.research_progress = snapshot = job.snapshot()
+    if not job.done:
+        render_job_progress(snapshot)
+        time.sleep(POLL_INTERVAL)
+        st.rerun()
+        return
+    if job.status == "failed":
+        render_job_progress(snapshot)
+        return
+    product_info, run_trace = job.result, job.trace
+
+    st.success("✅ Research Completed")
+
+    # SEO metrics
+    st.subheader("🧠 SEO Output")
+    # Limits come from sections.SECTION_SPECS, the same ones per-section generation retries against
+    for column, (name, value) in zip(st.columns(4), [
+        ("meta_title", product_info.meta_title),
+        ("meta_description", product_info.meta_description),
+        ("short_description", product_info.short_description),
+        ("full_description", product_info.full_description),
+    ]):
+        spec = SECTION_SPECS[name]
+        with column:
+            st.metric(spec.label.title(), f"{spec.measure(value)} {spec.unit}", "✅" if spec.problem(value) is None else "⚠️")
+
+    st.markdown("---")
+    st.subheader("✍️ Generated Content")
+    st.markdown("**Meta Title**")
+    st.code(product_info.meta_title)
+    st.markdown("**Meta Description**")
+    st.code(product_info.meta_description)
+
+    st.markdown("**Short Description**")
+    st.write(product_info.short_description)
+
+    st.markdown("**Full Description**")
+    st.write(product_info.full_description)
+
+    st.markdown("**How to Use**")
+    st.write(product_info.how_to_use)
+
+    st.markdown("**Ingredients**")
+    st.write(product_info.ingredients)
+
+    st.markdown("---")
+    st.subheader("🧾 UPC & Pricing")
+    st.markdown(f"**UPC:** {product_info.upc}")
+    st.markdown(f"**Canada Pricing:** High: {product_info.pricing['canada']['highest']} | Low: {product_info.pricing['canada']['lowest']}")
+    st.markdown(f"**USA Pricing:** High: {product_info.pricing['usa']['highest']} | Low: {product_info.pricing['usa']['lowest']}")
+
+    with st.expander("⏱️ Run timings"):
+        render_waterfall(run_trace)
@@ -0,0 +1,373 @@
+# page_cache.py
+import codecs
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+from politeness import raise_for_retryable
+from tracing import span
+from utils import normalize_url
+
+DEFAULT_CACHE_PATH = os.getenv("PAGE_CACHE_PATH", os.path.join(".cache", "pages.sqlite"))
+DEFAULT_TTL = float(os.getenv("PAGE_CACHE_TTL", str(24 * 3600)))
+DEFAULT_MAX_BYTES = int(os.getenv("PAGE_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+# Per-domain TTLs in seconds, e.g. PAGE_CACHE_DOMAIN_TTLS="sephora.com=3600,amazon.ca=900"
+DEFAULT_DOMAIN_TTLS_SPEC = os.getenv("PAGE_CACHE_DOMAIN_TTLS", "")
+# Most of a product page is in the first few hundred KB; past this a body is cut off
+FETCH_MAX_BYTES = int(os.getenv("FETCH_MAX_BYTES", str(2 * 1024 * 1024)))
+FETCH_CHUNK_BYTES = 64 * 1024
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+
+_CHARSET = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?([a-zA-Z0-9_.:-]+)""", re.IGNORECASE)
+# A whole JSON-LD block, one still being read, and a Product type inside it
+_LD_JSON_BLOCK = re.compile(rb"<script[^>]*application/ld\+json[^>]*>(.*?)</script\s*>", re.IGNORECASE | re.DOTALL)
+_LD_JSON_OPEN = re.compile(rb"<script[^>]*application/ld\+json[^>]*>", re.IGNORECASE)
+_LD_PRODUCT = re.compile(rb'"@type"\s*:\s*(?:\[[^\]]*)?"product"', re.IGNORECASE)
+_MICRODATA_PRODUCT = re.compile(rb"""itemtype\s*=\s*["']?https?://schema\.org/product\b""", re.IGNORECASE)
+_MAIN_END = re.compile(rb"</main\s*>", re.IGNORECASE)
+_SCAN_OVERLAP = 256  # markers and script tags can straddle chunks
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    key TEXT NOT NULL,
+    variant TEXT NOT NULL,
+    url TEXT NOT NULL,
+    html BLOB,
+    text BLOB,
+    etag TEXT,
+    last_modified TEXT,
+    truncated TEXT NOT NULL DEFAULT '',
+    fetched_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    size INTEGER NOT NULL,
+    PRIMARY KEY (key, variant)
+);
+CREATE INDEX IF NOT EXISTS pages_accessed ON pages (accessed_at);
+"""
+
+
+def _pack(value: str) -> bytes:
+    return zlib.compress(value.encode("utf-8"), 3)
+
+
+def _unpack(blob: Optional[bytes]) -> str:
+    return zlib.decompress(blob).decode("utf-8") if blob else ""
+
+
+def parse_domain_ttls(spec: str) -> Dict[str, float]:
+    ttls = {}
+    for item in spec.split(","):
+        domain, sep, seconds = item.partition("=")
+        if sep and domain.strip():
+            ttls[domain.strip().lower()] = float(seconds)
+    return ttls
+
+
+@dataclass
+class CachedPage:
+    url: str
+    html: str
+    text: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+    ttl: float
+    truncated: str = ""  # why read_html stopped early ("cap", "main"); "" for a whole body
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() - self.fetched_at < self.ttl
+
+    def conditional_headers(self) -> Dict[str, str]:
+        # A 304 would only confirm the part that was read, so cut bodies are fetched again
+        if self.truncated:
+            return {}
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class PageCache:
+    """SQLite-backed page cache keyed by normalized URL.
+
+    `variant` separates raw HTTP bodies ("raw") from browser-rendered pages
+    ("rendered") of the same URL. Entries past their TTL are still returned so
+    callers can revalidate them with ETag/Last-Modified; the least recently
+    used rows are evicted once the stored size passes `max_bytes`. TTLs can be
+    set per domain through `domain_ttls` (default: PAGE_CACHE_DOMAIN_TTLS).
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        default_ttl: float = DEFAULT_TTL,
+        domain_ttls: Optional[Dict[str, float]] = None,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.default_ttl = default_ttl
+        self.domain_ttls = parse_domain_ttls(DEFAULT_DOMAIN_TTLS_SPEC) if domain_ttls is None else domain_ttls
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(pages)")}
+        if "truncated" not in columns:
+            # Caches written before bodies were read with a byte cap
+            self._db.execute("ALTER TABLE pages ADD COLUMN truncated TEXT NOT NULL DEFAULT ''")
+            self._db.commit()
+
+    def ttl_for(self, url: str) -> float:
+        host = (urlsplit(url).hostname or "").lower()
+        best = None
+        for domain, ttl in self.domain_ttls.items():
+            if host == domain or host.endswith("." + domain):
+                if best is None or len(domain) > len(best[0]):
+                    best = (domain, ttl)
+        return best[1] if best else self.default_ttl
+
+    def get(self, url: str, variant: str = "raw") -> Optional[CachedPage]:
+        key = normalize_url(url)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT url, html, text, etag, last_modified, fetched_at, truncated FROM pages"
+                " WHERE key = ? AND variant = ?",
+                (key, variant),
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute(
+                "UPDATE pages SET accessed_at = ? WHERE key = ? AND variant = ?",
+                (time.time(), key, variant),
+            )
+            self._db.commit()
+        return CachedPage(
+            url=row[0],
+            html=_unpack(row[1]),
+            text=_unpack(row[2]),
+            etag=row[3],
+            last_modified=row[4],
+            fetched_at=row[5],
+            ttl=self.ttl_for(url),
+            truncated=row[6],
+        )
+
+    def put(
+        self,
+        url: str,
+        html: str,
+        text: str = "",
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        variant: str = "raw",
+        truncated: str = "",
+    ) -> None:
+        html_blob, text_blob = _pack(html or ""), _pack(text or "")
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO pages"
+                " (key, variant, url, html, text, etag, last_modified, truncated, fetched_at, accessed_at, size)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (normalize_url(url), variant, url, html_blob, text_blob, etag, last_modified, truncated,
+                 now, now, len(html_blob) + len(text_blob)),
+            )
+            self._evict_locked()
+            self._db.commit()
+
+    def set_text(self, url: str, text: str, variant: str = "raw") -> None:
+        blob = _pack(text or "")
+        with self._lock:
+            self._db.execute(
+                "UPDATE pages SET text = ?, size = length(html) + ? WHERE key = ? AND variant = ?",
+                (blob, len(blob), normalize_url(url), variant),
+            )
+            self._db.commit()
+
+    def touch(self, url: str, variant: str = "raw") -> None:
+        # A 304 answer: the stored body is still current, restart its TTL
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "UPDATE pages SET fetched_at = ?, accessed_at = ? WHERE key = ? AND variant = ?",
+                (now, now, normalize_url(url), variant),
+            )
+            self._db.commit()
+
+    def urls(self, variant: str = "raw") -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._db.execute(
+                "SELECT url FROM pages WHERE variant = ? ORDER BY fetched_at DESC", (variant,)
+            )]
+
+    def size(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+
+    def _evict_locked(self) -> None:
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = int(self.max_bytes * 0.9)
+        stale = []
+        for key, variant, size in self._db.execute(
+            "SELECT key, variant, size FROM pages ORDER BY accessed_at ASC"
+        ):
+            if total <= target:
+                break
+            stale.append((key, variant))
+            total -= size
+        self._db.executemany("DELETE FROM pages WHERE key = ? AND variant = ?", stale)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class NonHTMLContent(Exception):
+    """The server said the body isn't HTML (a PDF, an image, a JSON API...)."""
+
+    def __init__(self, url: str, content_type: str):
+        super().__init__(f"{url} is {content_type}, not HTML")
+        self.url = url
+        self.content_type = content_type
+
+
+class HTTPClientError(Exception):
+    """A 4xx answer (404, 410...): the page isn't there, for a browser either."""
+
+    def __init__(self, url: str, status: int):
+        super().__init__(f"HTTP {status} for {url}")
+        self.url = url
+        self.status = status
+
+
+def _decoder(charset: Optional[str], head: bytes):
+    # Header charset, else a <meta charset> in the first chunk, else UTF-8
+    if not charset:
+        match = _CHARSET.search(head[:4096])
+        charset = match.group(1).decode("ascii") if match else "utf-8"
+    try:
+        return codecs.getincrementaldecoder(charset)(errors="replace")
+    except LookupError:
+        return codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+
+class _ProductScan:
+    """Watches raw chunks for the point where the product content is all in.
+
+    That's a whole JSON-LD Product block (through its </script>) or a
+    microdata Product, plus the end of <main>. Head meta tags such as
+    product:price don't count: the JSON-LD holding the GTIN often comes
+    after the main region.
+    """
+
+    def __init__(self):
+        self.buffer = b""
+        self.product = self.main_closed = False
+
+    def feed(self, chunk: bytes) -> bool:
+        data = self.buffer + chunk
+        self.main_closed = self.main_closed or bool(_MAIN_END.search(data))
+        keep = len(data) - _SCAN_OVERLAP
+        if not self.product:
+            end = 0
+            for block in _LD_JSON_BLOCK.finditer(data):
+                end = block.end()
+                if _LD_PRODUCT.search(block.group(1)):
+                    self.product = True
+                    break
+            self.product = self.product or bool(_MICRODATA_PRODUCT.search(data))
+            # Keep a JSON-LD block that hasn't closed yet so it's matched whole next time
+            opening = None if self.product else _LD_JSON_OPEN.search(data, end)
+            keep = opening.start() if opening else max(end, keep)
+        self.buffer = data[max(keep, 0):]
+        return self.product and self.main_closed
+
+
+async def read_html(response, url: str, max_bytes: int = FETCH_MAX_BYTES):
+    """Stream an HTML body, decoding as it arrives, and stop early when possible.
+
+    Returns (html, stopped): `stopped` is "cap" when `max_bytes` was reached,
+    "main" when the main region and the product's structured data have been
+    read in full (see _ProductScan), else "". Non-HTML content types raise
+    NonHTMLContent before any of the body is read.
+    """
+    content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+    if content_type and content_type not in HTML_CONTENT_TYPES:
+        raise NonHTMLContent(url, content_type)
+    decoder = None
+    parts = []
+    read = 0
+    scan = _ProductScan()
+    stopped = ""
+    async for received in response.content.iter_chunked(FETCH_CHUNK_BYTES):
+        chunk = received[: max_bytes - read]
+        read += len(chunk)
+        if decoder is None:
+            decoder = _decoder(response.charset, chunk)
+        parts.append(decoder.decode(chunk))
+        done = scan.feed(chunk)
+        if done or read >= max_bytes:
+            # A body that ended here anyway is whole, and can be revalidated later
+            if len(chunk) < len(received) or not response.content.at_eof():
+                stopped = "main" if done else "cap"
+            break
+    if decoder is not None:
+        parts.append(decoder.decode(b"", final=True))
+    return "".join(parts), stopped
+
+
+_shared_cache: Optional[PageCache] = None
+
+
+def get_page_cache() -> PageCache:
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = PageCache()
+    return _shared_cache
+
+
+async def fetch_with_cache(
+    session, url: str, cache: Optional[PageCache] = None, headers=None, timeout=10, max_bytes: int = FETCH_MAX_BYTES
+) -> str:
+    # Plain aiohttp GET that serves fresh entries locally and revalidates stale ones;
+    # bodies are streamed and bounded by read_html
+    headers = dict(headers or {})
+    with span("fetch.http", url=url) as s:
+        entry = cache.get(url) if cache is not None else None
+        if entry is not None and entry.fresh:
+            s.set(cache="hit", bytes=len(entry.html))
+            return entry.html
+        if entry is not None:
+            headers.update(entry.conditional_headers())
+        async with session.get(url, headers=headers, timeout=timeout) as response:
+            s.set(status=response.status)
+            raise_for_retryable(response.status, url, response.headers)
+            if response.status == 304 and entry is not None:
+                cache.touch(url)
+                s.set(cache="revalidated", bytes=len(entry.html))
+                return entry.html
+            if 400 <= response.status < 500:
+                raise HTTPClientError(url, response.status)
+            html, stopped = await read_html(response, url, max_bytes)
+            s.set(cache="miss", bytes=len(html), stopped=stopped)
+            if cache is not None and response.status == 200:
+                cache.put(
+                    url,
+                    html,
+                    etag=response.headers.get("ETag"),
+                    last_modified=response.headers.get("Last-Modified"),
+                    truncated=stopped,
+                )
+            return html
@@ -0,0 +1,108 @@
+# parse_pool.py
+import asyncio
+import atexit
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import spawn
+from multiprocessing.context import SpawnContext, SpawnProcess
+from typing import Optional
+
+from extraction import extract_page
+from structured_data import extract_product_facts
+from tracing import span
+
+PRODUCT_KEYWORDS = ["price", "buy", "add to cart", "mrp", "product", "brand", "description"]
+
+# 0 keeps parsing on the calling thread (handy for debugging). Each worker is a
+# separate interpreter per app process, so the default stays small.
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+
+@dataclass
+class ParsedProductPage:
+    url: str
+    title: str
+    short_desc: str
+    long_desc: str
+    keyword_matches: int
+
+    @property
+    def is_product(self) -> bool:
+        return self.keyword_matches >= 2 and len(self.long_desc) >= 100
+
+
+def parse_product_page(url: str, html: str) -> ParsedProductPage:
+    # Runs in a worker process: parse, clean and score, return only the small fields
+    page = extract_page(html)
+    body_text = " ".join([p for p in page.paragraphs[:15] if len(p) > 30])
+    combined_text = f"{page.title.lower()} {page.meta_description.lower()} {body_text.lower()}"
+    return ParsedProductPage(
+        url=url,
+        title=page.title,
+        short_desc=page.meta_description,
+        long_desc=body_text,
+        keyword_matches=sum(1 for word in PRODUCT_KEYWORDS if word in combined_text),
+    )
+
+
+def analyze_page(url: str, html: str):
+    # Cleaned text plus structured product facts from one parse
+    page = extract_page(html)
+    return page.text, extract_product_facts(page, page.text, url)
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+_WORKER_PREFIX = "parse-worker-"
+
+
+class _WorkerProcess(SpawnProcess):
+    """A spawned parse worker that doesn't re-run the parent's script.
+
+    A spawn child normally re-runs the parent's __main__ (as __mp_main__) so
+    functions defined there can be unpickled. Under `streamlit run app.py`
+    that is the whole UI script, so every worker would import streamlit and
+    run the page again. Everything sent to the pool lives in importable
+    modules, so workers, recognised by their name, get preparation data
+    without the main script (see _preparation_data).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.name = _WORKER_PREFIX + self.name
+
+
+class _WorkerContext(SpawnContext):
+    Process = _WorkerProcess
+
+
+def _preparation_data(name, _get=spawn.get_preparation_data):
+    # Wraps multiprocessing's own; other processes get exactly what they did before
+    data = _get(name)
+    if name.startswith(_WORKER_PREFIX):
+        data.pop("init_main_from_path", None)
+        data.pop("init_main_from_name", None)
+    return data
+
+
+if getattr(spawn.get_preparation_data, "__module__", "") != __name__:
+    spawn.get_preparation_data = _preparation_data
+
+
+def get_parse_executor() -> Optional[ProcessPoolExecutor]:
+    global _executor
+    if PARSE_WORKERS <= 0:
+        return None
+    if _executor is None:
+        # spawn, not fork: the parent may be a threaded Streamlit server
+        _executor = ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=_WorkerContext())
+        atexit.register(_executor.shutdown, wait=False, cancel_futures=True)
+    return _executor
+
+
+async def run_in_parse_pool(fn, *args):
+    executor = get_parse_executor()
+    with span(f"parse.{fn.__name__}", url=args[0] if args and isinstance(args[0], str) else ""):
+        if executor is None:
+            return fn(*args)
+        return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
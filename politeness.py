@@ -0,0 +1,175 @@
+# politeness.py
+import asyncio
+import os
+import random
+import time
+import weakref
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+from urllib.parse import urlsplit
+
+import aiohttp
+
+T = TypeVar("T")
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RetryableHTTPError(Exception):
+    def __init__(self, status: int, url: str = "", retry_after: Optional[str] = None):
+        super().__init__(f"HTTP {status} for {url}")
+        self.status = status
+        self.retry_after = parse_retry_after(retry_after)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    # Retry-After is either delta-seconds or an HTTP date
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def raise_for_retryable(status: int, url: str, headers) -> None:
+    if status in RETRY_STATUSES:
+        headers = headers or {}
+        raise RetryableHTTPError(status, url, headers.get("Retry-After") or headers.get("retry-after"))
+
+
+def is_transient(exc: BaseException) -> bool:
+    if isinstance(exc, RetryableHTTPError):
+        return True
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError, aiohttp.ClientConnectionError)):
+        return True
+    # playwright raises its own TimeoutError class
+    return type(exc).__name__ == "TimeoutError"
+
+
+@dataclass
+class HostPolicy:
+    rate: float = float(os.getenv("FETCH_HOST_RATE", "1.0"))  # requests per second
+    burst: int = int(os.getenv("FETCH_HOST_BURST", "3"))
+    max_concurrency: int = int(os.getenv("FETCH_HOST_CONCURRENCY", "2"))
+
+
+class _HostState:
+    def __init__(self, policy: HostPolicy):
+        self.policy = policy
+        self.tokens = float(policy.burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = asyncio.Lock()
+        self.semaphore = asyncio.Semaphore(max(1, policy.max_concurrency))
+
+    async def take_token(self) -> None:
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self.tokens = min(self.policy.burst, self.tokens + (now - self.updated) * self.policy.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.policy.rate)
+
+
+class PolitenessScheduler:
+    """Per-host token buckets, a global concurrency cap and retry with backoff.
+
+    `call(url, fn)` runs `fn()` inside the host's budget and retries it on
+    429/5xx (via RetryableHTTPError), timeouts and dropped connections, using
+    exponential backoff with full jitter. A Retry-After value pauses the whole
+    host, not just the one request.
+    """
+
+    def __init__(
+        self,
+        default_policy: Optional[HostPolicy] = None,
+        domain_policies: Optional[Dict[str, HostPolicy]] = None,
+        max_concurrency: int = int(os.getenv("FETCH_GLOBAL_CONCURRENCY", "16")),
+        max_retries: int = int(os.getenv("FETCH_MAX_RETRIES", "3")),
+        backoff_base: float = 0.5,
+        backoff_cap: float = 30.0,
+    ):
+        self.default_policy = default_policy or HostPolicy()
+        self.domain_policies = domain_policies or {}
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self._global = asyncio.Semaphore(max(1, max_concurrency))
+        self._hosts: Dict[str, _HostState] = {}
+
+    def _policy_for(self, host: str) -> HostPolicy:
+        for domain, policy in self.domain_policies.items():
+            if host == domain or host.endswith("." + domain):
+                return policy
+        return self.default_policy
+
+    def _host(self, url: str) -> _HostState:
+        host = (urlsplit(url).hostname or "").lower()
+        if host not in self._hosts:
+            self._hosts[host] = _HostState(self._policy_for(host))
+        return self._hosts[host]
+
+    @asynccontextmanager
+    async def slot(self, url: str):
+        state = self._host(url)
+        async with state.semaphore:
+            await state.take_token()
+            async with self._global:
+                yield
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+
+    async def call(self, url: str, fn: Callable[[], Awaitable[T]]) -> T:
+        state = self._host(url)
+        attempt = 0
+        while True:
+            try:
+                async with self.slot(url):
+                    return await fn()
+            except Exception as e:
+                if attempt >= self.max_retries or not is_transient(e):
+                    raise
+                delay = self.backoff(attempt)
+                retry_after = getattr(e, "retry_after", None)
+                if retry_after is not None:
+                    delay = min(max(delay, retry_after), self.backoff_cap * 4)
+                    state.paused_until = max(state.paused_until, time.monotonic() + delay)
+                attempt += 1
+                await asyncio.sleep(delay)
+
+
+async def polite_goto(page, url: str, scheduler: Optional["PolitenessScheduler"] = None, **goto_kwargs):
+    # page.goto under the host's rate limit, retried on 429/5xx and timeouts
+    scheduler = scheduler or get_scheduler()
+
+    async def load():
+        response = await page.goto(url, **goto_kwargs)
+        if response is not None:
+            raise_for_retryable(response.status, url, response.headers)
+        return response
+
+    return await scheduler.call(url, load)
+
+
+_schedulers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, PolitenessScheduler]" = weakref.WeakKeyDictionary()
+
+
+def get_scheduler() -> PolitenessScheduler:
+    # asyncio primitives belong to one loop, and Streamlit starts a new loop per run
+    loop = asyncio.get_running_loop()
+    if loop not in _schedulers:
+        _schedulers[loop] = PolitenessScheduler()
+    return _schedulers[loop]
@@ -0,0 +1,124 @@
+# prompt_builder.py
+import os
+import re
+import threading
+from typing import Dict, Optional
+
+try:
+    import tiktoken
+except ImportError:  # optional: better counts than the character heuristic
+    tiktoken = None
+
+# Per-section budgets, in tokens, for scraped text embedded in prompts
+SECTION_BUDGETS = {
+    "sources": int(os.getenv("PROMPT_SOURCES_TOKENS", "2000")),
+    "descriptions": int(os.getenv("PROMPT_DESCRIPTIONS_TOKENS", "1500")),
+    "how_to_use": int(os.getenv("PROMPT_HOW_TO_USE_TOKENS", "300")),
+    "ingredients": int(os.getenv("PROMPT_INGREDIENTS_TOKENS", "300")),
+    "draft": int(os.getenv("PROMPT_DRAFT_TOKENS", "1500")),
+}
+# Ceiling for a whole prompt; sections are cut further if the total would pass it
+MAX_PROMPT_TOKENS = int(os.getenv("MAX_PROMPT_TOKENS", "6000"))
+
+# Characters per token by model family, measured on English retail copy;
+# Cohere and Gemini tokenizers are a little coarser than cl100k
+_CHARS_PER_TOKEN = {"command": 4.2, "gemini": 4.0}
+_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n+")
+_encoding = None
+
+
+def count_tokens(text: str, model: str = "") -> int:
+    global _encoding
+    if not text:
+        return 0
+    if tiktoken is not None:
+        if _encoding is None:
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        return len(_encoding.encode(text, disallowed_special=()))
+    ratio = next((r for prefix, r in _CHARS_PER_TOKEN.items() if model.startswith(prefix)), 4.0)
+    # Dense text (SKUs, numbers, punctuation) runs closer to 1.3 tokens per word
+    return max(int(len(text) / ratio), int(len(text.split()) * 1.3), 1)
+
+
+def truncate_to_tokens(text: str, budget: int, model: str = "") -> str:
+    # Cut at the last sentence end or line break that fits, keeping the text's own
+    # layout; a single over-long first sentence is cut on a word boundary
+    if count_tokens(text, model) <= budget:
+        return text
+    cut, used, start = 0, 0, 0
+    for match in _BOUNDARY.finditer(text):
+        used += count_tokens(text[start:match.start()], model)
+        if used > budget:
+            break
+        cut, start = match.start(), match.start()
+    if cut:
+        return text[:cut].rstrip()
+    words = text.split()
+    lo, hi = 0, len(words)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if count_tokens(" ".join(words[:mid]), model) <= budget:
+            lo = mid
+        else:
+            hi = mid - 1
+    return " ".join(words[:lo])
+
+
+class PromptMetrics:
+    """Prompt sizes per call site, for spotting the prompts that run long."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Dict[str, int]] = {}
+
+    def record(self, call: str, tokens: int, truncated: int) -> None:
+        with self._lock:
+            stats = self._calls.setdefault(call, {"count": 0, "total_tokens": 0, "max_tokens": 0, "truncated": 0})
+            stats["count"] += 1
+            stats["total_tokens"] += tokens
+            stats["max_tokens"] = max(stats["max_tokens"], tokens)
+            stats["truncated"] += truncated
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                call: {**s, "avg_tokens": s["total_tokens"] / s["count"] if s["count"] else 0.0}
+                for call, s in self._calls.items()
+            }
+
+
+prompt_metrics = PromptMetrics()
+
+
+class PromptBudget:
+    """Fits scraped sections into a prompt for one model call.
+
+        budget = PromptBudget("ai_generator", "command-r-plus")
+        desc = budget.fit("descriptions", raw_descriptions)
+        prompt = budget.finish(f"... {desc} ...")
+
+    `fit` truncates a section to its SECTION_BUDGETS entry (or an explicit
+    budget) on sentence boundaries; `finish` records the final prompt size.
+    """
+
+    def __init__(self, call: str, model: str, max_tokens: int = MAX_PROMPT_TOKENS):
+        self.call = call
+        self.model = model
+        self.max_tokens = max_tokens
+        self.used = 0
+        self.truncated = 0
+
+    def remaining(self) -> int:
+        return max(0, self.max_tokens - self.used)
+
+    def fit(self, section: str, text: str, budget: Optional[int] = None) -> str:
+        limit = min(budget if budget is not None else SECTION_BUDGETS.get(section, self.max_tokens), self.remaining())
+        fitted = truncate_to_tokens(text or "", limit, self.model)
+        if fitted != (text or ""):
+            self.truncated += 1
+        self.used += count_tokens(fitted, self.model)
+        return fitted
+
+    def finish(self, prompt: str) -> str:
+        prompt_metrics.record(self.call, count_tokens(prompt, self.model), self.truncated)
+        return prompt
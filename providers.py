@@ -0,0 +1,52 @@
+# providers.py
+# LLM SDK clients, created on first use instead of at import. The cohere and
+# google-generativeai packages take a noticeable part of a second to import,
+# and neither the UI's first paint nor a batch worker needs them until the
+# first generation call.
+import asyncio
+import os
+import threading
+import weakref
+from typing import Dict, Optional
+
+_lock = threading.Lock()
+_cohere_clients: Dict[str, object] = {}
+_cohere_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, object]]" = (
+    weakref.WeakKeyDictionary()
+)
+_gemini = None
+
+
+def cohere_client(api_key: Optional[str] = None):
+    api_key = api_key or os.getenv("COHERE_API_KEY")
+    with _lock:
+        if api_key not in _cohere_clients:
+            import cohere
+
+            _cohere_clients[api_key] = cohere.Client(api_key)
+        return _cohere_clients[api_key]
+
+
+def cohere_async_client(api_key: Optional[str] = None):
+    # The async client's connection pool belongs to one event loop, and each job runs its own
+    api_key = api_key or os.getenv("COHERE_API_KEY")
+    loop = asyncio.get_running_loop()
+    with _lock:
+        clients = _cohere_async_clients.setdefault(loop, {})
+        if api_key not in clients:
+            import cohere
+
+            clients[api_key] = cohere.AsyncClient(api_key)
+        return clients[api_key]
+
+
+def gemini():
+    # google.generativeai, configured once with GEMINI_API_KEY
+    global _gemini
+    with _lock:
+        if _gemini is None:
+            import google.generativeai as genai
+
+            genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+            _gemini = genai
+        return _gemini
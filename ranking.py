@@ -0,0 +1,118 @@
+# ranking.py
+import hashlib
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Sequence
+
+from prompt_builder import SECTION_BUDGETS, count_tokens
+
+DEFAULT_TOKEN_BUDGET = SECTION_BUDGETS["sources"]
+PASSAGE_CHARS = 600
+SIMHASH_DISTANCE = 8  # of 64 bits; unrelated passages sit around 32, copy with an added sentence under 8
+
+_WORD = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or our that the this to was were will with "
+    "you your".split()
+)
+
+
+@dataclass
+class Passage:
+    source: str
+    text: str
+    position: int
+    score: float = 0.0
+
+
+def tokenize(text: str) -> List[str]:
+    return [w for w in _WORD.findall(text.lower()) if w not in _STOPWORDS]
+
+
+def split_passages(source: str, text: str, max_chars: int = PASSAGE_CHARS) -> List[Passage]:
+    # Sentence-aligned chunks of about max_chars each
+    passages, current = [], ""
+    for sentence in _SENTENCE_END.split(" ".join(text.split())):
+        if current and len(current) + len(sentence) + 1 > max_chars:
+            passages.append(current)
+            current = ""
+        current = f"{current} {sentence}".strip()
+    if current:
+        passages.append(current)
+    return [Passage(source, p[: max_chars * 2], i) for i, p in enumerate(passages)]
+
+
+def bm25_scores(query: str, docs: Sequence[List[str]], k1: float = 1.5, b: float = 0.75) -> List[float]:
+    if not docs:
+        return []
+    terms = set(tokenize(query))
+    avg_len = sum(len(d) for d in docs) / len(docs) or 1.0
+    df = Counter(t for d in docs for t in set(d) if t in terms)
+    scores = []
+    for doc in docs:
+        tf = Counter(doc)
+        score = 0.0
+        for term in terms:
+            if not tf[term]:
+                continue
+            idf = math.log(1 + (len(docs) - df[term] + 0.5) / (df[term] + 0.5))
+            score += idf * tf[term] * (k1 + 1) / (tf[term] + k1 * (1 - b + b * len(doc) / avg_len))
+        scores.append(score)
+    return scores
+
+
+def simhash(tokens: List[str], shingle: int = 3) -> int:
+    if len(tokens) < shingle:
+        shingles = [" ".join(tokens)]
+    else:
+        shingles = [" ".join(tokens[i:i + shingle]) for i in range(len(tokens) - shingle + 1)]
+    weights = [0] * 64
+    for s in shingles:
+        h = int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += 1 if h >> bit & 1 else -1
+    return sum(1 << bit for bit, w in enumerate(weights) if w > 0)
+
+
+def near_duplicate(a: int, b: int, distance: int = SIMHASH_DISTANCE) -> bool:
+    return bin(a ^ b).count("1") <= distance
+
+
+def select_passages(
+    sources: Dict[str, str], query: str, token_budget: int = DEFAULT_TOKEN_BUDGET, model: str = ""
+) -> List[Passage]:
+    """Most query-relevant, non-redundant passages across all sources, within a token budget.
+
+    Passages are scored with BM25 against `query` (plus a small bonus for
+    appearing early on their page), near-duplicates are dropped by SimHash,
+    and the budget is filled greedily. Returned in source order.
+    """
+    passages = [p for url, text in sources.items() if text for p in split_passages(url, text)]
+    tokens = [tokenize(p.text) for p in passages]
+    for passage, score in zip(passages, bm25_scores(query, tokens)):
+        passage.score = score + 1.0 / (2 + passage.position)
+
+    order = sorted(range(len(passages)), key=lambda i: passages[i].score, reverse=True)
+    chosen, fingerprints, used = [], [], 0
+    for i in order:
+        cost = count_tokens(passages[i].text, model)
+        if used + cost > token_budget:
+            continue
+        fp = simhash(tokens[i])
+        if any(near_duplicate(fp, other) for other in fingerprints):
+            continue
+        chosen.append(i)
+        fingerprints.append(fp)
+        used += cost
+    source_rank = {url: n for n, url in enumerate(sources)}
+    return [passages[i] for i in sorted(chosen, key=lambda i: (source_rank[passages[i].source], passages[i].position))]
+
+
+def group_by_source(passages: Iterable[Passage]) -> Dict[str, str]:
+    grouped: Dict[str, List[str]] = {}
+    for p in passages:
+        grouped.setdefault(p.source, []).append(p.text)
+    return {source: " ".join(texts) for source, texts in grouped.items()}
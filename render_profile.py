@@ -0,0 +1,200 @@
+# render_profile.py
+import asyncio
+import json
+import os
+import threading
+from dataclasses import dataclass, fields, replace
+from typing import Dict, FrozenSet, Optional, Tuple
+from urllib.parse import urlsplit
+
+# JSON object of domain -> overrides of RenderProfile fields, e.g.
+#   {"sephora.com": {"settle_ms": 1500, "wait_selectors": ["[data-comp~=ProductPrice]"]},
+#    "fragile-shop.example": {"lean": false}}
+RENDER_PROFILES_PATH = os.getenv("RENDER_PROFILES_PATH", "render_profiles.json")
+
+BLOCKED_RESOURCE_TYPES = frozenset({"image", "font", "media"})
+
+# Analytics, ads, tag managers and session recorders: never needed to read a product page
+TRACKER_DOMAINS = frozenset({
+    "google-analytics.com", "googletagmanager.com", "googletagservices.com", "doubleclick.net",
+    "googlesyndication.com", "googleadservices.com", "facebook.net", "facebook.com", "hotjar.com",
+    "hotjar.io", "segment.io", "segment.com", "scorecardresearch.com", "criteo.com", "criteo.net",
+    "taboola.com", "outbrain.com", "bat.bing.com", "clarity.ms", "nr-data.net", "newrelic.com",
+    "optimizely.com", "analytics.tiktok.com", "ct.pinterest.com", "sc-static.net", "amazon-adsystem.com",
+    "adnxs.com", "quantserve.com", "quantcount.com", "klaviyo.com", "attentivemobile.com",
+    "fullstory.com", "mouseflow.com", "crazyegg.com", "quantummetric.com", "demdex.net", "omtrdc.net",
+    "everesttech.net", "rlcdn.com", "tiqcdn.com", "cquotient.com",
+})
+
+# Any of these in the DOM means the product content has rendered
+CONTENT_SELECTORS = (
+    '[itemtype*="schema.org/Product"]',
+    '[itemprop="price"]',
+    '[class*="price"]',
+    '[class*="Price"]',
+    '[class*="add-to-cart"]',
+    '[id*="add-to-cart"]',
+    'form[action*="/cart"]',
+)
+
+# Tried in order; the first one holding enough text is kept as the page body
+MAIN_SELECTORS = (
+    '[itemtype*="schema.org/Product"]',
+    "main",
+    '[role="main"]',
+    "#main",
+    "#content",
+    "article",
+)
+
+
+@dataclass(frozen=True)
+class RenderProfile:
+    """How a page is rendered: what to block, what to wait for, what to keep.
+
+    The lean default aborts images, fonts, media and tracker requests, waits
+    for DOMContentLoaded and then for any of `wait_selectors` (or at most
+    `wait_timeout_ms`), settles for `settle_ms`, and keeps the head's
+    structured data plus the first `main_selectors` region with at least
+    `min_main_chars` of text. `lean=False` is the old behaviour: everything
+    loaded, networkidle, whole document.
+    """
+
+    lean: bool = True
+    block_resource_types: FrozenSet[str] = BLOCKED_RESOURCE_TYPES
+    block_domains: FrozenSet[str] = TRACKER_DOMAINS
+    wait_selectors: Tuple[str, ...] = CONTENT_SELECTORS
+    wait_timeout_ms: int = 8000
+    settle_ms: int = 500
+    main_selectors: Tuple[str, ...] = MAIN_SELECTORS
+    min_main_chars: int = 500
+
+    @classmethod
+    def from_dict(cls, overrides: Dict, base: Optional["RenderProfile"] = None) -> "RenderProfile":
+        base = base or cls()
+        known = {f.name: f for f in fields(cls)}
+        values = {}
+        for key, value in overrides.items():
+            if key not in known:
+                continue
+            if key.startswith("block_"):
+                value = frozenset(value)
+            elif isinstance(value, list):
+                value = tuple(value)
+            values[key] = value
+        return replace(base, **values)
+
+
+DEFAULT_PROFILE = RenderProfile()
+
+_profiles: Optional[Dict[str, RenderProfile]] = None
+_profiles_lock = threading.Lock()
+
+
+def _host_matches(host: str, domain: str) -> bool:
+    return host == domain or host.endswith("." + domain)
+
+
+def load_profiles(path: str = RENDER_PROFILES_PATH) -> Dict[str, RenderProfile]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        raw = json.load(f)
+    return {domain.lower(): RenderProfile.from_dict(overrides) for domain, overrides in raw.items()}
+
+
+def profile_for(url: str, profiles: Optional[Dict[str, RenderProfile]] = None) -> RenderProfile:
+    # The most specific matching domain wins, as with PageCache.ttl_for
+    global _profiles
+    if profiles is None:
+        with _profiles_lock:
+            if _profiles is None:
+                _profiles = load_profiles()
+            profiles = _profiles
+    host = (urlsplit(url).hostname or "").lower()
+    best = None
+    for domain in profiles:
+        if _host_matches(host, domain) and (best is None or len(domain) > len(best)):
+            best = domain
+    return profiles[best] if best else DEFAULT_PROFILE
+
+
+async def block_requests(page, profile: RenderProfile, stats: Optional[Dict[str, int]] = None) -> None:
+    """Abort requests the profile doesn't need; counts land in `stats`.
+
+    `stats` gets "blocked", "requests" and "bytes" (the Content-Length of
+    responses that were let through, so a lower bound on bandwidth).
+    """
+    stats = stats if stats is not None else {}
+    for key in ("blocked", "requests", "bytes"):
+        stats.setdefault(key, 0)
+    if not profile.lean:
+        return
+
+    async def handle(route):
+        request = route.request
+        host = (urlsplit(request.url).hostname or "").lower()
+        if request.resource_type in profile.block_resource_types or any(
+            _host_matches(host, d) for d in profile.block_domains
+        ):
+            stats["blocked"] += 1
+            await route.abort()
+        else:
+            stats["requests"] += 1
+            await route.continue_()
+
+    def on_response(response):
+        try:
+            stats["bytes"] += int(response.headers.get("content-length", 0))
+        except ValueError:
+            pass
+
+    page.on("response", on_response)
+    await page.route("**/*", handle)
+
+
+async def wait_for_content(page, profile: RenderProfile) -> bool:
+    # True if a content selector showed up; either way the page is read afterwards
+    if not profile.lean:
+        try:
+            await page.wait_for_load_state("networkidle", timeout=15000)
+        except Exception:
+            pass
+        return True
+    found = False
+    if profile.wait_selectors:
+        try:
+            await page.wait_for_selector(
+                ", ".join(profile.wait_selectors), state="attached", timeout=profile.wait_timeout_ms
+            )
+            found = True
+        except Exception:
+            pass
+    if profile.settle_ms:
+        await asyncio.sleep(profile.settle_ms / 1000)
+    return found
+
+
+_MAIN_REGION_JS = """
+([selectors, minChars]) => {
+    let main = null;
+    for (const selector of selectors) {
+        for (const el of document.querySelectorAll(selector)) {
+            if ((el.innerText || "").trim().length >= minChars) { main = el; break; }
+        }
+        if (main) break;
+    }
+    const head = Array.from(document.querySelectorAll(
+        'title, meta[property], meta[name], meta[itemprop], link[rel="canonical"], script[type="application/ld+json"]'
+    )).filter(el => !(main && main.contains(el))).map(el => el.outerHTML).join("\\n");
+    const body = main ? main.outerHTML : document.body ? document.body.outerHTML : "";
+    return `<html><head>${head}</head><body>${body}</body></html>`;
+}
+"""
+
+
+async def page_html(page, profile: RenderProfile) -> str:
+    # The main content region plus the head's structured data, or the whole document
+    if not profile.lean or not profile.main_selectors:
+        return await page.content()
+    return await page.evaluate(_MAIN_REGION_JS, [list(profile.main_selectors), profile.min_main_chars])
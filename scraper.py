@@ -1,12 +1,16 @@
 # scraper.py
 import asyncio
-from playwright.sync_api import sync_playwright
-from utils import clean_html
-import re
+from fetcher import TieredFetcher
+from page_cache import fetch_with_cache, get_page_cache
+from parse_pool import parse_product_page, run_in_parse_pool
+from search_providers import get_search_provider
 
-def scrape_product_data(product_name, primary_keywords, secondary_keywords):
+def scrape_product_data(product_name, primary_keywords, secondary_keywords, pool=None, cache=None):
+    return asyncio.run(scrape_product_data_async(product_name, primary_keywords, secondary_keywords, pool=pool, cache=cache))
+
+async def scrape_product_data_async(product_name, primary_keywords, secondary_keywords, pool=None, cache=None):
+    cache = cache if cache is not None else get_page_cache()
     query = f"{product_name} {' '.join(primary_keywords.split(','))} {' '.join(secondary_keywords.split(','))}"
-    urls = []
     data = {
         "descriptions": [],
         "ingredients": [],
@@ -16,43 +20,62 @@ def scrape_product_data(product_name, primary_keywords, secondary_keywords):
         "prices_cad": [],
     }
 
-    def extract_prices(text):
-        usd = re.findall(r'\$\d+(?:\.\d{2})?', text)
-        cad = re.findall(r'CAD\s*\$\d+(?:\.\d{2})?', text)
-        return usd, cad
-
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        page = browser.new_page()
-        page.goto(f"https://www.google.com/search?q={query}")
-
-        links = page.locator("a:visible")
-        for i in range(min(10, links.count())):
-            href = links.nth(i).get_attribute("href")
-            if href and href.startswith("http") and "google.com" not in href:
-                urls.append(href)
-
-        for url in urls:
-            try:
-                page.goto(url, timeout=10000)
-                content = page.content()
-                cleaned = clean_html(content)
-                data["descriptions"].append(cleaned)
-                if "ingredients" in cleaned.lower():
-                    data["ingredients"].append(cleaned)
-                if "how to use" in cleaned.lower():
-                    data["how_to_use"].append(cleaned)
-                if "upc" in cleaned.lower() and not data["upc"]:
-                    match = re.search(r'UPC[:\s]*([0-9]{8,14})', cleaned)
-                    if match:
-                        data["upc"] = match.group(1)
-
-                usd, cad = extract_prices(cleaned)
-                data["prices_usd"].extend(usd)
-                data["prices_cad"].extend(cad)
-            except Exception as e:
-                print("Error scraping", url, e)
-                continue
-        browser.close()
+    async def fetch(fetcher, url):
+        try:
+            result = await fetcher.fetch(url)
+            return result.text, result.facts
+        except Exception as e:
+            print("Error scraping", url, e)
+            return None
+
+    # A cached SERP and plain-HTTP pages never launch a browser; the fetcher starts one only to render
+    urls = await get_search_provider(pool).search(query, max_links=10)
+    async with TieredFetcher(pool=pool, cache=cache) as fetcher:
+        pages = await asyncio.gather(*[fetch(fetcher, url) for url in urls])
+
+    for url, result in zip(urls, pages):
+        if result is None:
+            continue
+        cleaned, facts = result
+        try:
+            data["descriptions"].append(cleaned)
+            if "ingredients" in cleaned.lower():
+                data["ingredients"].append(cleaned)
+            if "how to use" in cleaned.lower():
+                data["how_to_use"].append(cleaned)
+            if facts.gtin and not data["upc"]:
+                data["upc"] = facts.gtin
+
+            # Offers come from JSON-LD/OpenGraph/microdata first, regex over price cues only as
+            # fallback; kept as amounts so the generator compares numbers, not "$9.99" strings
+            data["prices_usd"].extend(facts.prices("USD"))
+            data["prices_cad"].extend(facts.prices("CAD"))
+        except Exception as e:
+            print("Error scraping", url, e)
+            continue
 
     return data
+
+async def extract_product_info(session, url, cache=None, fetcher=None):
+    try:
+        if fetcher is not None:
+            # Escalates to a headless render only when the plain HTML has no product content
+            text = (await fetcher.fetch(url)).html
+        else:
+            text = await fetch_with_cache(session, url, cache, headers={"User-Agent": "Mozilla/5.0"}, timeout=10)
+        # Parse/clean/score runs in the process pool so pages don't queue on the GIL
+        parsed = await run_in_parse_pool(parse_product_page, url, text)
+        if cache is not None:
+            cache.set_text(url, parsed.long_desc)
+
+        if not parsed.is_product:
+            return {"url": url, "error": "Page doesn't appear to be a product page."}
+
+        return {
+            "url": url,
+            "title": parsed.title,
+            "short_desc": parsed.short_desc,
+            "long_desc": parsed.long_desc
+        }
+    except Exception as e:
+        return {"url": url, "error": str(e)}
@@ -0,0 +1,221 @@
+# search_providers.py
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import parse_qs, quote_plus, urlsplit
+
+import aiohttp
+
+from browser_pool import BrowserPool, borrowed_pool
+from fetcher import USER_AGENT
+from politeness import get_scheduler, polite_goto, raise_for_retryable
+from render_profile import block_requests, profile_for
+from tracing import span
+from utils import normalize_url
+
+BLOCKED_DOMAINS = (
+    "google.", "gstatic.com", "youtube.com", "facebook.com", "instagram.com",
+    "pinterest.", "twitter.com", "x.com", "tiktok.com", "reddit.com",
+)
+DEFAULT_SERP_CACHE_PATH = os.getenv("SERP_CACHE_PATH", os.path.join(".cache", "serp.sqlite"))
+DEFAULT_SERP_TTL = float(os.getenv("SERP_CACHE_TTL", str(6 * 3600)))
+
+
+def _host_matches(host: str, domain: str) -> bool:
+    # "google." matches any Google TLD, "x.com" only x.com and its subdomains
+    labels = host.split(".")
+    if domain.endswith("."):
+        return any(".".join(labels[i:]).startswith(domain) for i in range(len(labels)))
+    return host == domain or host.endswith("." + domain)
+
+
+def filter_result_links(links: Iterable[str], max_links: int) -> List[str]:
+    # One set of rules for every backend: unwrap /url?q= redirects, drop
+    # non-http, social/search domains and duplicates (by normalized URL)
+    results = []
+    seen = set()
+    for link in links:
+        if not link:
+            continue
+        if "/url?" in link:
+            params = parse_qs(urlsplit(link).query)
+            target = params.get("q") or params.get("url")
+            link = target[0] if target else link
+        if not link.startswith(("http://", "https://")):
+            continue
+        host = (urlsplit(link).hostname or "").lower()
+        if any(_host_matches(host, d) for d in BLOCKED_DOMAINS):
+            continue
+        key = normalize_url(link)
+        if key in seen:
+            continue
+        seen.add(key)
+        results.append(link)
+        if len(results) >= max_links:
+            break
+    return results
+
+
+class SearchProvider:
+    """Returns result URLs for a query. Subclasses implement `_search`."""
+
+    name = "base"
+
+    async def search(self, query: str, max_links: int = 8) -> List[str]:
+        return filter_result_links(await self._search(query, max_links), max_links)
+
+    async def _search(self, query: str, max_links: int) -> List[str]:
+        raise NotImplementedError
+
+
+class GoogleBrowserProvider(SearchProvider):
+    """Renders google.com/search in the shared browser pool; waits for results, not a fixed sleep."""
+
+    name = "google"
+
+    def __init__(self, pool: Optional[BrowserPool] = None):
+        self.pool = pool
+
+    async def _search(self, query: str, max_links: int) -> List[str]:
+        # ask for extra results: filtering drops Google's own and social links
+        url = f"https://www.google.com/search?q={quote_plus(query)}&num={max_links * 2}"
+        async with borrowed_pool(self.pool) as bp, bp.page(user_agent=USER_AGENT) as page:
+            await block_requests(page, profile_for(url))  # the result links are all that's read
+            await polite_goto(page, url, timeout=30000, wait_until="domcontentloaded")
+            await page.wait_for_selector("#search a, a[href^='/url?']", timeout=10000)
+            return await page.eval_on_selector_all("a", "els => els.map(el => el.href)")
+
+
+class GoogleCSEProvider(SearchProvider):
+    """Google Custom Search JSON API: no browser at all (GOOGLE_CSE_KEY / GOOGLE_CSE_ID)."""
+
+    name = "google-cse"
+
+    def __init__(self, api_key: Optional[str] = None, engine_id: Optional[str] = None):
+        self.api_key = api_key or os.getenv("GOOGLE_CSE_KEY")
+        self.engine_id = engine_id or os.getenv("GOOGLE_CSE_ID")
+
+    async def _search(self, query: str, max_links: int) -> List[str]:
+        url = "https://www.googleapis.com/customsearch/v1"
+        params = {"key": self.api_key, "cx": self.engine_id, "q": query, "num": min(10, max_links * 2)}
+
+        async def call():
+            async with aiohttp.ClientSession() as session:
+                async with session.get(url, params=params, timeout=15) as response:
+                    raise_for_retryable(response.status, url, response.headers)
+                    response.raise_for_status()
+                    return await response.json()
+
+        data = await get_scheduler().call(url, call)
+        return [item.get("link", "") for item in data.get("items", [])]
+
+
+class FixtureSearchProvider(SearchProvider):
+    """Canned results for offline runs: {query: [urls]} or a JSON file of the same shape."""
+
+    name = "fixture"
+
+    def __init__(self, results: Optional[Dict[str, List[str]]] = None, path: Optional[str] = None):
+        if path:
+            with open(path, encoding="utf-8") as f:
+                results = json.load(f)
+        self.results = results or {}
+
+    async def _search(self, query: str, max_links: int) -> List[str]:
+        return list(self.results.get(query, self.results.get("*", [])))
+
+
+class SerpCache:
+    """SQLite store of result links keyed by (provider, normalized query), with a TTL."""
+
+    def __init__(self, path: str = DEFAULT_SERP_CACHE_PATH, ttl: float = DEFAULT_SERP_TTL):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS serps (provider TEXT, query TEXT, links TEXT, fetched_at REAL,"
+            " max_links INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (provider, query))"
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(serps)")}
+        if "max_links" not in columns:
+            # Caches written before entries recorded how many links were asked for
+            self._db.execute("ALTER TABLE serps ADD COLUMN max_links INTEGER NOT NULL DEFAULT 0")
+            self._db.commit()
+
+    @staticmethod
+    def _key(query: str) -> str:
+        return " ".join(query.lower().split())
+
+    def get(self, provider: str, query: str, max_links: int = 0) -> Optional[List[str]]:
+        # An entry answers for `max_links` if it was fetched asking for at least that
+        # many, even when fewer survived filtering, or if it simply holds enough
+        with self._lock:
+            row = self._db.execute(
+                "SELECT links, fetched_at, max_links FROM serps WHERE provider = ? AND query = ?",
+                (provider, self._key(query)),
+            ).fetchone()
+        if row is None or time.time() - row[1] >= self.ttl:
+            return None
+        links = json.loads(row[0])
+        if row[2] < max_links and len(links) < max_links:
+            return None
+        return links
+
+    def put(self, provider: str, query: str, links: List[str], max_links: int = 0) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO serps (provider, query, links, fetched_at, max_links) VALUES (?, ?, ?, ?, ?)",
+                (provider, self._key(query), json.dumps(links), time.time(), max_links),
+            )
+            self._db.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+_shared_serp_cache: Optional[SerpCache] = None
+
+
+def get_serp_cache() -> SerpCache:
+    global _shared_serp_cache
+    if _shared_serp_cache is None:
+        _shared_serp_cache = SerpCache()
+    return _shared_serp_cache
+
+
+class CachedSearchProvider(SearchProvider):
+    """Serves repeat queries from the SERP cache; only misses reach the wrapped provider."""
+
+    def __init__(self, provider: SearchProvider, cache: Optional[SerpCache] = None):
+        self.provider = provider
+        self.name = provider.name
+        self.cache = cache or get_serp_cache()
+
+    async def search(self, query: str, max_links: int = 8) -> List[str]:
+        with span("serp", provider=self.name, query=query) as s:
+            links = self.cache.get(self.name, query, max_links)
+            if links is not None:
+                links = links[:max_links]
+                s.set(cache="hit", results=len(links))
+                return links
+            links = await self.provider.search(query, max_links)
+            s.set(cache="miss", results=len(links))
+            if links:
+                self.cache.put(self.name, query, links, max_links)
+            return links
+
+
+def get_search_provider(pool: Optional[BrowserPool] = None, cache: Optional[SerpCache] = None) -> SearchProvider:
+    # SEARCH_PROVIDER=google (default) | google-cse | fixture:/path/to/results.json
+    choice = os.getenv("SEARCH_PROVIDER", "google")
+    if choice.startswith("fixture:"):
+        return FixtureSearchProvider(path=choice.split(":", 1)[1])
+    if choice == "google-cse":
+        return CachedSearchProvider(GoogleCSEProvider(), cache)
+    return CachedSearchProvider(GoogleBrowserProvider(pool), cache)
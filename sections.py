@@ -0,0 +1,174 @@
+# sections.py
+# Per-field product copy: one small JSON-constrained call per ProductInfo
+# section, all sent at once, and only the sections that come back malformed
+# or outside their length limits are asked for again.
+import json
+import os
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from llm_router import LLMRouter
+from prompt_builder import PromptBudget
+from tracing import span
+
+SECTION_RETRIES = int(os.getenv("SECTION_RETRIES", "2"))
+
+
+@dataclass(frozen=True)
+class SectionSpec:
+    name: str
+    label: str
+    instruction: str
+    unit: str = ""  # "chars" | "words" | "" (only has to be non-empty)
+    low: int = 0
+    high: int = 0
+    sources_tokens: int = 1500  # how much scraped text the section gets to see
+
+    def measure(self, value: str) -> int:
+        return len(value.split()) if self.unit == "words" else len(value)
+
+    def distance(self, value: str) -> int:
+        # How far outside the limits `value` is; 0 when within them
+        if not self.unit:
+            return 0 if value.strip() else 1
+        size = self.measure(value)
+        return max(self.low - size, size - self.high, 0)
+
+    def problem(self, value: str) -> Optional[str]:
+        # Why `value` is out of spec, or None if it's fine
+        if not value.strip():
+            return "it was empty"
+        if self.unit and not self.low <= self.measure(value) <= self.high:
+            return f"it was {self.measure(value)} {self.unit}; it must be {self.low}-{self.high} {self.unit}"
+        return None
+
+
+# The same limits run_app shows as ✅/⚠️
+SECTION_SPECS: Dict[str, SectionSpec] = {s.name: s for s in [
+    SectionSpec("meta_title", "Meta title", "An SEO meta title that starts with the primary keyword.",
+                "chars", 50, 60, sources_tokens=500),
+    SectionSpec("meta_description", "Meta description", "An SEO meta description using 1-2 primary keywords.",
+                "chars", 120, 160, sources_tokens=500),
+    SectionSpec("short_description", "Short description",
+                "A 2-4 sentence product summary using the primary and secondary keywords naturally.",
+                "words", 50, 160, sources_tokens=1000),
+    SectionSpec("full_description", "Full description",
+                "The full product description: the problem it targets, benefits and key features.",
+                "words", 300, 350),
+    SectionSpec("how_to_use", "How to use", "Concise usage instructions, from the sources where they have them."),
+    SectionSpec("ingredients", "Ingredients",
+                "The main ingredients, noting that the full list is on the packaging."),
+]}
+
+
+def section_schema(spec: SectionSpec) -> Dict:
+    return {"type": "object", "properties": {spec.name: {"type": "string"}}, "required": [spec.name]}
+
+
+def build_section_prompt(
+    spec: SectionSpec,
+    product_name: str,
+    primary: str,
+    secondary: str,
+    sources: str,
+    model: str,
+    retry: Optional[Tuple[str, str]] = None,
+) -> str:
+    budget = PromptBudget(f"section.{spec.name}", model)
+    sources = budget.fit("sources", sources, spec.sources_tokens)
+    limit = f" Length: {spec.low}-{spec.high} {spec.unit}." if spec.unit else ""
+    feedback = ""
+    if retry is not None:
+        previous, problem = retry
+        feedback = f"\nYour previous answer was rejected because {problem}:\n{previous}\n"
+    return budget.finish(f"""
+You are a seasoned product copywriter writing natural, human-sounding SEO copy.
+
+Product Name: {product_name}
+Primary Keywords: {primary}
+Secondary Keywords: {secondary}
+
+SCRAPED DATA:
+{sources}
+
+Write only the {spec.label.upper()}. {spec.instruction}{limit}
+{feedback}
+Answer with a JSON object and nothing else: {{"{spec.name}": "..."}}
+""")
+
+
+def parse_section(text: str, name: str) -> Optional[str]:
+    # Constrained output is plain JSON; the legacy endpoint may wrap it in a fence or prose
+    candidates = [text.strip()]
+    match = re.search(r"\{.*\}", text, re.DOTALL)
+    if match:
+        candidates.append(match.group(0))
+    for candidate in candidates:
+        try:
+            value = json.loads(candidate).get(name)
+        except (ValueError, AttributeError):
+            continue
+        if isinstance(value, str):
+            return value.strip()
+    return None
+
+
+def generate_sections(
+    router: LLMRouter,
+    product_name: str,
+    primary: str,
+    secondary: str,
+    sources: str,
+    model: str,
+    names: Optional[List[str]] = None,
+    retries: int = SECTION_RETRIES,
+    use_cache: bool = True,
+) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """Generate each section with its own concurrent call.
+
+    Returns (sections, problems): every requested name maps to its best
+    text, and `problems` names the sections still out of spec after
+    `retries` rounds of regenerating just those.
+    """
+    specs = [SECTION_SPECS[n] for n in (names or list(SECTION_SPECS))]
+    sections: Dict[str, str] = {}
+    failures: Dict[str, str] = {}  # sections with no usable answer yet
+    todo = {spec.name: None for spec in specs}  # name -> (previous answer, problem) for the retry prompt
+    with span("sections", count=len(specs)) as s:
+        for attempt in range(retries + 1):
+            batch = [SECTION_SPECS[n] for n in todo]
+            prompts = [
+                build_section_prompt(spec, product_name, primary, secondary, sources, model, todo[spec.name])
+                for spec in batch
+            ]
+            results = router.complete_many(prompts, use_cache, schemas=[section_schema(spec) for spec in batch])
+            todo = {}
+            for spec, result in zip(batch, results):
+                if result is None:
+                    failures[spec.name] = "every model route failed"
+                    todo[spec.name] = None
+                    continue
+                value = parse_section(result.text, spec.name)
+                if value is None:
+                    failures[spec.name] = "it was not valid JSON"
+                    todo[spec.name] = (result.text[:500], failures[spec.name])
+                    continue
+                failures.pop(spec.name, None)
+                # Keep the closest answer so far even if it misses the limits
+                if spec.name not in sections or spec.distance(value) < spec.distance(sections[spec.name]):
+                    sections[spec.name] = value
+                problem = spec.problem(value)
+                if problem is not None:
+                    todo[spec.name] = (value, problem)
+            if not todo or attempt == retries:
+                break
+            s.add("regenerated", len(todo))
+        problems = {}
+        for spec in specs:
+            problem = spec.problem(sections[spec.name]) if spec.name in sections else failures.get(spec.name)
+            if problem is not None:
+                problems[spec.name] = problem
+            sections.setdefault(spec.name, "")
+        s.set(out_of_spec=len(problems))
+    return sections, problems
@@ -0,0 +1,182 @@
+# structured_data.py
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional
+
+from extraction import PageExtract
+
+GTIN_KEYS = ("gtin12", "gtin13", "gtin", "gtin14", "gtin8", "upc", "ean")
+MAX_CANDIDATES = 25
+WINDOW = 60
+
+_PRICE_CUE = re.compile(r"price|cost|sale|msrp|mrp|\bCAD\b|\bUSD\b|\$", re.IGNORECASE)
+_PRICE = re.compile(
+    r"(?:(?P<cur>CAD|USD|CA\$|C\$|US\$)\s*\$?|\$)\s?(?P<amt>\d{1,3}(?:,\d{3})+(?:\.\d{2})?|\d{1,5}(?:\.\d{2})?)\b"
+    r"|(?P<amt2>\d{1,4}\.\d{2})\s*(?P<cur2>CAD|USD)\b",
+    re.IGNORECASE,
+)
+_CODE_CUE = re.compile(r"\b(?:UPC|GTIN|EAN|barcode)\b", re.IGNORECASE)
+_CODE = re.compile(r"\b(\d{12,13})\b")
+
+
+@dataclass
+class Offer:
+    price: float
+    currency: str
+    source: str
+
+
+@dataclass
+class ProductFacts:
+    name: str = ""
+    brand: str = ""
+    gtin: str = ""
+    offers: List[Offer] = field(default_factory=list)
+
+    def prices(self, currency: str) -> List[float]:
+        return [o.price for o in self.offers if o.currency == currency]
+
+
+def valid_gtin(code: str) -> bool:
+    # GS1 check digit: weights 3/1 from the right, excluding the check digit
+    if not code.isdigit() or len(code) not in (8, 12, 13, 14):
+        return False
+    digits = [int(d) for d in code]
+    total = sum(d * (3 if i % 2 == 0 else 1) for i, d in enumerate(reversed(digits[:-1])))
+    return (10 - total % 10) % 10 == digits[-1]
+
+
+def _to_price(value) -> Optional[float]:
+    # "1,299.00" and "1.299,00": with both separators the last one is the decimal point;
+    # a lone comma before exactly two digits ("24,99") is one too, other commas group thousands
+    text = re.sub(r"\s", "", str(value))
+    if "," in text and "." in text:
+        decimal = "," if text.rfind(",") > text.rfind(".") else "."
+        text = text.replace("." if decimal == "," else ",", "").replace(",", ".")
+    elif re.fullmatch(r"\d*,\d{2}", text):
+        text = text.replace(",", ".")
+    else:
+        text = text.replace(",", "")
+    try:
+        amount = float(text)
+    except ValueError:
+        return None
+    return amount if amount > 0 else None
+
+
+def _currency(code: str, url: str = "") -> str:
+    code = (code or "").upper().replace("$", "")
+    if code in ("CAD", "CA", "C"):
+        return "CAD"
+    if code in ("USD", "US"):
+        return "USD"
+    return "CAD" if ".ca/" in (url.lower() + "/") else "USD"
+
+
+def _walk(node) -> Iterator[Dict]:
+    if isinstance(node, list):
+        for item in node:
+            yield from _walk(item)
+    elif isinstance(node, dict):
+        yield node
+        for key in ("@graph", "mainEntity", "itemListElement", "item"):
+            if key in node:
+                yield from _walk(node[key])
+
+
+def _is_type(node: Dict, name: str) -> bool:
+    types = node.get("@type", [])
+    types = types if isinstance(types, list) else [types]
+    return any(str(t).split("/")[-1] == name for t in types)
+
+
+def _from_json_ld(page: PageExtract, facts: ProductFacts, url: str) -> None:
+    for node in _walk(page.json_ld):
+        if not _is_type(node, "Product"):
+            continue
+        facts.name = facts.name or str(node.get("name") or "")
+        brand = node.get("brand")
+        if isinstance(brand, dict):
+            brand = brand.get("name")
+        facts.brand = facts.brand or str(brand or "")
+        for key in GTIN_KEYS:
+            code = str(node.get(key) or "").strip()
+            if code and not facts.gtin and valid_gtin(code):
+                facts.gtin = code
+        offers = node.get("offers") or []
+        for offer in offers if isinstance(offers, list) else [offers]:
+            if not isinstance(offer, dict):
+                continue
+            spec = offer.get("priceSpecification")
+            spec = spec[0] if isinstance(spec, list) and spec else spec
+            currency = offer.get("priceCurrency") or (spec or {}).get("priceCurrency")
+            for key in ("price", "lowPrice", "highPrice"):
+                amount = _to_price(offer.get(key) or ((spec or {}).get(key) if isinstance(spec, dict) else None))
+                if amount:
+                    facts.offers.append(Offer(amount, _currency(currency, url), "json-ld"))
+
+
+def _from_meta(page: PageExtract, facts: ProductFacts, url: str) -> None:
+    meta = page.meta
+    for prefix in ("product:price", "og:price"):
+        amount = _to_price(meta.get(f"{prefix}:amount", ""))
+        if amount and not any(o.source == "json-ld" for o in facts.offers):
+            facts.offers.append(Offer(amount, _currency(meta.get(f"{prefix}:currency", ""), url), "opengraph"))
+    facts.brand = facts.brand or meta.get("product:brand", "") or meta.get("og:brand", "")
+    code = meta.get("product:upc", "") or meta.get("product:ean", "") or meta.get("product:gtin", "")
+    if code and not facts.gtin and valid_gtin(code):
+        facts.gtin = code
+
+
+def _from_microdata(page: PageExtract, facts: ProductFacts, url: str) -> None:
+    md = page.microdata
+    currencies = md.get("priceCurrency", [])
+    prices = [] if facts.offers else md.get("price", []) + md.get("lowPrice", [])
+    for i, raw in enumerate(prices):
+        amount = _to_price(re.sub(r"[^\d.,]", "", raw))
+        if amount:
+            currency = currencies[min(i, len(currencies) - 1)] if currencies else ""
+            facts.offers.append(Offer(amount, _currency(currency, url), "microdata"))
+    facts.brand = facts.brand or next(iter(md.get("brand", [])), "")
+    for key in GTIN_KEYS:
+        for code in md.get(key, []):
+            if not facts.gtin and valid_gtin(code):
+                facts.gtin = code
+
+
+def _regions(text: str, cue: re.Pattern) -> Iterator[str]:
+    for i, m in enumerate(cue.finditer(text)):
+        if i >= MAX_CANDIDATES:
+            break
+        yield text[max(0, m.start() - WINDOW): m.end() + WINDOW]
+
+
+def _from_text(text: str, facts: ProductFacts, url: str) -> None:
+    # Fallback only: regex over short windows around price/code cues, not the whole page
+    if not facts.offers:
+        seen = set()
+        for region in _regions(text, _PRICE_CUE):
+            for m in _PRICE.finditer(region):
+                amount = _to_price(m.group("amt") or m.group("amt2") or "")
+                currency = _currency(m.group("cur") or m.group("cur2") or "", url)
+                if amount and (amount, currency) not in seen:
+                    seen.add((amount, currency))
+                    facts.offers.append(Offer(amount, currency, "text"))
+    if not facts.gtin:
+        for region in _regions(text, _CODE_CUE):
+            for code in _CODE.findall(region):
+                if valid_gtin(code):
+                    facts.gtin = code
+                    return
+
+
+def extract_product_facts(page: Optional[PageExtract], text: str = "", url: str = "") -> ProductFacts:
+    facts = ProductFacts()
+    if page is not None:
+        _from_json_ld(page, facts, url)
+        if not facts.offers or not facts.gtin:
+            _from_meta(page, facts, url)
+            _from_microdata(page, facts, url)
+        text = text or page.text
+    _from_text(text, facts, url)
+    return facts
@@ -0,0 +1,49 @@
+# tests/conftest.py
+import os
+import sys
+import tempfile
+from contextlib import asynccontextmanager
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Keep every on-disk store out of the working tree and parse in-process;
+# set before the project modules read them at import time
+_SCRATCH = tempfile.mkdtemp(prefix="tests-")
+for _name, _file in [
+    ("PAGE_CACHE_PATH", "pages.sqlite"),
+    ("LLM_CACHE_PATH", "llm.sqlite"),
+    ("SERP_CACHE_PATH", "serp.sqlite"),
+    ("KNOWLEDGE_PATH", "knowledge.sqlite"),
+    ("FINGERPRINT_PATH", "fingerprints.sqlite"),
+    ("FETCH_DECISIONS_PATH", "render_domains.json"),
+    ("DATASET_STAGING_PATH", "dataset_staging.jsonl"),
+]:
+    os.environ.setdefault(_name, os.path.join(_SCRATCH, _file))
+os.environ.setdefault("PARSE_WORKERS", "0")
+
+
+@asynccontextmanager
+async def _serve(routes):
+    """A local aiohttp server for `routes` ({path: handler}); yields its base URL."""
+    from aiohttp import web
+
+    app = web.Application()
+    for path, handler in routes.items():
+        app.router.add_get(path, handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        await runner.cleanup()
+
+
+@pytest.fixture
+def serve():
+    return _serve
@@ -0,0 +1,29 @@
+# tests/test_ai_generator.py
+from types import SimpleNamespace
+
+import ai_generator
+from ai_generator import generate_humanized_output, price_range
+
+
+def test_price_range_compares_amounts_not_strings():
+    assert price_range([9.99, 100.0, 24.5], "$") == ("$100.00", "$9.99")
+    assert price_range([1299.0, 89.0], "CAD $") == ("CAD $1299.00", "CAD $89.00")
+    assert price_range([], "$") == ("N/A", "N/A")
+
+
+def test_generated_output_reports_the_price_range(monkeypatch):
+    prompts = []
+
+    def complete(prompt, use_cache=True):
+        prompts.append(prompt)
+        return SimpleNamespace(text="\n".join(f"line {i}" for i in range(16)))
+
+    monkeypatch.setattr(ai_generator.generator_router, "complete", complete)
+    scraped = {
+        "descriptions": ["Volumizing shampoo for fine hair."], "how_to_use": [], "ingredients": [],
+        "upc": "4064666002743", "prices_usd": [9.99, 24.0, 100.0], "prices_cad": [],
+    }
+    output = generate_humanized_output("Volupt Shampoo", "shampoo", "volume", scraped)
+    assert (output["Highest Price (USD)"], output["Lowest Price (USD)"]) == ("$100.00", "$9.99")
+    assert output["Highest Price (CAD)"] == output["Lowest Price (CAD)"] == "N/A"
+    assert "Highest & Lowest Price (USD): $100.00 / $9.99" in prompts[0]
@@ -0,0 +1,69 @@
+# tests/test_batch.py
+import json
+
+import pytest
+
+from batch import Checkpoint, JsonlSink, ParquetSink, read_products
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+def record(i):
+    return {"id": f"sku-{i}", "product_name": f"Product {i}", "pricing": {"usa": {"highest": "N/A"}}}
+
+
+def parquet_ids(directory):
+    return sorted(pq.read_table(str(directory)).column("id").to_pylist())
+
+
+def test_each_row_is_done_as_soon_as_it_is_written(tmp_path):
+    checkpoint = Checkpoint(str(tmp_path / "out.checkpoint"))
+    sink = ParquetSink(str(tmp_path / "out"), rows_per_file=500)
+    for i in range(3):
+        checkpoint.mark(sink.write(record(i)))
+    assert checkpoint.done == {"sku-0", "sku-1", "sku-2"}
+    assert Checkpoint(str(tmp_path / "out.checkpoint")).done == checkpoint.done
+    assert list((tmp_path / "out").glob("*.parquet")) == []  # still staged
+
+    checkpoint.mark(sink.close())
+    assert parquet_ids(tmp_path / "out") == ["sku-0", "sku-1", "sku-2"]
+    assert [p.name for p in (tmp_path / "out").iterdir() if not p.name.endswith(".parquet")] == []
+
+
+def test_part_files_hold_rows_per_file_rows(tmp_path):
+    sink = ParquetSink(str(tmp_path / "out"), rows_per_file=2)
+    for i in range(5):
+        sink.write(record(i))
+    assert len(list((tmp_path / "out").glob("*.parquet"))) == 2
+    sink.close()
+    parts = sorted((tmp_path / "out").glob("*.parquet"))
+    assert sorted(pq.read_table(str(p)).num_rows for p in parts) == [1, 2, 2]
+    assert parquet_ids(tmp_path / "out") == [f"sku-{i}" for i in range(5)]
+
+
+def test_rows_staged_before_a_crash_are_kept_once(tmp_path):
+    sink = ParquetSink(str(tmp_path / "out"), rows_per_file=2)
+    for i in range(3):
+        sink.write(record(i))
+    sink._staged.close()  # the process dies with sku-2 staged, never flushed
+
+    sink = ParquetSink(str(tmp_path / "out"), rows_per_file=2)
+    sink.write(record(3))
+    sink.close()
+    assert parquet_ids(tmp_path / "out") == ["sku-0", "sku-1", "sku-2", "sku-3"]
+    row = pq.read_table(str(tmp_path / "out")).to_pylist()[0]
+    assert json.loads(row["pricing"]) == {"usa": {"highest": "N/A"}}
+
+
+def test_jsonl_sink_and_product_rows(tmp_path):
+    sink = JsonlSink(str(tmp_path / "out.jsonl"))
+    assert sink.write(record(1)) == ["sku-1"]
+    sink.close()
+    assert json.loads((tmp_path / "out.jsonl").read_text())["id"] == "sku-1"
+
+    catalog = tmp_path / "catalog.csv"
+    catalog.write_text("name,primary_keywords,sku\nVolupt Shampoo, shampoo ,V-1\n,ignored,\nOther Thing,,\n")
+    products = list(read_products(str(catalog)))
+    assert [(p["product_name"], p["primary_keywords"], p["id"]) for p in products] == [
+        ("Volupt Shampoo", "shampoo", "V-1"), ("Other Thing", "", "other thing"),
+    ]
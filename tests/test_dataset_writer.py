@@ -0,0 +1,96 @@
+# tests/test_dataset_writer.py
+import os
+import time
+
+import pytest
+
+from dataset_writer import BufferedDatasetWriter, LocalShardBackend
+
+pq = pytest.importorskip("pyarrow.parquet")
+pytest.importorskip("datasets")
+
+
+class FlakyBackend(LocalShardBackend):
+    """A local backend whose first `failures` uploads raise, like the Hub being unreachable."""
+
+    def __init__(self, directory, failures=0):
+        super().__init__(directory)
+        self.failures = failures
+        self.attempts = 0
+
+    def upload(self, local_path, shard_name):
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise ConnectionError("hub unreachable")
+        super().upload(local_path, shard_name)
+
+
+def writer(tmp_path, backend=None, **kwargs):
+    backend = backend or LocalShardBackend(str(tmp_path / "repo"))
+    return BufferedDatasetWriter(backend, staging_path=str(tmp_path / "staging.jsonl"), **kwargs)
+
+
+def shard_rows(tmp_path):
+    directory = tmp_path / "repo" / "data"
+    if not directory.exists():
+        return []
+    return [pq.read_table(str(path)).to_pylist() for path in sorted(directory.iterdir())]
+
+
+def row(i):
+    return {"product_name": f"Product {i}", "description": f"Description {i}"}
+
+
+def wait_for(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return condition()
+
+
+def test_rows_ship_as_a_shard_once_max_records_are_staged(tmp_path):
+    w = writer(tmp_path, max_records=3)
+    assert w.add(row(1)) is None and w.add(row(2)) is None
+    shard = w.add(row(3))
+    assert shard and shard.startswith("train-") and shard.endswith(".parquet")
+    assert shard_rows(tmp_path) == [[row(1), row(2), row(3)]]
+    assert os.path.getsize(tmp_path / "staging.jsonl") == 0
+    w.close()
+
+
+def test_old_rows_are_flushed_without_another_add(tmp_path):
+    w = writer(tmp_path, max_records=100, max_age=0.2)
+    w.add(row(1))
+    assert shard_rows(tmp_path) == []
+    assert wait_for(lambda: shard_rows(tmp_path) == [[row(1)]])
+    w.close()
+
+
+def test_a_failed_upload_keeps_the_rows_and_retries(tmp_path):
+    backend = FlakyBackend(str(tmp_path / "repo"), failures=1)
+    w = writer(tmp_path, backend, max_records=1, retry_delay=0.3)
+    assert w.add(row(1)) is None  # the upload failed, but the caller isn't affected
+    assert w.add(row(2)) is None  # still inside the retry delay: no second attempt yet
+    assert backend.attempts == 1
+    assert wait_for(lambda: shard_rows(tmp_path) == [[row(1), row(2)]])
+    assert backend.attempts == 2
+    w.close()
+
+
+def test_close_ships_what_is_staged(tmp_path):
+    w = writer(tmp_path, max_records=100)
+    w.add(row(1))
+    w.close()
+    assert shard_rows(tmp_path) == [[row(1)]]
+
+
+def test_rows_left_by_a_previous_process_are_shipped(tmp_path):
+    backend = FlakyBackend(str(tmp_path / "repo"), failures=2)
+    w = writer(tmp_path, backend, max_records=1, retry_delay=60)
+    w.add(row(1))
+    w.close()  # fails as well: the process exits with the row still staged
+    assert shard_rows(tmp_path) == []
+
+    w = writer(tmp_path, max_records=100)
+    assert wait_for(lambda: shard_rows(tmp_path) == [[row(1)]])
+    w.close()
@@ -0,0 +1,111 @@
+# tests/test_fetcher.py
+import asyncio
+import json
+
+import pytest
+from aiohttp import web
+
+from fetcher import RenderDecisions, TieredFetcher, needs_render
+from page_cache import HTTPClientError, PageCache
+from politeness import HostPolicy, PolitenessScheduler
+from structured_data import ProductFacts
+
+PRODUCT = (
+    "<html><head><title>Volupt Shampoo</title></head><body><main><h1>Volupt Shampoo</h1>"
+    "<p>Volumizing shampoo for fine hair. Lifts roots and adds body without weighing hair down. "
+    "Gentle enough for daily use on colour-treated hair, with a light citrus scent.</p>"
+    "<p>Price: $24.99. In stock. Add to cart and get free shipping on orders over $50.</p></main></body></html>"
+)
+
+
+class NoBrowser(TieredFetcher):
+    """Counts renders instead of starting Chromium."""
+
+    renders = 0
+
+    async def render(self, url):
+        self.renders += 1
+        raise RuntimeError("render attempted")
+
+
+def decisions(tmp_path, **kwargs):
+    return RenderDecisions(str(tmp_path / "render_domains.json"), **kwargs)
+
+
+async def fetch_all(base, paths, decisions):
+    scheduler = PolitenessScheduler(default_policy=HostPolicy(rate=1000.0, burst=1000, max_concurrency=8))
+    results = []
+    async with NoBrowser(cache=PageCache(":memory:"), decisions=decisions, scheduler=scheduler) as fetcher:
+        for path in paths:
+            try:
+                results.append(await fetcher.fetch(f"{base}{path}"))
+            except Exception as e:
+                results.append(e)
+    return results, fetcher.renders
+
+
+def test_product_html_is_served_without_a_render(serve, tmp_path):
+    async def page(request):
+        return web.Response(text=PRODUCT, content_type="text/html")
+
+    async def scenario():
+        async with serve({"/p": page}) as base:
+            return await fetch_all(base, ["/p"], decisions(tmp_path))
+
+    [result], renders = asyncio.run(scenario())
+    assert not result.rendered and "Volumizing" in result.text
+    assert renders == 0
+    assert json.loads((tmp_path / "render_domains.json").read_text()) == {"127.0.0.1": {"http": 1}}
+
+
+@pytest.mark.parametrize("status", [404, 410, 403])
+def test_client_errors_are_not_escalated_to_a_render(serve, tmp_path, status):
+    async def missing(request):
+        return web.Response(status=status, text="<html><body>Not here</body></html>", content_type="text/html")
+
+    d = decisions(tmp_path)
+
+    async def scenario():
+        async with serve({"/gone": missing}) as base:
+            return await fetch_all(base, ["/gone"], d)
+
+    [result], renders = asyncio.run(scenario())
+    assert isinstance(result, HTTPClientError) and result.status == status
+    assert renders == 0
+    assert not d.render_first("127.0.0.1")
+
+
+def test_render_first_domains_are_probed_and_flip_back(serve, tmp_path):
+    d = decisions(tmp_path, probe_every=3)
+    for _ in range(3):
+        d.record("127.0.0.1", "render")
+    assert d.render_first("127.0.0.1")
+    hits = []
+
+    async def page(request):
+        hits.append(request.path)
+        return web.Response(text=PRODUCT, content_type="text/html")
+
+    async def scenario():
+        async with serve({"/{name}": page}) as base:
+            return await fetch_all(base, ["/a", "/b", "/c", "/d"], d)
+
+    results, renders = asyncio.run(scenario())
+    # Two straight to the (failing) browser, then the probe finds the product in the HTML
+    assert renders == 2 and hits == ["/c", "/d"]
+    assert [getattr(r, "rendered", None) for r in results[2:]] == [False, False]
+    assert not d.render_first("127.0.0.1")
+    assert not RenderDecisions(d.path).render_first("127.0.0.1")  # the flip was written out
+
+
+def test_try_http_only_probes_render_first_domains(tmp_path):
+    d = decisions(tmp_path, probe_every=4)
+    assert all(d.try_http("shop.example.com") for _ in range(5))
+    d.record("spa.example.com", "render")
+    d.record("spa.example.com", "render")
+    assert [d.try_http("spa.example.com") for _ in range(8)] == [False, False, False, True] * 2
+
+
+def test_needs_render():
+    assert needs_render("<html></html>", "short", ProductFacts())
+    assert not needs_render(PRODUCT, "Price: $24.99. Add to cart. " + "x" * 300, ProductFacts())
@@ -0,0 +1,108 @@
+# tests/test_knowledge_store.py
+import time
+
+import pytest
+
+import knowledge_store
+from knowledge_store import (
+    KnowledgeEntry,
+    KnowledgeStore,
+    name_similarity,
+    normalize_product_name,
+    unmatched_words,
+)
+
+
+def store_with(*names, path=":memory:", kind="app"):
+    store = KnowledgeStore(path)
+    for name in names:
+        store.put(KnowledgeEntry(kind, name, [f"https://example.com/{len(name)}"], description=f"About {name}"))
+    return store
+
+
+@pytest.mark.parametrize("stored, query", [
+    ("Sebastian Volupt Shampoo 250 mL", "sebastian volupt shampoo 250ml"),
+    ("Olaplex No. 3 Hair Perfector 100 ml", "Olaplex No.3 Hair Perfector 100ml"),
+    ("Olaplex #3 Hair Perfector 100ml", "Olaplex No.3 Hair Perfector 100ml"),
+    ("Kérastase Elixir Ultime Oil 100ml", "Kerastase Elixir Ultime Oils 100 ml"),
+    ("Fanola No Yellow Shampoo 1 litre", "Fanola No Yellow Shampoo 1l"),
+])
+def test_same_product_is_a_confident_match(stored, query):
+    match = store_with(stored).match("app", query)
+    assert match is not None and match.confident
+    assert match.entry.name == stored
+
+
+@pytest.mark.parametrize("stored, query", [
+    ("Olaplex No.3 Hair Perfector 100ml", "Olaplex No.4 Hair Perfector 100ml"),
+    ("Sony PlayStation 4 DualShock Wireless Controller Black",
+     "Sony PlayStation 5 DualShock Wireless Controller Black"),
+    ("Samsung Galaxy S23 Ultra Silicone Case", "Samsung Galaxy S24 Ultra Silicone Case"),
+    ("Sebastian Volupt Shampoo 250ml", "Sebastian Volupt Shampoo 1000ml"),
+    ("Kerastase Elixir Ultime Oil 100ml", "Kerastase Elixir Ultime Oil Refill 100ml"),
+    ("Kerastase Elixir Ultime Oil Refill 100ml", "Kerastase Elixir Ultime Oil 100ml"),
+])
+def test_near_miss_names_are_not_confident(stored, query):
+    match = store_with(stored).match("app", query)
+    assert match is None or not match.confident
+
+
+def test_identifiers_and_extra_words():
+    a = normalize_product_name("Samsung Galaxy S23 Ultra Case")
+    assert name_similarity(a, normalize_product_name("Samsung Galaxy S24 Ultra Case")) == 0.0
+    assert unmatched_words(
+        normalize_product_name("Elixir Ultime Oil 100ml"), normalize_product_name("Elixir Ultime Oil Mini 100ml")
+    ) == ("mini",)
+    assert unmatched_words("volupt shampoo for fine hair", "volupt shampoos fine hair") == ()
+
+
+def test_exact_name_wins_over_an_extra_word_variant():
+    store = store_with("Kerastase Elixir Ultime Oil Refill 100ml", "Kerastase Elixir Ultime Oil 100ml")
+    match = store.match("app", "Kérastase Elixir Ultime Oil 100 ml")
+    assert match.confident and match.entry.name == "Kerastase Elixir Ultime Oil 100ml"
+
+
+def test_kinds_are_separate():
+    assert store_with("Sebastian Volupt Shampoo 250ml", kind="agent").match("app", "Sebastian Volupt Shampoo 250ml") is None
+
+
+def test_fresh_and_stale_entries(monkeypatch):
+    store = store_with("Sebastian Volupt Shampoo 250ml")
+    match = store.match("app", "Sebastian Volupt Shampoo 250ml")
+    assert match.entry.fresh and match.entry.description == "About Sebastian Volupt Shampoo 250ml"
+
+    store._db.execute("UPDATE products SET updated_at = ?", (time.time() - knowledge_store.KNOWLEDGE_TTL - 1,))
+    stale = store.match("app", "Sebastian Volupt Shampoo 250ml")
+    assert stale.confident and not stale.entry.fresh
+    assert stale.entry.sources  # still lends its URLs for a re-fetch
+
+
+def test_put_replaces_the_entry_for_the_same_name():
+    store = store_with("Sebastian Volupt Shampoo 250ml")
+    store.put(KnowledgeEntry("app", "sebastian volupt shampoo 250 ml", ["https://example.com/new"],
+                             texts={"https://example.com/new": "text"}, description="New"))
+    match = store.match("app", "Sebastian Volupt Shampoo 250ml")
+    assert match.entry.description == "New"
+    assert match.entry.texts == {"https://example.com/new": "text"}
+    assert store._db.execute("SELECT COUNT(*) FROM products").fetchone()[0] == 1
+
+
+def test_scan_fallback_without_fts(monkeypatch):
+    monkeypatch.setattr(knowledge_store, "_FTS_SCHEMA", "CREATE VIRTUAL TABLE products_fts USING no_such_module(x);")
+    store = store_with("Sebastian Volupt Shampoo 250ml", "Olaplex No.3 Hair Perfector 100ml")
+    assert not store._fts
+    match = store.match("app", "sebastian volupt shampoo 250 ml")
+    assert match.confident and match.entry.name == "Sebastian Volupt Shampoo 250ml"
+
+
+def test_rows_written_without_fts_are_indexed_once_it_is_available(tmp_path, monkeypatch):
+    path = str(tmp_path / "knowledge.sqlite")
+    real_schema = knowledge_store._FTS_SCHEMA
+    monkeypatch.setattr(knowledge_store, "_FTS_SCHEMA", "CREATE VIRTUAL TABLE products_fts USING no_such_module(x);")
+    store_with("Sebastian Volupt Shampoo 250ml", path=path).close()
+
+    monkeypatch.setattr(knowledge_store, "_FTS_SCHEMA", real_schema)
+    store = KnowledgeStore(path)
+    assert store._fts
+    match = store.match("app", "Sebastian Volupt Shampoo 250ml")
+    assert match is not None and match.confident
@@ -0,0 +1,82 @@
+# tests/test_llm_router.py
+import asyncio
+from types import SimpleNamespace
+
+from llm_cache import LLMCache
+from llm_router import LatencyStats, LLMRouter, Route
+
+
+class SyncCohere:
+    """Stands in for cohere.Client; any streaming call on it is a bug."""
+
+    def __init__(self, text="sync answer"):
+        self.text = text
+        self.calls = []
+
+    def chat(self, model, message, **kwargs):
+        self.calls.append(("chat", model))
+        return SimpleNamespace(text=self.text)
+
+    def generate(self, model, prompt):
+        self.calls.append(("generate", model))
+        return SimpleNamespace(generations=[SimpleNamespace(text=self.text)])
+
+    def chat_stream(self, **kwargs):
+        raise AssertionError("streamed through the sync client")
+
+
+class AsyncCohere:
+    def __init__(self, deltas=("Hello", ", ", "world")):
+        self.deltas = deltas
+        self.calls = 0
+
+    async def chat_stream(self, model, message):
+        self.calls += 1
+        yield SimpleNamespace(event_type="stream-start")
+        for delta in self.deltas:
+            yield SimpleNamespace(event_type="text-generation", text=delta)
+        yield SimpleNamespace(event_type="stream-end")
+
+
+def router(routes, **kwargs):
+    return LLMRouter(routes, cache=LLMCache(":memory:"), stats=LatencyStats(), hedge=False, **kwargs)
+
+
+async def collect(deltas):
+    return [delta async for delta in deltas]
+
+
+def test_complete_uses_the_sync_client():
+    sync = SyncCohere()
+    result = router([Route("cohere", "command-r")], clients={"cohere": sync}).complete("prompt")
+    assert result.text == "sync answer" and not result.cached
+    assert sync.calls == [("chat", "command-r")]
+
+
+def test_stream_uses_the_async_client_even_when_a_sync_one_is_cached():
+    sync, streaming = SyncCohere(), AsyncCohere()
+    r = router([Route("cohere", "command-r")], clients={"cohere": sync}, async_clients={"cohere": streaming})
+    r.client("cohere")  # what a complete() call would have cached
+    assert asyncio.run(collect(r.stream("prompt"))) == ["Hello", ", ", "world"]
+    assert streaming.calls == 1 and sync.calls == []
+
+
+def test_streamed_text_is_cached_for_complete():
+    streaming = AsyncCohere()
+    r = router([Route("cohere", "command-r")], clients={"cohere": SyncCohere()}, async_clients={"cohere": streaming})
+    asyncio.run(collect(r.stream("prompt")))
+    result = r.complete("prompt")
+    assert result.cached and result.text == "Hello, world"
+
+
+def test_stream_falls_through_to_the_next_route():
+    class Broken(AsyncCohere):
+        async def chat_stream(self, model, message):
+            raise ConnectionError("down")
+            yield
+
+    sync = SyncCohere("generated")
+    r = router([Route("cohere", "command-r"), Route("cohere", "command", api="generate")],
+               clients={"cohere": sync}, async_clients={"cohere": Broken()})
+    assert asyncio.run(collect(r.stream("prompt"))) == ["generated"]
+    assert sync.calls == [("generate", "command")]
@@ -0,0 +1,212 @@
+# tests/test_page_cache.py
+import asyncio
+import os
+import sqlite3
+import time
+
+import aiohttp
+import pytest
+from aiohttp import web
+
+from page_cache import NonHTMLContent, PageCache, fetch_with_cache, parse_domain_ttls
+from utils import normalize_url
+
+PAGE = "<html><body><main><p>Volumizing shampoo for fine hair.</p></main></body></html>"
+PRODUCT_HEAD = (
+    '<html><head><script type="application/ld+json">'
+    '{"@type": "Product", "name": "Shampoo", "gtin13": "4064666002743"}</script></head>'
+    "<body><main><p>Volumizing shampoo for fine hair.</p></main>"
+)
+
+
+class Origin:
+    """Counts requests and answers conditional ones with 304 when the validators match."""
+
+    def __init__(self, body=PAGE, etag='"v1"', last_modified=None):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.requests = []
+
+    async def page(self, request):
+        self.requests.append(dict(request.headers))
+        headers = {}
+        if self.etag:
+            headers["ETag"] = self.etag
+        if self.last_modified:
+            headers["Last-Modified"] = self.last_modified
+        if (self.etag and request.headers.get("If-None-Match") == self.etag) or (
+            self.last_modified and request.headers.get("If-Modified-Since") == self.last_modified
+        ):
+            return web.Response(status=304, headers=headers)
+        return web.Response(text=self.body, content_type="text/html", headers=headers)
+
+
+async def fetch(base, path, cache, **kwargs):
+    async with aiohttp.ClientSession() as session:
+        return await fetch_with_cache(session, f"{base}{path}", cache, **kwargs)
+
+
+def test_fresh_entry_is_served_without_a_request(serve):
+    origin = Origin()
+
+    async def scenario():
+        cache = PageCache(":memory:")
+        async with serve({"/p": origin.page}) as base:
+            first = await fetch(base, "/p", cache)
+            second = await fetch(base, "/p", cache)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first == second == PAGE
+    assert len(origin.requests) == 1
+
+
+@pytest.mark.parametrize("etag, last_modified, header", [
+    ('"v1"', None, "If-None-Match"),
+    (None, "Wed, 21 Oct 2015 07:28:00 GMT", "If-Modified-Since"),
+])
+def test_stale_entry_is_revalidated_with_its_validator(serve, etag, last_modified, header):
+    origin = Origin(etag=etag, last_modified=last_modified)
+
+    async def scenario():
+        cache = PageCache(":memory:", default_ttl=0)
+        async with serve({"/p": origin.page}) as base:
+            await fetch(base, "/p", cache)
+            before = cache.get(f"{base}/p").fetched_at
+            html = await fetch(base, "/p", cache)
+            return html, before, cache.get(f"{base}/p").fetched_at
+
+    html, before, after = asyncio.run(scenario())
+    assert html == PAGE
+    assert header in origin.requests[1]
+    assert after > before  # the 304 restarted the entry's TTL
+
+
+def test_changed_page_replaces_the_entry(serve):
+    origin = Origin()
+
+    async def scenario():
+        cache = PageCache(":memory:", default_ttl=0)
+        async with serve({"/p": origin.page}) as base:
+            await fetch(base, "/p", cache)
+            origin.body, origin.etag = PAGE.replace("fine", "thin"), '"v2"'
+            html = await fetch(base, "/p", cache)
+            return html, cache.get(f"{base}/p")
+
+    html, entry = asyncio.run(scenario())
+    assert "thin" in html and "thin" in entry.html
+    assert entry.etag == '"v2"'
+
+
+def test_domain_ttls_pick_the_most_specific_domain():
+    cache = PageCache(":memory:", default_ttl=100, domain_ttls={"example.com": 10, "shop.example.com": 1})
+    assert cache.ttl_for("https://shop.example.com/p") == 1
+    assert cache.ttl_for("https://www.example.com/p") == 10
+    assert cache.ttl_for("https://example.org/p") == 100
+    assert parse_domain_ttls("Sephora.com=3600, amazon.ca=900,") == {"sephora.com": 3600.0, "amazon.ca": 900.0}
+
+
+def test_domain_ttls_default_from_the_environment(monkeypatch):
+    import page_cache
+
+    monkeypatch.setattr(page_cache, "DEFAULT_DOMAIN_TTLS_SPEC", "example.com=5")
+    assert page_cache.PageCache(":memory:").ttl_for("https://example.com/x") == 5
+
+
+def test_expired_entry_is_not_fresh():
+    cache = PageCache(":memory:", default_ttl=60)
+    cache.put("https://example.com/p", PAGE)
+    assert cache.get("https://example.com/p").fresh
+    cache._db.execute("UPDATE pages SET fetched_at = ?", (time.time() - 61,))
+    assert not cache.get("https://example.com/p").fresh
+
+
+def test_least_recently_used_pages_are_evicted():
+    body = "<p>%s</p>" % os.urandom(4000).hex()
+    cache = PageCache(":memory:")
+    for name in ("a", "b", "c"):
+        cache.put(f"https://example.com/{name}", body)
+        time.sleep(0.01)
+    cache.max_bytes = int(cache.size() / 3 * 3.5)  # room for three pages, not four
+    cache.get("https://example.com/a")  # now the most recently used
+    cache.put("https://example.com/d", body)
+    urls = set(cache.urls())
+    assert "https://example.com/a" in urls and "https://example.com/d" in urls
+    assert "https://example.com/b" not in urls
+    assert cache.size() <= cache.max_bytes
+
+
+def test_non_html_is_rejected_and_not_cached(serve):
+    async def pdf(request):
+        return web.Response(body=b"%PDF-1.4", content_type="application/pdf")
+
+    async def scenario():
+        cache = PageCache(":memory:")
+        async with serve({"/manual.pdf": pdf}) as base:
+            with pytest.raises(NonHTMLContent):
+                await fetch(base, "/manual.pdf", cache)
+            return cache.get(f"{base}/manual.pdf")
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_large_body_is_capped_and_never_revalidated(serve):
+    origin = Origin(body="<html><body>" + "x" * 300_000 + "</body></html>")
+
+    async def scenario():
+        cache = PageCache(":memory:", default_ttl=0)
+        async with serve({"/big": origin.page}) as base:
+            html = await fetch(base, "/big", cache, max_bytes=100_000)
+            entry = cache.get(f"{base}/big")
+            await fetch(base, "/big", cache, max_bytes=100_000)
+            return html, entry
+
+    html, entry = asyncio.run(scenario())
+    assert len(html) == 100_000
+    assert entry.truncated == "cap"
+    assert entry.conditional_headers() == {}
+    assert "If-None-Match" not in origin.requests[1]
+
+
+def test_slow_body_stops_once_the_product_content_is_in(serve):
+    async def slow(request):
+        response = web.StreamResponse(headers={"Content-Type": "text/html"})
+        await response.prepare(request)
+        await response.write(PRODUCT_HEAD.encode())
+        for _ in range(20):
+            await asyncio.sleep(0.1)
+            await response.write(b"<div>" + b"footer " * 2000 + b"</div>")
+        await response.write(b"</body></html>")
+        return response
+
+    async def scenario():
+        cache = PageCache(":memory:")
+        async with serve({"/slow": slow}) as base:
+            start = time.monotonic()
+            html = await fetch(base, "/slow", cache)
+            return html, time.monotonic() - start, cache.get(f"{base}/slow")
+
+    html, elapsed, entry = asyncio.run(scenario())
+    assert "4064666002743" in html and "</main>" in html
+    assert elapsed < 1.0  # the full body takes 2 s to arrive
+    assert entry.truncated == "main"
+
+
+def test_caches_without_the_truncated_column_are_migrated(tmp_path):
+    path = str(tmp_path / "pages.sqlite")
+    db = sqlite3.connect(path)
+    db.execute(
+        "CREATE TABLE pages (key TEXT NOT NULL, variant TEXT NOT NULL, url TEXT NOT NULL, html BLOB, text BLOB,"
+        " etag TEXT, last_modified TEXT, fetched_at REAL NOT NULL, accessed_at REAL NOT NULL,"
+        " size INTEGER NOT NULL, PRIMARY KEY (key, variant))"
+    )
+    now = time.time()
+    db.execute("INSERT INTO pages VALUES (?, 'raw', 'https://example.com/p', NULL, NULL, '\"v1\"', NULL, ?, ?, 0)",
+               (normalize_url("https://example.com/p"), now, now))
+    db.commit()
+    db.close()
+
+    entry = PageCache(path).get("https://example.com/p")
+    assert entry.truncated == ""
+    assert entry.conditional_headers() == {"If-None-Match": '"v1"'}
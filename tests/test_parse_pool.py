@@ -0,0 +1,123 @@
+# tests/test_parse_pool.py
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+import pytest
+
+from conftest import ROOT
+from parse_pool import analyze_page, parse_product_page, run_in_parse_pool
+
+PAGE = os.path.join(ROOT, "benchmarks", "fixtures", "pages", "jsonld-retailer.html")
+
+# A page script that logs every execution of itself ("__main__" or "__mp_main__")
+_PROBE = """
+import asyncio, os, sys
+sys.path.insert(0, {root!r})
+with open({runs!r}, "a") as f:
+    f.write(__name__ + "\\n")
+if {parse!r} and __name__ == "__main__":
+    from parse_pool import analyze_page, run_in_parse_pool
+
+    async def _parse():
+        html = open({page!r}, encoding="utf-8").read()
+        await asyncio.gather(*[run_in_parse_pool(analyze_page, f"http://probe/{{i}}", html) for i in range(8)])
+
+    asyncio.run(_parse())
+"""
+
+# What Streamlit's script runner does: a fresh __main__ whose __file__ is the page
+# script, executed in it, and then the parse pool used from that process
+_DRIVER = """
+import asyncio, sys, types
+sys.path.insert(0, {root!r})
+module = types.ModuleType("__main__")
+module.__file__ = {probe!r}
+sys.modules["__main__"] = module
+exec(compile(open({probe!r}).read(), {probe!r}, "exec"), module.__dict__)
+
+from parse_pool import analyze_page, get_parse_executor, run_in_parse_pool
+
+async def parse():
+    html = open({page!r}, encoding="utf-8").read()
+    return await asyncio.gather(*[run_in_parse_pool(analyze_page, f"http://probe/{{i}}", html) for i in range(8)])
+
+results = asyncio.run(parse())
+print(len(get_parse_executor()._processes), sum(1 for text, facts in results if facts.gtin))
+"""
+
+
+def write_probe(directory, parse):
+    runs = str(directory / "runs.txt")
+    probe = str(directory / "probe_app.py")
+    with open(probe, "w", encoding="utf-8") as f:
+        f.write(_PROBE.format(root=ROOT, runs=runs, page=PAGE, parse=parse))
+    return probe, runs
+
+
+def read_runs(runs):
+    with open(runs, encoding="utf-8") as f:
+        return f.read().split()
+
+
+def test_parse_in_process():
+    with open(PAGE, encoding="utf-8") as f:
+        html = f.read()
+    parsed = asyncio.run(run_in_parse_pool(parse_product_page, "https://example.com/p", html))
+    assert parsed.is_product and parsed.title
+    text, facts = analyze_page("https://example.com/p", html)
+    assert text and facts.gtin
+
+
+def test_workers_do_not_rerun_the_streamlit_script(tmp_path):
+    probe, runs = write_probe(tmp_path, parse=False)
+    driver = tmp_path / "driver.py"
+    driver.write_text(_DRIVER.format(root=ROOT, probe=probe, page=PAGE))
+    env = dict(os.environ, PARSE_WORKERS="3")
+    out = subprocess.run([sys.executable, str(driver)], env=env, capture_output=True, text=True, timeout=120)
+    assert out.returncode == 0, out.stderr
+    workers, parsed = map(int, out.stdout.split())
+    assert workers >= 1 and parsed == 8
+    assert read_runs(runs) == ["__main__"]
+
+
+def test_workers_under_streamlit_apptest(tmp_path, monkeypatch):
+    pytest.importorskip("streamlit.testing.v1")
+    monkeypatch.setenv("PARSE_WORKERS", "2")
+    probe, runs = write_probe(tmp_path, parse=True)
+    # A fresh interpreter so PARSE_WORKERS is read again and the pool belongs to it
+    code = f"from streamlit.testing.v1 import AppTest; at = AppTest.from_file({probe!r}, default_timeout=120).run(); " \
+           "print(len(at.exception))"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, timeout=180)
+    assert out.returncode == 0, out.stderr
+    assert out.stdout.split()[-1] == "0"
+    assert read_runs(runs) == ["__main__"]
+
+
+def test_streamlit_run_serves_the_app():
+    pytest.importorskip("streamlit")
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", os.path.join(ROOT, "app.py"), "--server.headless", "true",
+         "--server.port", str(port), "--browser.gatherUsageStats", "false"],
+        cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+    )
+    status = ""
+    try:
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline and proc.poll() is None and status != "ok":
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=2) as r:
+                    status = r.read().decode()
+            except OSError:
+                time.sleep(0.5)
+    finally:
+        proc.terminate()
+        output = proc.communicate(timeout=10)[0].decode(errors="replace")
+    assert status == "ok", output[-2000:]
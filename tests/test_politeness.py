@@ -0,0 +1,159 @@
+# tests/test_politeness.py
+import asyncio
+import time
+from email.utils import formatdate
+
+import aiohttp
+import pytest
+from aiohttp import web
+
+from page_cache import fetch_with_cache
+from politeness import HostPolicy, PolitenessScheduler, RetryableHTTPError, parse_retry_after
+
+SLACK = 0.05
+
+
+class ThrottlingOrigin:
+    """Stub site: each path answers its scripted statuses in turn, then the page.
+
+    Throttled answers carry `Retry-After: retry_after` when it's set. Every
+    request is logged as (path, monotonic time, status), and the most
+    requests in flight at once is kept in `max_in_flight`.
+    """
+
+    def __init__(self, script=None, retry_after=None, latency=0.0):
+        self.script = {path: list(statuses) for path, statuses in (script or {}).items()}
+        self.retry_after = retry_after
+        self.latency = latency
+        self.hits = []
+        self.in_flight = self.max_in_flight = 0
+
+    async def page(self, request):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            statuses = self.script.get(request.path)
+            status = statuses.pop(0) if statuses else 200
+            self.hits.append((request.path, time.monotonic(), status))
+            if status != 200:
+                headers = {"Retry-After": str(self.retry_after)} if self.retry_after is not None else {}
+                return web.Response(status=status, headers=headers)
+            return web.Response(text="<html><body>ok</body></html>", content_type="text/html")
+        finally:
+            self.in_flight -= 1
+
+    def times(self, path):
+        return [t for p, t, _ in self.hits if p == path]
+
+
+def scheduler(rate=1000.0, burst=1000, concurrency=64, retries=3, base=0.1, cap=1.0):
+    return PolitenessScheduler(
+        default_policy=HostPolicy(rate=rate, burst=burst, max_concurrency=concurrency),
+        max_retries=retries, backoff_base=base, backoff_cap=cap,
+    )
+
+
+async def run(serve, origin, body):
+    # `body(get)` drives the scenario; get(scheduler, path, host) fetches through the scheduler
+    async with aiohttp.ClientSession() as session:
+        async with serve({"/{name}": origin.page}) as base:
+            port = base.rsplit(":", 1)[1]
+
+            def get(sched, path, host="127.0.0.1"):
+                url = f"http://{host}:{port}{path}"
+                return sched.call(url, lambda: fetch_with_cache(session, url))
+
+            return await body(get)
+
+
+def test_requests_to_one_host_are_spaced_by_its_rate(serve):
+    origin = ThrottlingOrigin()
+    rate, burst = 10.0, 2
+
+    async def body(get):
+        sched = scheduler(rate=rate, burst=burst)
+        await asyncio.gather(*[get(sched, "/p") for _ in range(12)])
+
+    asyncio.run(run(serve, origin, body))
+    times = origin.times("/p")
+    # After the burst, one request per 1/rate seconds
+    assert (times[-1] - times[0]) >= (len(times) - burst) / rate - SLACK
+    gaps = [b - a for a, b in zip(times[burst:], times[burst + 1:])]
+    assert min(gaps) >= 1 / rate - SLACK
+
+
+def test_each_host_has_its_own_budget(serve):
+    origin = ThrottlingOrigin()
+
+    async def body(get):
+        sched = scheduler(rate=2.0, burst=1)
+        start = time.monotonic()
+        await asyncio.gather(get(sched, "/a", "127.0.0.1"), get(sched, "/b", "localhost"))
+        return time.monotonic() - start
+
+    assert asyncio.run(run(serve, origin, body)) < 0.5 - SLACK  # one token each, no waiting
+
+
+def test_concurrency_cap_per_host(serve):
+    origin = ThrottlingOrigin(latency=0.1)
+
+    async def body(get):
+        sched = scheduler(concurrency=2)
+        await asyncio.gather(*[get(sched, "/p") for _ in range(8)])
+
+    asyncio.run(run(serve, origin, body))
+    assert len(origin.hits) == 8
+    assert origin.max_in_flight == 2
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_retry_after_pauses_the_whole_host(serve, status):
+    origin = ThrottlingOrigin({"/throttled": [status]}, retry_after=1)
+
+    async def body(get):
+        sched = scheduler()
+        first = asyncio.ensure_future(get(sched, "/throttled"))
+        while not origin.hits:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.1)
+        await asyncio.gather(first, get(sched, "/neighbour"))
+
+    asyncio.run(run(serve, origin, body))
+    throttled, retried = origin.times("/throttled")
+    [neighbour] = origin.times("/neighbour")
+    assert retried - throttled >= 1 - SLACK
+    assert neighbour - throttled >= 1 - SLACK  # queued after the 429/503, so it waited as well
+
+
+def test_server_errors_back_off_with_full_jitter(serve):
+    origin = ThrottlingOrigin({"/flaky": [503, 502]})
+    base, cap = 0.1, 1.0
+
+    async def body(get):
+        return await get(scheduler(base=base, cap=cap), "/flaky")
+
+    assert "ok" in asyncio.run(run(serve, origin, body))
+    times = origin.times("/flaky")
+    assert len(times) == 3
+    for attempt, (a, b) in enumerate(zip(times, times[1:])):
+        assert b - a <= min(cap, base * 2 ** attempt) + SLACK
+
+
+def test_gives_up_after_max_retries(serve):
+    origin = ThrottlingOrigin({"/down": [503] * 10})
+
+    async def body(get):
+        with pytest.raises(RetryableHTTPError) as raised:
+            await get(scheduler(retries=2, base=0.01), "/down")
+        return raised.value.status
+
+    assert asyncio.run(run(serve, origin, body)) == 503
+    assert len(origin.times("/down")) == 3
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("5") == 5.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    assert 8 <= parse_retry_after(formatdate(time.time() + 10, usegmt=True)) <= 10
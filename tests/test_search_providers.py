@@ -0,0 +1,131 @@
+# tests/test_search_providers.py
+import asyncio
+import json
+import sqlite3
+import time
+
+from search_providers import (
+    CachedSearchProvider,
+    FixtureSearchProvider,
+    SerpCache,
+    filter_result_links,
+    get_search_provider,
+)
+
+LINKS = [f"https://shop{i}.example.com/p" for i in range(10)]
+
+
+class CountingProvider(FixtureSearchProvider):
+    """Fixture results that also count how often the backend was asked."""
+
+    def __init__(self, results):
+        super().__init__(results)
+        self.calls = []
+
+    async def _search(self, query, max_links):
+        self.calls.append((query, max_links))
+        return await super()._search(query, max_links)
+
+
+def cached(results, ttl=3600):
+    provider = CountingProvider(results)
+    return provider, CachedSearchProvider(provider, SerpCache(":memory:", ttl=ttl))
+
+
+def test_repeat_query_is_served_from_the_cache():
+    provider, search = cached({"volupt shampoo": LINKS})
+
+    async def scenario():
+        first = await search.search("volupt shampoo", 5)
+        second = await search.search("  volupt   SHAMPOO ", 5)
+        fewer = await search.search("volupt shampoo", 3)
+        return first, second, fewer
+
+    first, second, fewer = asyncio.run(scenario())
+    assert first == second == LINKS[:5]
+    assert fewer == LINKS[:3]
+    assert len(provider.calls) == 1
+
+
+def test_asking_for_more_links_than_were_fetched_is_a_miss():
+    provider, search = cached({"volupt shampoo": LINKS})
+
+    async def scenario():
+        await search.search("volupt shampoo", 3)
+        return await search.search("volupt shampoo", 8)
+
+    assert asyncio.run(scenario()) == LINKS[:8]
+    assert provider.calls == [("volupt shampoo", 3), ("volupt shampoo", 8)]
+
+
+def test_a_short_serp_answers_any_request_up_to_what_was_asked_for():
+    # Only two links survived filtering, but eight were asked for: nothing more to find
+    provider, search = cached({"rare serum": LINKS[:2] + ["https://www.youtube.com/watch?v=1"]})
+
+    async def scenario():
+        await search.search("rare serum", 8)
+        return await search.search("rare serum", 5), await search.search("rare serum", 10)
+
+    within, beyond = asyncio.run(scenario())
+    assert within == LINKS[:2]
+    assert beyond == LINKS[:2]
+    assert len(provider.calls) == 2  # the request for 10 went back to the backend
+
+
+def test_empty_results_are_not_cached():
+    provider, search = cached({})
+
+    async def scenario():
+        await search.search("nothing", 5)
+        await search.search("nothing", 5)
+
+    asyncio.run(scenario())
+    assert len(provider.calls) == 2
+
+
+def test_expired_entries_are_misses():
+    cache = SerpCache(":memory:", ttl=60)
+    cache.put("fixture", "volupt shampoo", LINKS[:3], 3)
+    assert cache.get("fixture", "volupt shampoo", 3) == LINKS[:3]
+    cache._db.execute("UPDATE serps SET fetched_at = ?", (time.time() - 61,))
+    assert cache.get("fixture", "volupt shampoo", 3) is None
+
+
+def test_providers_have_separate_entries():
+    cache = SerpCache(":memory:")
+    cache.put("google", "volupt shampoo", LINKS[:3], 3)
+    assert cache.get("google-cse", "volupt shampoo", 3) is None
+
+
+def test_caches_without_max_links_are_migrated(tmp_path):
+    path = str(tmp_path / "serp.sqlite")
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE serps (provider TEXT, query TEXT, links TEXT, fetched_at REAL,"
+               " PRIMARY KEY (provider, query))")
+    db.execute("INSERT INTO serps VALUES ('google', 'volupt shampoo', ?, ?)", (json.dumps(LINKS[:2]), time.time()))
+    db.commit()
+    db.close()
+
+    cache = SerpCache(path)
+    assert cache.get("google", "volupt shampoo", 2) == LINKS[:2]
+    assert cache.get("google", "volupt shampoo", 8) is None  # unknown request size: only what it holds
+
+
+def test_fixture_provider_filters_like_the_live_backends(tmp_path, monkeypatch):
+    path = tmp_path / "results.json"
+    path.write_text(json.dumps({
+        "volupt shampoo": [
+            "/url?q=https://shop.example.com/p&sa=U", "https://shop.example.com/p#reviews",
+            "https://www.google.ca/maps", "ftp://files.example.com/p", "https://x.com/shop",
+        ],
+        "*": ["https://fallback.example.com/"],
+    }))
+    monkeypatch.setenv("SEARCH_PROVIDER", f"fixture:{path}")
+    provider = get_search_provider()
+    assert isinstance(provider, FixtureSearchProvider)
+
+    async def scenario():
+        return await provider.search("volupt shampoo", 5), await provider.search("anything else", 5)
+
+    assert asyncio.run(scenario()) == (["https://shop.example.com/p"], ["https://fallback.example.com/"])
+    assert filter_result_links(LINKS, 4) == LINKS[:4]
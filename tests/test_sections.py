@@ -0,0 +1,63 @@
+# tests/test_sections.py
+import pytest
+
+import ai_generator
+import old_app
+from old_app import ProductResearchAgentV2
+from prompt_builder import prompt_metrics
+from sections import SECTION_SPECS, build_section_prompt, parse_section
+
+SECTIONS = {name: f"{name} text" for name in SECTION_SPECS}
+
+
+def calls(name):
+    return prompt_metrics.stats().get(name, {}).get("count", 0)
+
+
+def fake_generate_sections(seen):
+    def generate_sections(router, product_name, primary, secondary, sources, model, **kwargs):
+        seen.append(sources)
+        return dict(SECTIONS), {}
+    return generate_sections
+
+
+def test_per_section_product_info_is_recorded_under_its_budget(monkeypatch):
+    seen = []
+    monkeypatch.setattr(old_app, "generate_sections", fake_generate_sections(seen))
+    agent = ProductResearchAgentV2("test-key", per_section=True)
+    before = calls("product_info")
+    info = agent.generate_product_info("Volupt Shampoo", "shampoo", "volume",
+                                       {"https://example.com/p": "Volumizing shampoo for fine hair."})
+    assert calls("product_info") == before + 1
+    assert "Volumizing shampoo" in seen[0]
+    assert info.short_description == "short_description text"
+
+
+def test_per_section_humanized_output_is_recorded_under_its_budget(monkeypatch):
+    seen = []
+    monkeypatch.setattr(ai_generator, "generate_sections", fake_generate_sections(seen))
+    scraped = {"descriptions": ["Volumizing shampoo for fine hair."], "how_to_use": ["Lather, rinse."],
+               "ingredients": [], "upc": None, "prices_usd": [], "prices_cad": []}
+    before = calls("humanized_output")
+    output = ai_generator.generate_humanized_output("Volupt Shampoo", "shampoo", "volume", scraped, per_section=True)
+    assert calls("humanized_output") == before + 1
+    assert "How to use: Lather, rinse." in seen[0]
+    assert output["Meta Title"] == "meta_title text"
+
+
+@pytest.mark.parametrize("text, value", [
+    ('{"meta_title": " Volupt Shampoo "}', "Volupt Shampoo"),
+    ('Sure!\n```json\n{"meta_title": "Volupt"}\n```', "Volupt"),
+    ("Volupt Shampoo", None),
+    ('{"meta_title": 3}', None),
+])
+def test_parse_section(text, value):
+    assert parse_section(text, "meta_title") == value
+
+
+def test_section_prompts_carry_the_retry_feedback():
+    spec = SECTION_SPECS["meta_title"]
+    prompt = build_section_prompt(spec, "Volupt Shampoo", "shampoo", "volume", "sources", "command-r",
+                                  ("Too long a title", "it was 80 chars"))
+    assert "rejected because it was 80 chars" in prompt and "Too long a title" in prompt
+    assert calls("section.meta_title") >= 1
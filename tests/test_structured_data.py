@@ -0,0 +1,106 @@
+# tests/test_structured_data.py
+import json
+
+import pytest
+
+from extraction import extract_page
+from structured_data import _to_price, extract_product_facts, valid_gtin
+
+GTIN = "4064666002743"
+
+
+def facts_for(html, url="https://shop.example.com/p/shampoo"):
+    page = extract_page(html)
+    return extract_product_facts(page, page.text, url)
+
+
+def json_ld_page(product):
+    return (
+        '<html><head><script type="application/ld+json">%s</script></head>'
+        "<body><p>Volumizing shampoo for fine hair.</p></body></html>" % json.dumps(product)
+    )
+
+
+@pytest.mark.parametrize("value, amount", [
+    ("24.99", 24.99),
+    (24.99, 24.99),
+    ("24,99", 24.99),
+    ("1,299.00", 1299.0),
+    ("1.299,00", 1299.0),
+    ("1,299", 1299.0),
+    ("12,345,678", 12345678.0),
+    ("1 299,00", 1299.0),
+    ("\xa024,99 ", 24.99),
+])
+def test_price_strings(value, amount):
+    assert _to_price(value) == amount
+
+
+@pytest.mark.parametrize("value", ["", "0", "free", None])
+def test_non_prices(value):
+    assert _to_price(value) is None
+
+
+def test_json_ld_offers_and_gtin():
+    facts = facts_for(json_ld_page({
+        "@context": "https://schema.org", "@type": "Product", "name": "Volupt Shampoo",
+        "brand": {"@type": "Brand", "name": "Sebastian"}, "gtin13": GTIN,
+        "offers": [{"@type": "Offer", "price": "24,99", "priceCurrency": "CAD"},
+                   {"@type": "Offer", "price": "1.299,00", "priceCurrency": "USD"}],
+    }))
+    assert (facts.name, facts.brand, facts.gtin) == ("Volupt Shampoo", "Sebastian", GTIN)
+    assert facts.prices("CAD") == [24.99]
+    assert facts.prices("USD") == [1299.0]
+    assert {o.source for o in facts.offers} == {"json-ld"}
+
+
+def test_json_ld_in_a_graph_with_a_price_specification():
+    facts = facts_for(json_ld_page({"@graph": [
+        {"@type": "WebPage", "name": "Shop"},
+        {"@type": ["Product"], "name": "Volupt", "offers": {
+            "@type": "Offer", "priceSpecification": {"price": "19.50", "priceCurrency": "USD"}}},
+    ]}))
+    assert facts.prices("USD") == [19.5]
+
+
+def test_microdata_offer():
+    html = (
+        '<html><body><div itemscope itemtype="https://schema.org/Product">'
+        '<span itemprop="name">Volupt Shampoo</span><span itemprop="gtin13">%s</span>'
+        '<div itemprop="offers" itemscope itemtype="https://schema.org/Offer">'
+        '<span itemprop="price" content="24,99">24,99 $</span>'
+        '<meta itemprop="priceCurrency" content="CAD"></div></div></body></html>' % GTIN
+    )
+    facts = facts_for(html)
+    assert facts.gtin == GTIN
+    assert facts.prices("CAD") == [24.99]
+    assert facts.offers[0].source == "microdata"
+
+
+@pytest.mark.parametrize("currency, url, expected", [
+    ("CAD", "https://shop.example.com/p", "CAD"),
+    ("USD", "https://shop.example.ca/p", "USD"),
+    ("", "https://shop.example.ca/p", "CAD"),
+    ("", "https://shop.example.com/p", "USD"),
+    ("C$", "https://shop.example.com/p", "CAD"),
+])
+def test_currency_from_the_offer_or_the_domain(currency, url, expected):
+    offer = {"@type": "Offer", "price": "10.00"}
+    if currency:
+        offer["priceCurrency"] = currency
+    facts = facts_for(json_ld_page({"@type": "Product", "name": "X", "offers": offer}), url)
+    assert [o.currency for o in facts.offers] == [expected]
+
+
+def test_text_prices_only_without_structured_data():
+    html = "<html><body><p>Volupt Shampoo. Price: CAD $32.00, sale USD 24.99 today.</p></body></html>"
+    facts = facts_for(html)
+    assert facts.prices("CAD") == [32.0]
+    assert facts.prices("USD") == [24.99]
+    assert {o.source for o in facts.offers} == {"text"}
+
+
+def test_gtin_check_digit():
+    assert valid_gtin(GTIN)
+    assert not valid_gtin("4064666002744")
+    assert not valid_gtin("12345")
@@ -0,0 +1,241 @@
+# tracing.py
+import contextvars
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+# JSON lines, one span per line; and OTLP/JSON, one trace per line (what an
+# OpenTelemetry collector's file receiver reads). Both off unless set.
+TRACE_JSONL_PATH = os.getenv("TRACE_JSONL_PATH")
+TRACE_OTLP_PATH = os.getenv("TRACE_OTLP_PATH")
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    start_ns: int
+    end_ns: int = 0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6 if self.end_ns else 0.0
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def add(self, key: str, amount: float = 1) -> None:
+        # Counters such as bytes, tokens or cache hits summed over the span
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+
+class Trace:
+    """Finished spans of one run (an app submission, a batch product, ...)."""
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def record(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        # Per span name: count, total and p50/p95 duration in ms
+        by_name: Dict[str, List[float]] = {}
+        for s in self.spans:
+            by_name.setdefault(s.name, []).append(s.duration_ms)
+        out = {}
+        for name, durations in by_name.items():
+            durations.sort()
+            out[name] = {
+                "count": len(durations),
+                "total_ms": round(sum(durations), 2),
+                "p50_ms": round(_percentile(durations, 0.5), 2),
+                "p95_ms": round(_percentile(durations, 0.95), 2),
+                "errors": sum(1 for s in self.spans if s.name == name and s.error),
+            }
+        return out
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("current_trace", default=None)
+_export_lock = threading.Lock()
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Time a block as a child of the current span.
+
+    Context variables follow asyncio tasks and `asyncio.to_thread`, so spans
+    opened inside gathered coroutines nest under the caller. A span opened
+    with no active trace starts one and exports it when it ends. Exceptions
+    are recorded on the span and re-raised.
+    """
+    parent = _current_span.get()
+    trace = _current_trace.get()
+    root = trace is None
+    if root:
+        trace = Trace(secrets.token_hex(16))
+    s = Span(
+        name=name,
+        trace_id=trace.trace_id,
+        span_id=secrets.token_hex(8),
+        parent_id=parent.span_id if parent is not None and not root else None,
+        start_ns=time.time_ns(),
+        attributes=dict(attributes),
+    )
+    span_token = _current_span.set(s)
+    trace_token = _current_trace.set(trace)
+    try:
+        yield s
+    except BaseException as e:
+        s.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        s.end_ns = time.time_ns()
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+        trace.record(s)
+        if root:
+            export(trace)
+
+
+def record_span(name: str, start_ns: int, error: Optional[str] = None, **attributes) -> None:
+    # For work that can't hold a span open across a `yield` (streaming
+    # generators): attach a finished span under the current one
+    parent = _current_span.get()
+    trace = _current_trace.get()
+    s = Span(
+        name=name,
+        trace_id=trace.trace_id if trace is not None else secrets.token_hex(16),
+        span_id=secrets.token_hex(8),
+        parent_id=parent.span_id if parent is not None else None,
+        start_ns=start_ns,
+        end_ns=time.time_ns(),
+        attributes=attributes,
+        error=error,
+    )
+    if trace is not None:
+        trace.record(s)
+    else:
+        standalone = Trace(s.trace_id)
+        standalone.record(s)
+        export(standalone)
+
+
+@contextmanager
+def trace(name: str, **attributes):
+    # A root span that always starts a new trace; yields the Trace for display
+    outer = _current_trace.set(None)
+    outer_span = _current_span.set(None)
+    try:
+        with span(name, **attributes):
+            yield _current_trace.get()
+    finally:
+        _current_trace.reset(outer)
+        _current_span.reset(outer_span)
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(trace: Trace, service_name: str = "aiproduct") -> Dict[str, Any]:
+    spans = []
+    for s in trace.spans:
+        otlp_span = {
+            "traceId": s.trace_id,
+            "spanId": s.span_id,
+            "name": s.name,
+            "kind": 1,
+            "startTimeUnixNano": str(s.start_ns),
+            "endTimeUnixNano": str(s.end_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+            "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+        }
+        if s.parent_id:
+            otlp_span["parentSpanId"] = s.parent_id
+        spans.append(otlp_span)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+            "scopeSpans": [{"scope": {"name": "tracing"}, "spans": spans}],
+        }]
+    }
+
+
+def export(trace: Trace) -> None:
+    if not (TRACE_JSONL_PATH or TRACE_OTLP_PATH):
+        return
+    with _export_lock:
+        if TRACE_JSONL_PATH:
+            with open(TRACE_JSONL_PATH, "a", encoding="utf-8") as f:
+                for s in trace.spans:
+                    f.write(json.dumps({**asdict(s), "duration_ms": s.duration_ms}, default=str) + "\n")
+        if TRACE_OTLP_PATH:
+            with open(TRACE_OTLP_PATH, "a", encoding="utf-8") as f:
+                f.write(json.dumps(to_otlp(trace)) + "\n")
+
+
+def render_waterfall(trace: Trace) -> None:
+    # Streamlit panel for the current run: one bar per span, offset from the run start
+    import pandas as pd
+    import streamlit as st
+
+    if not trace.spans:
+        return
+    start = min(s.start_ns for s in trace.spans)
+    rows = [
+        {
+            "span": f"{s.name} {s.attributes.get('url', '')}".strip()[:90],
+            "start_ms": (s.start_ns - start) / 1e6,
+            "end_ms": (s.end_ns - start) / 1e6,
+            "duration_ms": round(s.duration_ms, 1),
+            "error": s.error or "",
+            **{k: v for k, v in s.attributes.items() if k != "url"},
+        }
+        for s in sorted(trace.spans, key=lambda s: s.start_ns)
+    ]
+    frame = pd.DataFrame(rows)
+    try:
+        import altair as alt
+
+        chart = alt.Chart(frame).mark_bar().encode(
+            x=alt.X("start_ms:Q", title="ms since start"),
+            x2="end_ms:Q",
+            y=alt.Y("span:N", sort=None, title=None),
+            color=alt.condition("datum.error != ''", alt.value("#d62728"), alt.value("#4c78a8")),
+            tooltip=list(frame.columns),
+        )
+        st.altair_chart(chart, use_container_width=True)
+    except ImportError:
+        pass
+    st.dataframe(pd.DataFrame.from_dict(trace.summary(), orient="index"))
+    st.dataframe(frame)
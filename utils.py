@@ -1,8 +1,35 @@
 # utils.py
-from bs4 import BeautifulSoup
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from extraction import extract_page
 
-def clean_html(raw_html):
-    soup = BeautifulSoup(raw_html, 'html.parser')
-    for script in soup(["script", "style"]):
-        script.decompose()
-    return soup.get_text(separator=" ", strip=True)
+TRACKING_PARAMS = {
+    "gclid", "gclsrc", "dclid", "fbclid", "msclkid", "yclid", "igshid",
+    "mc_cid", "mc_eid", "srsltid", "_ga", "_gl", "ref", "ref_", "spm",
+}
+
+def clean_html(raw_html, backend=None):
+    # Visible page text without script/style; see extraction.BACKENDS
+    return extract_page(raw_html, backend).text
+
+def normalize_url(url):
+    # Canonical key for dedup: lowercase host without www/default port,
+    # no fragment, no tracking params, sorted query, no trailing slash
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower() or "http"
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    if port and not ((scheme == "http" and port == 80) or (scheme == "https" and port == 443)):
+        host = f"{host}:{port}"
+    query = [
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS
+    ]
+    path = parts.path or "/"
+    if len(path) > 1 and path.endswith("/"):
+        path = path.rstrip("/")
+    return urlunsplit((scheme, host, path, urlencode(sorted(query)), ""))